@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 
+from . import cli
+from . import controllers
 from . import models
 from . import wizard
 
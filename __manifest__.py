@@ -37,7 +37,15 @@ Funcionalidades:
         'views/res_company_views.xml',
         'views/account_payment_views.xml',
         'views/pix_installment_views.xml',
+        'views/pix_json_viewer_views.xml',
+        'views/pix_dashboard_views.xml',
+        'views/pix_slo_snapshot_views.xml',
+        'views/pix_installment_archive_views.xml',
+        'views/pix_generation_job_views.xml',
+        'views/pix_status_event_views.xml',
         'wizard/account_payment_register_views.xml',
+        'wizard/pix_cnab_wizard_views.xml',
+        'wizard/pix_dry_run_wizard_views.xml',
     ],
     'installable': True,
     'application': False,
@@ -0,0 +1,405 @@
+# -*- coding: utf-8 -*-
+"""Worker dedicado de envio e sincronização PIX
+
+Processo de longa duração, independente do ir.cron, que carrega o registro uma
+única vez e executa três laços:
+
+- envio: aguarda o canal pix_dispatch_wakeup e envia as parcelas liberadas, com
+  N threads por empresa e limite de requisições por minuto da empresa;
+- sincronização: aguarda o canal pix_sync_wakeup (ou o intervalo) e concilia os
+  PIX pendentes, uma empresa por thread;
+- token: renova os tokens das credenciais antes de expirarem.
+
+Uso:
+
+    odoo-bin pix_worker -c /etc/odoo.conf -d banco --concurrency 4
+
+As parcelas são travadas no banco (FOR UPDATE SKIP LOCKED) antes do envio, então
+vários workers (em máquinas diferentes) podem rodar em paralelo; os limites de
+requisições valem por processo. Desative o cron "Enviar Parcelas PIX Agendadas"
+quando usar o worker. SIGINT/SIGTERM encerram após os envios em andamento; um
+segundo sinal encerra imediatamente.
+"""
+
+import argparse
+import logging
+import os
+import queue
+import select
+import signal
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+from psycopg2.errors import SerializationFailure
+
+from odoo import api, sql_db, SUPERUSER_ID
+from odoo.cli import Command
+from odoo.modules.registry import Registry
+from odoo.tools import config
+
+from ..models.pix_dispatch_scheduler import DISPATCH_WAKEUP_CHANNEL, SYNC_WAKEUP_CHANNEL, SYNC_WAKEUP_DELAY_SECONDS
+
+_logger = logging.getLogger(__name__)
+
+# Parcelas aguardando envio por empresa, por thread de envio (acima disso o
+# coordenador para de buscar novas parcelas até a fila esvaziar)
+QUEUE_SIZE_PER_THREAD = 4
+
+# Espera máxima nos laços, para reagir ao encerramento
+LOOP_WAIT_SECONDS = 1.0
+
+
+class RateLimiter:
+    """Espaça as requisições de uma empresa entre as suas threads de envio"""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / max(per_minute, 1)
+        self.lock = threading.Lock()
+        self.next_at = 0.0
+
+    def wait(self, stop_event):
+        with self.lock:
+            now = time.monotonic()
+            at = max(now, self.next_at)
+            self.next_at = at + self.interval
+        stop_event.wait(max(0.0, at - now))
+
+
+class PixWorkerRuntime:
+
+    def __init__(self, dbname, concurrency, company_ids, poll_interval, sync_interval, token_interval):
+        self.dbname = dbname
+        self.concurrency = concurrency
+        self.company_ids = company_ids
+        self.poll_interval = poll_interval
+        self.sync_interval = sync_interval
+        self.token_interval = token_interval
+
+        self.registry = Registry(dbname)
+        self.stop_event = threading.Event()
+        self.dispatch_event = threading.Event()
+        self.lock = threading.Lock()
+        self.queues = {}
+        self.limiters = {}
+        self.in_flight = set()
+        self.sync_due = {}
+        self.threads = []
+
+    # Ambiente ---------------------------------------------------------------
+
+    def _env(self, cr, company_id=None):
+        env = api.Environment(cr, SUPERUSER_ID, {})
+        if company_id:
+            env = env(context=dict(env.context, allowed_company_ids=[company_id]))
+        return env
+
+    def _get_company_ids(self):
+        with self.registry.cursor() as cr:
+            domain = [('itau_pix_api_id', '!=', False)]
+            if self.company_ids:
+                domain.append(('id', 'in', self.company_ids))
+            return self._env(cr)['res.company'].search(domain).ids
+
+    def _check_configuration(self):
+        with self.registry.cursor() as cr:
+            cron = self._env(cr).ref('payment_itau_pix.ir_cron_dispatch_pix_installments', raise_if_not_found=False)
+            if cron and cron.active:
+                _logger.warning(
+                    'O cron "Enviar Parcelas PIX Agendadas" está ativo: desative-o ao usar o worker dedicado.'
+                )
+        company_count = len(self._get_company_ids())
+        connections = company_count * self.concurrency + company_count + 4
+        if connections > config['db_maxconn']:
+            _logger.warning(
+                f'O worker pode usar até {connections} conexões, acima de db_maxconn '
+                f'({config["db_maxconn"]}): aumente db_maxconn ou reduza --concurrency.'
+            )
+
+    # Notificações -----------------------------------------------------------
+
+    def _listen_loop(self):
+        """Aguarda os canais de envio e sincronização em uma conexão dedicada"""
+        while not self.stop_event.is_set():
+            try:
+                with sql_db.db_connect(self.dbname).cursor() as cr:
+                    cr.execute(f'LISTEN {DISPATCH_WAKEUP_CHANNEL}')
+                    cr.execute(f'LISTEN {SYNC_WAKEUP_CHANNEL}')
+                    cr.commit()
+                    connection = cr._cnx
+                    while not self.stop_event.is_set():
+                        if select.select([connection], [], [], LOOP_WAIT_SECONDS) == ([], [], []):
+                            continue
+                        connection.poll()
+                        for notify in connection.notifies:
+                            self._on_notify(notify.channel, notify.payload)
+                        connection.notifies.clear()
+            except (psycopg2.Error, OSError) as e:
+                _logger.warning(f'Conexão de notificações PIX perdida, reconectando: {e}')
+                self.stop_event.wait(5)
+
+    def _on_notify(self, channel, payload):
+        if channel == DISPATCH_WAKEUP_CHANNEL:
+            self.dispatch_event.set()
+        elif channel == SYNC_WAKEUP_CHANNEL and payload.isdigit():
+            due = time.monotonic() + SYNC_WAKEUP_DELAY_SECONDS
+            with self.lock:
+                company_id = int(payload)
+                self.sync_due[company_id] = min(self.sync_due.get(company_id, due), due)
+
+    # Envio ------------------------------------------------------------------
+
+    def _dispatch_loop(self):
+        """Coordenador: busca as filas de envio das empresas sempre que acordado"""
+        while not self.stop_event.is_set():
+            self.dispatch_event.clear()
+            try:
+                self.registry = self.registry.check_signaling()
+                for company_id in self._get_company_ids():
+                    self._fill_queue(company_id)
+            except Exception as e:
+                _logger.exception(f'Erro ao buscar a fila de envio PIX: {e}')
+            # Sem notificação, reconsulta no intervalo (parcelas que vencem sem novo evento)
+            self.dispatch_event.wait(self.poll_interval)
+
+    def _fill_queue(self, company_id):
+        company_queue = self._get_company_queue(company_id)
+        if company_queue.full():
+            return
+        with self.registry.cursor() as cr:
+            env = self._env(cr, company_id)
+            company = env['res.company'].browse(company_id)
+            scheduler = env['pix.dispatch.scheduler'].with_company(company)
+            installment_ids = scheduler._get_dispatch_queue(company)
+            self.limiters[company_id].interval = 60.0 / max(scheduler._get_rate_limit(company), 1)
+        queued = 0
+        for installment_id in installment_ids:
+            with self.lock:
+                if installment_id in self.in_flight:
+                    continue
+                self.in_flight.add(installment_id)
+            try:
+                company_queue.put_nowait(installment_id)
+                queued += 1
+            except queue.Full:
+                # Contrapressão: o restante fica no banco até as threads liberarem a fila
+                with self.lock:
+                    self.in_flight.discard(installment_id)
+                break
+        if queued:
+            _logger.info(f'Worker PIX: {queued} parcela(s) da empresa {company_id} na fila de envio.')
+
+    def _get_company_queue(self, company_id):
+        if company_id not in self.queues:
+            self.queues[company_id] = queue.Queue(maxsize=self.concurrency * QUEUE_SIZE_PER_THREAD)
+            self.limiters[company_id] = RateLimiter(60)
+            for index in range(self.concurrency):
+                self._start_thread(self._sender_loop, f'pix_worker_send_{company_id}_{index}', company_id)
+        return self.queues[company_id]
+
+    def _sender_loop(self, company_id):
+        company_queue = self.queues[company_id]
+        batch = uuid.uuid4().hex[:12]
+        while not self.stop_event.is_set():
+            try:
+                installment_id = company_queue.get(timeout=LOOP_WAIT_SECONDS)
+            except queue.Empty:
+                continue
+            try:
+                if self.stop_event.is_set():
+                    break
+                self.limiters[company_id].wait(self.stop_event)
+                self._send(company_id, installment_id, batch)
+            except Exception as e:
+                _logger.exception(f'Erro no worker PIX ao enviar a parcela {installment_id}: {e}')
+            finally:
+                with self.lock:
+                    self.in_flight.discard(installment_id)
+                if company_queue.empty():
+                    self.dispatch_event.set()
+
+    def _lock_installment(self, cr, installment_id):
+        """Trava a parcela em rascunho e o seu pagamento
+
+        :return: False se a parcela já foi enviada (ex.: junto com outra parcela do
+            mesmo pagamento), está em envio por outro worker ou foi alterada por
+            uma transação confirmada depois do início desta
+        """
+        try:
+            with cr.savepoint(flush=False):
+                cr.execute("""
+                    SELECT i.id
+                      FROM pix_installment i
+                      JOIN account_payment p ON p.id = i.payment_id
+                     WHERE i.id = %s AND i.pix_status = 'draft'
+                       FOR UPDATE OF i, p SKIP LOCKED
+                """, (installment_id,))
+                return bool(cr.fetchone())
+        except SerializationFailure:
+            # A próxima busca da fila decide a partir do estado confirmado
+            return False
+
+    def _send(self, company_id, installment_id, batch):
+        """Envia uma parcela, travando a parcela e o pagamento
+
+        TXID e Correlation ID são confirmados em uma transação própria antes da
+        chamada HTTP: se o registro do envio se perder, um reenvio usa o mesmo
+        Correlation ID e é recusado pelo banco como duplicado. Qualquer falha a
+        partir do envio deixa a parcela pendente (nunca em rascunho) para a
+        sincronização de status.
+        """
+        with self.registry.cursor() as cr:
+            if not self._lock_installment(cr, installment_id):
+                return
+            env = self._env(cr, company_id)
+            env['pix.installment'].browse(installment_id).payment_id._ensure_pix_identifiers()
+
+        attempted = False
+        try:
+            with self.registry.cursor() as cr:
+                if not self._lock_installment(cr, installment_id):
+                    return
+                env = self._env(cr, company_id)
+                installment = env['pix.installment'].with_context(pix_timing_batch=batch).browse(installment_id)
+                payment = installment.payment_id
+                payload = payment._build_pix_payloads().get(payment.id)
+                attempted = True
+                env['pix.dispatch.scheduler']._send_installment(installment, payload=payload)
+        except Exception as e:
+            if not attempted:
+                raise
+            self._mark_send_uncertain(company_id, installment_id, e)
+
+    def _mark_send_uncertain(self, company_id, installment_id, error):
+        """Marca como pendente, em uma nova transação, a parcela cujo envio falhou após a chamada ao banco"""
+        _logger.exception(f'Erro no worker PIX após o envio da parcela {installment_id}: {error}')
+        with self.registry.cursor() as cr:
+            env = self._env(cr, company_id)
+            installments = env['pix.installment'].browse(installment_id)._with_payment_siblings().filtered(
+                lambda i: i.pix_status == 'draft'
+            )
+            if installments:
+                installments._mark_pix_send_uncertain(f'falha no worker após o envio ({error})')
+
+    # Sincronização ----------------------------------------------------------
+
+    def _sync_loop(self):
+        running = {}
+        next_full_sync = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='pix_worker_sync') as executor:
+            while not self.stop_event.is_set():
+                now = time.monotonic()
+                with self.lock:
+                    due = [company_id for company_id, at in self.sync_due.items() if at <= now]
+                if now >= next_full_sync:
+                    due = self._get_company_ids()
+                    next_full_sync = now + self.sync_interval
+                for company_id in due:
+                    future = running.get(company_id)
+                    if future and not future.done():
+                        # Sincronização da empresa ainda em andamento: o sinal fica para depois
+                        continue
+                    with self.lock:
+                        self.sync_due.pop(company_id, None)
+                    running[company_id] = executor.submit(self._sync, company_id)
+                self.stop_event.wait(LOOP_WAIT_SECONDS)
+
+    def _sync(self, company_id):
+        try:
+            with self.registry.cursor() as cr:
+                env = self._env(cr, company_id)
+                env['account.payment']._sync_pix_company(env['res.company'].browse(company_id))
+        except Exception as e:
+            _logger.exception(f'Erro no worker PIX ao sincronizar a empresa {company_id}: {e}')
+
+    # Token ------------------------------------------------------------------
+
+    def _token_loop(self):
+        """Renova antecipadamente os tokens que expirariam antes da próxima verificação"""
+        while not self.stop_event.is_set():
+            try:
+                with self.registry.cursor() as cr:
+                    env = self._env(cr)
+                    api_configs = env['base.payment.api'].search([('integracao', '=', 'itau_pix')])
+                    api_configs.with_context(
+                        itau_pix_token_min_validity=2 * self.token_interval
+                    )._warmup_itau_pix()
+            except Exception as e:
+                _logger.exception(f'Erro no worker PIX ao renovar os tokens: {e}')
+            self.stop_event.wait(self.token_interval)
+
+    # Execução ---------------------------------------------------------------
+
+    def _start_thread(self, target, name, *args):
+        def run():
+            threading.current_thread().dbname = self.dbname
+            target(*args)
+        thread = threading.Thread(target=run, name=name, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def _handle_signal(self, signum, frame):
+        if self.stop_event.is_set():
+            _logger.warning('Worker PIX: encerramento forçado.')
+            os._exit(1)
+        _logger.info('Worker PIX: encerrando após os envios em andamento (novo sinal força o encerramento).')
+        self.stop_event.set()
+        self.dispatch_event.set()
+
+    def run(self):
+        signal.signal(signal.SIGINT, self._handle_signal)
+        signal.signal(signal.SIGTERM, self._handle_signal)
+        self._check_configuration()
+
+        self._start_thread(self._listen_loop, 'pix_worker_listen')
+        self._start_thread(self._token_loop, 'pix_worker_token')
+        self._start_thread(self._sync_loop, 'pix_worker_sync')
+        self._start_thread(self._dispatch_loop, 'pix_worker_dispatch')
+        _logger.info(f'Worker PIX iniciado no banco {self.dbname} com {self.concurrency} thread(s) por empresa.')
+
+        while not self.stop_event.is_set():
+            self.stop_event.wait(LOOP_WAIT_SECONDS)
+        for thread in list(self.threads):
+            thread.join()
+        _logger.info('Worker PIX encerrado.')
+
+
+class PixWorker(Command):
+    """Worker dedicado de envio, sincronização e renovação de token PIX"""
+    name = 'pix_worker'
+
+    def run(self, cmdargs):
+        parser = argparse.ArgumentParser(
+            prog=f'{os.path.basename(sys.argv[0])} {self.name}',
+            description=self.__doc__,
+        )
+        parser.add_argument('--concurrency', type=int, default=2,
+                            help='threads de envio por empresa (padrão: 2)')
+        parser.add_argument('--company', type=int, action='append', dest='company_ids', default=[],
+                            help='id da empresa atendida (repetível; padrão: todas com Itaú PIX)')
+        parser.add_argument('--poll-interval', type=float, default=300,
+                            help='segundos entre buscas da fila de envio sem notificação (padrão: 300)')
+        parser.add_argument('--sync-interval', type=float, default=900,
+                            help='segundos entre sincronizações completas (padrão: 900)')
+        parser.add_argument('--token-interval', type=float, default=60,
+                            help='segundos entre verificações dos tokens (padrão: 60)')
+        options, odoo_args = parser.parse_known_args(cmdargs)
+        if options.concurrency < 1:
+            parser.error('--concurrency deve ser positivo')
+
+        config.parse_config(odoo_args, setup_logging=True)
+        dbnames = [name for name in (config['db_name'] or '').split(',') if name]
+        if len(dbnames) != 1:
+            parser.error('informe um único banco de dados (-d)')
+
+        PixWorkerRuntime(
+            dbnames[0],
+            concurrency=options.concurrency,
+            company_ids=options.company_ids,
+            poll_interval=options.poll_interval,
+            sync_interval=options.sync_interval,
+            token_interval=options.token_interval,
+        ).run()
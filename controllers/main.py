@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+from odoo import http
+from odoo.exceptions import AccessDenied, AccessError, UserError
+from odoo.http import request
+from ..models import pix_json
+
+
+class PixController(http.Controller):
+
+    def _json_response(self, data, status=200):
+        return request.make_response(
+            pix_json.dumps(data),
+            headers=[('Content-Type', 'application/json'), ('Cache-Control', 'no-store')],
+            status=status,
+        )
+
+    def _authenticate_api_key(self):
+        """Autentica pela chave de API (Authorization: Bearer) ou pela sessão
+
+        :return: True se há um usuário autenticado
+        """
+        authorization = request.httprequest.headers.get('Authorization') or ''
+        if authorization.startswith('Bearer '):
+            uid = request.env['res.users.apikeys']._check_credentials(
+                scope='rpc', key=authorization[len('Bearer '):].strip()
+            )
+            if not uid:
+                return False
+            request.update_env(user=uid)
+        return not request.env.user._is_public()
+
+    @http.route('/payment_itau_pix/health', type='http', auth='public', methods=['GET'], csrf=False)
+    def health(self, **kwargs):
+        """Prontidão das credenciais Itaú PIX neste worker (conexão aberta e token válido)
+
+        Não acessa a rede: retorna 200 quando todas as credenciais ativas estão
+        prontas e 503 caso contrário. Chamadas anônimas recebem apenas ready; o
+        detalhe por credencial exige autenticação e se limita às empresas do usuário.
+        """
+        integrations = request.env['base.payment.api'].sudo()._get_itau_pix_readiness()
+        ready = all(item['connection'] and item['token'] for item in integrations)
+        status = 200 if ready else 503
+        if not self._authenticate_api_key():
+            return self._json_response({'ready': ready}, status=status)
+        company_ids = set(request.env.user.company_ids.ids)
+        integrations = [item for item in integrations if item['company_id'] in company_ids]
+        return self._json_response({'ready': ready, 'integrations': integrations}, status=status)
+
+    @http.route('/payment_itau_pix/status', type='http', auth='public', methods=['POST'], csrf=False)
+    def status(self, **kwargs):
+        """Status de parcelas PIX em lote para sistemas externos
+
+        Corpo JSON com qualquer combinação de: txids, correlation_ids, invoice_ids
+        (listas), updated_since (ISO 8601), cursor e limit. Responde com a
+        projeção enxuta do status e o next_cursor da próxima página.
+        """
+        if not self._authenticate_api_key():
+            return self._json_response({'error': 'unauthorized'}, status=401)
+        try:
+            params = pix_json.loads(request.httprequest.get_data() or b'{}')
+        except ValueError:
+            return self._json_response({'error': 'invalid JSON body'}, status=400)
+        if not isinstance(params, dict):
+            return self._json_response({'error': 'JSON body must be an object'}, status=400)
+
+        try:
+            page = request.env['pix.status.api']._get_status_page(
+                txids=params.get('txids'),
+                correlation_ids=params.get('correlation_ids'),
+                invoice_ids=params.get('invoice_ids'),
+                updated_since=params.get('updated_since'),
+                cursor=params.get('cursor'),
+                limit=params.get('limit'),
+            )
+        except (AccessDenied, AccessError):
+            return self._json_response({'error': 'forbidden'}, status=403)
+        except UserError as e:
+            return self._json_response({'error': e.args[0]}, status=400)
+        return self._json_response(page)
+
+    @http.route('/payment_itau_pix/events', type='http', auth='public', methods=['GET'], csrf=False)
+    def events(self, cursor=None, limit=None, timeout=None, **kwargs):
+        """Feed de transições de status PIX (parcelas e pagamentos)
+
+        Retorna os eventos após o cursor; com timeout (segundos), aguarda novos
+        eventos antes de responder vazio (long-polling, apenas em servidores com
+        threads ou gevent). cursor=latest posiciona o consumidor no fim do feed,
+        sem eventos.
+        """
+        if not self._authenticate_api_key():
+            return self._json_response({'error': 'unauthorized'}, status=401)
+        Event = request.env['pix.status.event']
+        try:
+            if cursor == 'latest':
+                Event.check_access('read')
+                return self._json_response({'events': [], 'next_cursor': Event._get_head_cursor(), 'has_more': False})
+            page = Event._wait_feed(cursor=cursor, limit=limit, timeout=timeout)
+        except (AccessDenied, AccessError):
+            return self._json_response({'error': 'forbidden'}, status=403)
+        except UserError as e:
+            return self._json_response({'error': e.args[0]}, status=400)
+        return self._json_response(page)
@@ -4,7 +4,21 @@ from . import res_bank
 from . import res_partner_bank
 from . import res_company
 from . import account_journal
+from . import pix_timing_mixin
 from . import account_payment
 from . import account_move
 from . import base_payment_api
+from . import ir_http
+from . import ir_cron
 from . import pix_installment
+from . import pix_sispag_cnab
+from . import pix_statement_matcher
+from . import pix_dispatch_scheduler
+from . import pix_json_viewer
+from . import pix_dashboard_summary
+from . import pix_slo_snapshot
+from . import pix_installment_archive
+from . import pix_generation_job
+from . import pix_batch_simulator
+from . import pix_status_api
+from . import pix_status_event
@@ -3,6 +3,8 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
 from odoo.tools import float_compare
+from .pix_generation_job import GENERATION_BACKGROUND_THRESHOLD
+from . import pix_trace
 import logging
 
 _logger = logging.getLogger(__name__)
@@ -17,16 +19,22 @@ class AccountMove(models.Model):
         string='Parcelas PIX',
         help='Parcelas PIX relacionadas a esta fatura'
     )
+    pix_installment_archive_ids = fields.One2many(
+        'pix.installment.archive',
+        'invoice_id',
+        string='Parcelas PIX Arquivadas',
+        help='Parcelas PIX pagas já movidas para o arquivo'
+    )
     pix_installments_count = fields.Integer(
         string='Número de Parcelas PIX',
         compute='_compute_pix_installments_count',
         store=False
     )
 
-    @api.depends('pix_installment_ids')
+    @api.depends('pix_installment_ids', 'pix_installment_archive_ids')
     def _compute_pix_installments_count(self):
         for record in self:
-            record.pix_installments_count = len(record.pix_installment_ids)
+            record.pix_installments_count = len(record.pix_installment_ids) + len(record.pix_installment_archive_ids)
 
     @api.depends('amount_residual', 'move_type', 'state', 'company_id', 'matched_payment_ids.state', 'pix_installment_ids.pix_status')
     def _compute_payment_state(self):
@@ -57,6 +65,7 @@ class AccountMove(models.Model):
                             # Se ainda tem residual, mantém como 'partial'
                             invoice.payment_state = 'partial'
 
+    @pix_trace.traced('pix.generate_installments', phase='orm')
     def action_generate_pix_installments(self):
         """Gera parcelas PIX para a fatura postada
         
@@ -75,7 +84,7 @@ class AccountMove(models.Model):
         if self.state != 'posted':
             raise UserError(_('A fatura deve estar postada para gerar parcelas PIX.'))
         
-        if self.pix_installment_ids:
+        if self.pix_installment_ids or self.pix_installment_archive_ids:
             raise UserError(_('Esta fatura já possui parcelas PIX geradas.'))
         
         company = self.company_id
@@ -106,139 +115,42 @@ class AccountMove(models.Model):
         
         if not payable_lines:
             raise UserError(_('Não foram encontradas linhas de contas a pagar não reconciliadas nesta fatura.'))
-        
-        # Cria parcelas baseadas nas linhas payable
-        # Por padrão, cria uma parcela por linha, mas pode ser customizado
-        installments = self.env['pix.installment']
-        payments = self.env['account.payment']
-        
-        for line in payable_lines:
-            amount = abs(line.amount_residual)
-            if amount <= 0:
-                continue
-            
-            due_date = line.date_maturity or self.invoice_date_due or fields.Date.today()
-            
-            # Cria o payment
-            payment = self.env['account.payment'].create({
-                'payment_type': 'outbound',
-                'partner_type': 'supplier',
-                'partner_id': self.partner_id.id,
-                'amount': amount,
-                'currency_id': self.currency_id.id,
-                'date': fields.Date.today(),
-                'journal_id': company.pix_journal_id.id,
-                'company_id': company.id,
-                'is_pix': True,
-                'payment_reference': _('Parcela PIX - %s') % self.name,
-                'memo': self.communication,
-            })
-            
-            # Vincula invoice ao payment
-            payment.invoice_ids = [(4, self.id)]
-            
-            # Posta o payment
-            payment.action_post()
-            
-            # Verifica se foi postado corretamente
-            # in_process é um estado válido (payment postado mas aguardando reconciliação)
-            payment.invalidate_recordset(['state', 'move_id'])
-            if payment.state not in ('posted', 'in_process'):
-                raise UserError(
-                    _('Erro ao postar o pagamento. Estado atual: %s') % payment.state
-                )
-            if not payment.move_id or payment.move_id.state != 'posted':
-                raise UserError(
-                    _('Erro ao postar o lançamento contábil do pagamento. '
-                      'Estado do lançamento: %s') %
-                    (payment.move_id.state if payment.move_id else 'N/A')
-                )
-            
-            # Cria a parcela
-            installment = self.env['pix.installment'].create({
-                'invoice_id': self.id,
-                'payment_id': payment.id,
-                'amount': amount,
-                'due_date': due_date,
-                'pix_status': 'draft',
-                'company_id': company.id,
-                'currency_id': self.currency_id.id,  # Define explicitamente para evitar erro de campo obrigatório
-            })
-            
-            # Vincula installment ao payment
-            payment.write({
-                'pix_installment_id': installment.id,
-                'pix_status': 'draft',
-            })
-            
-            installments |= installment
-            payments |= payment
-        
-        if not installments:
-            raise UserError(_('Não foi possível criar parcelas PIX. Verifique as linhas da fatura.'))
-        
-        # Reconciliação automática
-        # Busca as linhas do payment que devem ser reconciliadas
-        for payment in payments:
-            if not payment.move_id or payment.move_id.state != 'posted':
-                continue
-            
-            # Linha do payment (destination - contas a pagar)
-            # O payment cria: Débito Contas a Pagar, Crédito Conta Transitória PIX
-            payment_lines = payment.move_id.line_ids.filtered(
-                lambda l: l.account_id.account_type == 'liability_payable'
-                         and not l.reconciled
-                         and l.partner_id == payment.partner_id
-                         and l.parent_state == 'posted'
+
+        if len(payable_lines) > GENERATION_BACKGROUND_THRESHOLD:
+            # Muitas linhas: gera em segundo plano, em partes confirmadas individualmente
+            job = self.env['pix.generation.job']._enqueue(
+                payable_lines, netting=company.pix_netting, memo=self.communication
             )
-            
-            # Linhas da invoice (payable)
-            invoice_lines = self.line_ids.filtered(
-                lambda l: l.account_id.account_type == 'liability_payable'
-                         and not l.reconciled
-                         and l.partner_id == payment.partner_id
-                         and l.parent_state == 'posted'
+            self.message_post(
+                body=_('Geração de parcelas PIX iniciada em segundo plano (%d linhas).') % len(payable_lines),
+                message_type='notification',
             )
-            
-            # Reconcilia usando o método padrão do Odoo
-            if payment_lines and invoice_lines:
-                # Filtra linhas por conta e partner
-                for account in payment_lines.account_id:
-                    payment_account_lines = payment_lines.filtered(
-                        lambda l: l.account_id == account
-                    )
-                    invoice_account_lines = invoice_lines.filtered(
-                        lambda l: l.account_id == account
-                    )
-                    
-                    if payment_account_lines and invoice_account_lines:
-                        # Reconcilia as linhas correspondentes
-                        to_reconcile = payment_account_lines | invoice_account_lines
-                        
-                        if to_reconcile:
-                            try:
-                                to_reconcile.filtered(
-                                    lambda l: not l.reconciled and l.parent_state == 'posted'
-                                ).reconcile()
-                                
-                                # Vincula payment à invoice
-                                self.matched_payment_ids |= payment
-                                
-                            except Exception as e:
-                                _logger.error(
-                                    f'Erro ao reconciliar payment {payment.id} com invoice {self.id}: {e}',
-                                    exc_info=True
-                                )
-                                # Não falha completamente, apenas loga o erro
-                                self.message_post(
-                                    body=_('Aviso: Erro ao reconciliar automaticamente o pagamento %s: %s') %
-                                    (payment.name, str(e)),
-                                    message_type='notification',
-                                )
-        
+            return job._action_open_form()
+
+        if company.pix_netting:
+            # Modo consolidado: um pagamento por conta bancária/vencimento, já reconciliado
+            installments = self.env['pix.installment']._create_netted_installments(
+                payable_lines, memo=self.communication
+            )
+            if not installments:
+                raise UserError(_('Não foi possível criar parcelas PIX. Verifique as linhas da fatura.'))
+            return self._action_open_generated_pix_installments(installments)
+
+        # Modo padrão: uma parcela (e um pagamento) por linha payable
+        installments = self.env['pix.installment']._create_split_installments(
+            payable_lines, memo=self.communication
+        )
+        if not installments:
+            raise UserError(_('Não foi possível criar parcelas PIX. Verifique as linhas da fatura.'))
+        return self._action_open_generated_pix_installments(installments)
+
+    def _action_open_generated_pix_installments(self, installments):
+        """Finaliza a geração de parcelas PIX e retorna a ação que as exibe"""
+        self.ensure_one()
+
         # Invalida cache para atualizar residual
         self.invalidate_recordset(['amount_residual', 'payment_state'])
-        
+
         # Mensagem de sucesso
         self.message_post(
             body=_('Parcelas PIX geradas com sucesso: %d parcela(s) criada(s).') % len(installments),
@@ -1,17 +1,37 @@
 # -*- coding: utf-8 -*-
 
-import json
 import re
 import uuid
 from datetime import timedelta
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
+from . import pix_json, pix_timing, pix_trace
+from .base_payment_api import PixOutcomeUnknown
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# Normalizador de documentos e contas, compilado uma única vez
+NON_DIGITS_RE = re.compile(r'\D')
+
+# Campos relacionados lidos pela montagem do payload (pré-carregados em lote)
+PIX_PAYLOAD_PREFETCH_PATHS = (
+    'partner_bank_id.pix_payment_type',
+    'partner_bank_id.pix_key',
+    'partner_bank_id.bank_account_type',
+    'partner_bank_id.bank_agency_number',
+    'partner_bank_id.acc_number',
+    'partner_bank_id.bank_account_digit',
+    'partner_bank_id.bank_id.ispb',
+    'partner_id.is_company',
+    'partner_id.vat',
+    'journal_id.sispag_modulo',
+    'journal_id.bank_account_id.acc_number',
+    'company_id.partner_id.vat',
+)
+
 class AccountPayment(models.Model):
-    _inherit = 'account.payment'
+    _inherit = ['account.payment', 'pix.timing.mixin']
 
     pix_txid = fields.Char(
         string='TXID PIX',
@@ -21,6 +41,7 @@ class AccountPayment(models.Model):
     pix_correlation_id = fields.Char(
         string='Correlation ID',
         copy=False,
+        index='btree_not_null',
         help='ID de correlação para rastreabilidade'
     )
     is_pix = fields.Boolean(
@@ -37,6 +58,26 @@ class AccountPayment(models.Model):
         ondelete='set null',
         help='Parcela PIX relacionada a este pagamento'
     )
+    pix_installment_ids = fields.One2many(
+        'pix.installment',
+        'payment_id',
+        string='Parcelas PIX',
+        help='Parcelas PIX pagas por este pagamento (mais de uma no modo consolidado)'
+    )
+    pix_installment_archive_id = fields.Many2one(
+        'pix.installment.archive',
+        string='Parcela PIX Arquivada',
+        readonly=True,
+        copy=False,
+        ondelete='set null',
+        help='Parcela PIX relacionada a este pagamento, após ser movida para o arquivo'
+    )
+    pix_installment_archive_ids = fields.One2many(
+        'pix.installment.archive',
+        'payment_id',
+        string='Parcelas PIX Arquivadas',
+        help='Parcelas PIX deste pagamento já movidas para o arquivo'
+    )
     pix_status = fields.Selection(
         [
             ('draft', 'Rascunho'),
@@ -53,12 +94,40 @@ class AccountPayment(models.Model):
         copy=False,
         help='Data e hora da última sincronização do status PIX'
     )
+    pix_sent_date = fields.Datetime(
+        string='Data de Envio PIX',
+        copy=False,
+        readonly=True,
+        help='Data e hora em que o pagamento passou para pendente (enviado ao banco)'
+    )
     pix_raw_response = fields.Text(
         string='Resposta Bruta PIX',
         copy=False,
+        prefetch=False,
         help='Resposta completa da API PIX em formato JSON'
     )
 
+    def init(self):
+        # Índice parcial para a varredura de PIX pendentes sem parcela
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS account_payment_pix_pending_sync_idx
+            ON account_payment (company_id, pix_last_sync)
+            WHERE pix_status = 'pending' AND pix_installment_id IS NULL
+        """)
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS account_payment_pix_pending_sent_idx
+            ON account_payment (company_id, pix_sent_date)
+            WHERE pix_status = 'pending' AND pix_installment_id IS NULL
+        """)
+
+    def write(self, vals):
+        if vals.get('pix_status') == 'pending' and 'pix_sent_date' not in vals:
+            # Só a transição para pendente registra o envio: ressincronizações não a alteram
+            newly_sent = self.filtered(lambda p: p.pix_status != 'pending')
+            if newly_sent:
+                super(AccountPayment, newly_sent).write({'pix_sent_date': fields.Datetime.now()})
+        return super().write(vals)
+
     @api.depends('is_pix', 'company_id', 'company_id.pix_transit_account_id')
     def _compute_outstanding_account_id(self):
         """Override para usar conta transitória PIX quando is_pix=True"""
@@ -93,23 +162,44 @@ class AccountPayment(models.Model):
                 # Deixa o método original decidir se deve ser 'paid' ou 'in_process'
                 pass
 
+    def action_view_pix_raw_response(self):
+        """Exibe a resposta bruta da API, truncada conforme o limite do visualizador"""
+        self.ensure_one()
+        return self.env['pix.json.viewer']._open(self, 'pix_raw_response', _('Resposta PIX - %s') % self.name)
+
     def _generate_pix_txid(self):
-        """Gera um TXID único para o pagamento PIX"""
-        if not self.pix_txid:
-            self.pix_txid = str(uuid.uuid4()).replace('-', '')[:25]
+        """Gera um TXID único para o pagamento PIX (nunca em simulação)"""
+        self._ensure_pix_identifiers()
         return self.pix_txid
 
     def _generate_correlation_id(self):
-        """Gera um Correlation ID único para o pagamento PIX"""
-        if not self.pix_correlation_id:
-            self.pix_correlation_id = str(uuid.uuid4())
+        """Gera um Correlation ID único para o pagamento PIX (nunca em simulação)"""
+        self._ensure_pix_identifiers()
         return self.pix_correlation_id
 
+    def _ensure_pix_identifiers(self):
+        """Gera TXID e Correlation ID que faltam em todo o recordset
+
+        Os valores são gravados pelo ORM (write_date, regras de acesso e campos
+        dependentes, como a consulta de status e o rastreamento) e descarregados
+        juntos: o flush envia os valores de todos os pagamentos em um único UPDATE.
+        Em simulação (contexto pix_dry_run) nada é gerado.
+        """
+        if self.env.context.get('pix_dry_run'):
+            return
+        missing = self.filtered(lambda p: not p.pix_txid or not p.pix_correlation_id)
+        for payment in missing:
+            payment.write({
+                'pix_txid': payment.pix_txid or uuid.uuid4().hex[:25],
+                'pix_correlation_id': payment.pix_correlation_id or str(uuid.uuid4()),
+            })
+        missing.flush_recordset(['pix_txid', 'pix_correlation_id'])
+
     def _sanitize_document(self, document):
         """Remove pontos, traços e barras de documentos (CPF/CNPJ)"""
         if not document:
             return ''
-        return re.sub(r'[^\d]', '', document)
+        return NON_DIGITS_RE.sub('', document)
 
     def _format_amount(self, amount):
         """Formata valor como string com 2 casas decimais"""
@@ -148,7 +238,7 @@ class AccountPayment(models.Model):
         conta = bank_account.acc_number or ''
         if bank_account.bank_account_digit:
             conta = conta + bank_account.bank_account_digit
-        conta = re.sub(r'[^\d]', '', conta)
+        conta = NON_DIGITS_RE.sub('', conta)
 
         tipo_pessoa = 'J' if company_partner.is_company else 'F'
 
@@ -187,7 +277,7 @@ class AccountPayment(models.Model):
         conta_recebedor = bank_account.acc_number or ''
         if bank_account.bank_account_digit:
             conta_recebedor = conta_recebedor + bank_account.bank_account_digit
-        conta_recebedor = re.sub(r'[^\d]', '', conta_recebedor)
+        conta_recebedor = NON_DIGITS_RE.sub('', conta_recebedor)
         
         tipo_identificacao_recebedor = 'J' if partner.is_company else 'F'
 
@@ -203,17 +293,21 @@ class AccountPayment(models.Model):
             'identificacao_recebedor': identificacao_recebedor,
         }
 
-    def _build_pix_payload_from_payment(self):
-        """Constrói o payload PIX a partir do pagamento"""
+    @pix_timing.timed('payload')
+    @pix_trace.traced('pix.build_payload', phase='orm', key=lambda self, *args, **kwargs: self.pix_correlation_id)
+    def _build_pix_payload_from_payment(self, pagador_data=None):
+        """Constrói o payload PIX a partir do pagamento
+
+        :param pagador_data: dados do pagador já calculados (reaproveitados na montagem em lote)
+        """
         self.ensure_one()
 
         valor_pagamento = abs(self.amount)
         bank_account = self.partner_bank_id
-        pagador_data = self._get_pagador_data()
+        pagador_data = dict(pagador_data) if pagador_data else self._get_pagador_data()
 
-        # Gera TXID e Correlation ID se não existirem
-        self._generate_pix_txid()
-        self._generate_correlation_id()
+        # Gera TXID e Correlation ID se não existirem (já gerados em lote por _build_pix_payloads)
+        self._ensure_pix_identifiers()
 
         data_pagamento = self.date.strftime('%Y-%m-%d') if self.date else fields.Date.today().strftime('%Y-%m-%d')
         informacoes_entre_usuarios = (self.memo or '')[:140] if self.memo else ''
@@ -267,8 +361,41 @@ class AccountPayment(models.Model):
 
         return payload
 
-    def _send_pix_payment(self):
-        """Envia o pagamento PIX via API Itaú"""
+    def _prefetch_pix_payload_data(self):
+        """Carrega em lote todos os campos relacionados usados na montagem dos payloads"""
+        for path in PIX_PAYLOAD_PREFETCH_PATHS:
+            self.mapped(path)
+
+    def _build_pix_payloads(self):
+        """Monta os payloads PIX de todos os pagamentos do recordset
+
+        Os campos relacionados são lidos em poucas consultas (uma por modelo/campo
+        para o recordset inteiro) e os dados do pagador são calculados uma vez por
+        empresa/diário, evitando a busca do diário bancário a cada pagamento.
+        Usado pelos caminhos de envio (agendamento, worker) e pela simulação.
+
+        :return: dicionário {id do pagamento: payload}; pagamentos com dados
+            inválidos ficam de fora (o envio individual monta o payload e registra o erro)
+        """
+        self._prefetch_pix_payload_data()
+        self._ensure_pix_identifiers()
+        pagador_cache = {}
+        payloads = {}
+        for payment in self:
+            key = (payment.company_id.id, payment.journal_id.id)
+            try:
+                if key not in pagador_cache:
+                    pagador_cache[key] = payment._get_pagador_data()
+                payloads[payment.id] = payment._build_pix_payload_from_payment(pagador_data=pagador_cache[key])
+            except UserError:
+                continue
+        return payloads
+
+    def _send_pix_payment(self, payload=None):
+        """Envia o pagamento PIX via API Itaú
+
+        :param payload: payload já montado; quando omitido é montado aqui
+        """
         self.ensure_one()
 
         if not self.company_id.itau_pix_api_id:
@@ -277,7 +404,8 @@ class AccountPayment(models.Model):
             )
 
         # Constrói o payload
-        payload = self._build_pix_payload_from_payment()
+        if payload is None:
+            payload = self._build_pix_payload_from_payment()
         
         # Garante que correlation_id e txid sempre existam para idempotência
         if not payload.get('correlation_id'):
@@ -297,13 +425,18 @@ class AccountPayment(models.Model):
         self.write({
             'pix_txid': pix_data.get('txid') or self.pix_txid,
             'pix_correlation_id': pix_data.get('correlation_id') or self.pix_correlation_id,
-            'pix_raw_response': json.dumps(pix_data.get('json_response', {}), indent=2, ensure_ascii=False) if pix_data.get('json_response') else '',
+            'pix_raw_response': pix_data.get('json_response_str', ''),
             'pix_status': 'pending',
             'pix_last_sync': fields.Datetime.now(),
         })
+        if not (self.pix_installment_ids or self.pix_installment_id):
+            # Parcelas acordam a sincronização ao passarem para pendente
+            self.env['pix.dispatch.scheduler']._wakeup_sync(self.company_id)
 
         return pix_data
 
+    @pix_timing.profiled('send')
+    @pix_trace.traced('pix.send_payment', phase='orm', key=lambda self: self.pix_correlation_id)
     def action_send_pix_itau(self):
         """Ação do botão para enviar PIX Itaú"""
         self.ensure_one()
@@ -316,7 +449,8 @@ class AccountPayment(models.Model):
         
         # Garantir que o pagamento está postado antes de enviar PIX
         if self.state == 'draft':
-            self.action_post()
+            with pix_timing.phase('posting'):
+                self.action_post()
         
         # Validação crítica: move_id deve existir e estar postado
         if not self.move_id or self.move_id.state != 'posted':
@@ -335,21 +469,21 @@ class AccountPayment(models.Model):
             )
         
         try:
-            pix_data = self._send_pix_payment()
-            
-            # Constrói o payload para salvar no installment
+            # Monta o payload uma única vez: é enviado e salvo no installment
             payload = self._build_pix_payload_from_payment()
+            pix_data = self._send_pix_payment(payload)
             
             # Atualiza estado PIX (não o estado contábil)
             self.write({
                 'pix_status': 'pending',
             })
             
-            # Se tiver installment relacionado, atualiza o pix_payload lá
-            if self.pix_installment_id:
-                self.pix_installment_id.write({
-                    'pix_payload': json.dumps(payload, indent=2, ensure_ascii=False),
-                    'pix_response': json.dumps(pix_data.get('json_response', {}), indent=2, ensure_ascii=False) if pix_data.get('json_response') else '',
+            # Se tiver installments relacionados, atualiza o pix_payload lá
+            installments = self.pix_installment_ids | self.pix_installment_id
+            if installments:
+                installments.write({
+                    'pix_payload': pix_data.get('payload_json') or pix_json.dumps(payload),
+                    'pix_response': pix_data.get('json_response_str', ''),
                     'pix_txid': pix_data.get('txid', ''),
                     'pix_status': 'pending',
                     'last_sync': fields.Datetime.now(),
@@ -367,7 +501,32 @@ class AccountPayment(models.Model):
                 'view_mode': 'form',
                 'target': 'current',
             }
-            
+
+        except PixOutcomeUnknown as e:
+            # O banco pode ter aceitado a transferência: fica pendente até a sincronização confirmar
+            _logger.warning(f'Resultado incerto do envio PIX do pagamento {self.id}: {e}')
+            self.write({
+                'pix_status': 'pending',
+                'pix_last_sync': fields.Datetime.now(),
+            })
+            installments = self.pix_installment_ids | self.pix_installment_id
+            if installments:
+                installments._mark_pix_send_uncertain(e.args[0])
+            self.message_post(
+                body=_('Resultado do envio PIX incerto: %s') % e.args[0],
+                message_type='notification',
+            )
+            return {
+                'type': 'ir.actions.client',
+                'tag': 'display_notification',
+                'params': {
+                    'title': _('Aviso'),
+                    'message': _('Resultado do envio PIX incerto: %s') % e.args[0],
+                    'type': 'warning',
+                    'sticky': True,
+                }
+            }
+
         except Exception as e:
             _logger.error(
                 f'Erro ao enviar PIX para o pagamento {self.id}: {e}',
@@ -391,6 +550,8 @@ class AccountPayment(models.Model):
                 raise
             raise UserError(_('Erro ao enviar o PIX: %s') % str(e))
             
+    @pix_timing.profiled('sync')
+    @pix_trace.traced('pix.sync_payment', phase='orm', key=lambda self: self.pix_correlation_id)
     def action_update_payment_pix_status(self):
         """Atualiza o status de um pagamento PIX enviado para o Itaú"""
         self.ensure_one()
@@ -416,7 +577,8 @@ class AccountPayment(models.Model):
         
         status = api_status.lower()
         self.pix_last_sync = fields.Datetime.now()
-        self.pix_raw_response = json.dumps(api_return, indent=2, ensure_ascii=False)
+        api_return_json = pix_json.dumps(api_return)
+        self.pix_raw_response = api_return_json
         
         # Atualiza apenas o estado PIX, nunca o estado contábil
         # A reconciliação já foi feita na criação do payment via engine padrão do Odoo
@@ -428,12 +590,13 @@ class AccountPayment(models.Model):
             
             # Atualiza status PIX no payment se tiver installment
             paid_datetime = fields.Datetime.now()
-            if self.pix_installment_id:
-                self.pix_installment_id.write({
+            installments = self.pix_installment_ids | self.pix_installment_id
+            if installments:
+                installments.write({
                     'pix_status': 'paid',
                     'pix_paid_date': paid_datetime,
                     'last_sync': paid_datetime,
-                    'pix_response': json.dumps(api_return, indent=2, ensure_ascii=False),
+                    'pix_response': api_return_json,
                 })
             
             self.message_post(body=_('Pagamento PIX confirmado pela API'))
@@ -442,11 +605,12 @@ class AccountPayment(models.Model):
             self.write({
                 'pix_status': 'failed',
             })
-            if self.pix_installment_id:
-                self.pix_installment_id.write({
+            installments = self.pix_installment_ids | self.pix_installment_id
+            if installments:
+                installments.write({
                     'pix_status': 'failed',
                     'last_sync': fields.Datetime.now(),
-                    'pix_response': json.dumps(api_return, indent=2, ensure_ascii=False),
+                    'pix_response': api_return_json,
                 })
             self.message_post(body=_('Pagamento PIX não efetuado pela API'))
         
@@ -456,4 +620,58 @@ class AccountPayment(models.Model):
             'res_id': self.id,
             'view_mode': 'form',
             'target': 'current',
-        }
\ No newline at end of file
+        }
+
+    @api.model
+    def _sync_pix_company(self, company):
+        """Atualiza o status dos PIX pendentes de uma empresa
+
+        Usado pelo worker dedicado (pix_worker), que sincroniza as empresas em paralelo.
+        """
+        self = self.with_company(company)
+        try:
+            with self.env.cr.savepoint():
+                self.env['pix.installment'].search([
+                    ('company_id', '=', company.id),
+                    ('pix_status', '=', 'pending'),
+                    ('payment_id.pix_txid', '!=', False),
+                ])._reconcile_pix_status_bulk()
+        except Exception as e:
+            # Os pagamentos sem parcela ainda são sincronizados
+            _logger.error(f'Erro ao conciliar o status PIX das parcelas da empresa {company.name}: {e}', exc_info=True)
+
+        payments = self.search([
+            ('company_id', '=', company.id),
+            ('is_pix', '=', True),
+            ('pix_status', '=', 'pending'),
+            ('pix_txid', '!=', False),
+            ('pix_installment_id', '=', False),
+        ])
+        for payment in payments:
+            try:
+                with self.env.cr.savepoint():
+                    payment.action_update_payment_pix_status()
+            except Exception as e:
+                _logger.error(f'Erro ao atualizar status PIX do pagamento {payment.id}: {e}')
+
+    @api.model
+    def _cron_update_payments_itau_pix(self):
+        """Atualiza o status dos pagamentos PIX pendentes
+
+        Parcelas PIX são conciliadas em lote pela listagem SISPAG (com fallback por TXID);
+        pagamentos PIX sem parcela seguem a consulta individual.
+        """
+        self.env['pix.installment']._cron_reconcile_pix_status()
+
+        payments = self.search([
+            ('is_pix', '=', True),
+            ('pix_status', '=', 'pending'),
+            ('pix_txid', '!=', False),
+            ('pix_installment_id', '=', False),
+        ])
+        for payment in payments:
+            try:
+                with self.env.cr.savepoint():
+                    payment.with_company(payment.company_id).action_update_payment_pix_status()
+            except Exception as e:
+                _logger.error(f'Erro ao atualizar status PIX do pagamento {payment.id}: {e}')
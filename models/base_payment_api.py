@@ -1,13 +1,115 @@
 # No arquivo base_payment_api.py
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, SUPERUSER_ID, _
 from odoo.exceptions import ValidationError, UserError
+from . import pix_json, pix_timing, pix_trace
 from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+import base64
+import hashlib
+import os
+import random
+import ssl
+import tempfile
+import threading
+import time
 import requests
 import logging
-import json
+from odoo.modules.registry import Registry
 
 _logger = logging.getLogger(__name__)
 
+# Saúde das credenciais Itaú PIX neste processo: {(banco, id): (falhas seguidas, indisponível até)}
+_CREDENTIAL_HEALTH = {}
+
+# Sessões HTTP (conexões mantidas abertas) por credencial, neste processo: {(banco, id): Session}
+_SESSIONS = {}
+
+# Tokens válidos por credencial, neste processo: {(banco, id): (token, renovar após [monotonic])}
+_TOKENS = {}
+
+# Contextos SSL com o certificado de cliente (mTLS) por credencial, neste processo:
+# {(banco, id): (impressão digital do certificado, SSLContext)}
+_SSL_CONTEXTS = {}
+
+# Resultado do pré-aquecimento por credencial, neste processo: {(banco, id): {...}}
+_WARMUP_STATUS = {}
+
+# Pré-aquecimentos já disparados: {(pid, banco)}
+_WARMUP_STARTED = set()
+_WARMUP_LOCK = threading.Lock()
+
+# Processo que abriu as sessões de _SESSIONS: após um fork, os sockets TLS herdados do
+# processo pai não podem ser usados pelo filho
+_SESSIONS_PID = os.getpid()
+
+# Campos que alteram a resolução empresa -> credenciais (invalidam os caches)
+POOL_CONFIG_FIELDS = {
+    'integracao', 'company_id', 'active', 'base_url', 'client_id', 'client_secret',
+    'itau_pix_weight', 'itau_pix_sispag_modulo',
+    'itau_pix_cert_file', 'itau_pix_key_file', 'itau_pix_cert_password',
+}
+
+
+def _check_process_sessions():
+    """Descarta as sessões e o pré-aquecimento herdados do processo pai (fork)"""
+    global _SESSIONS_PID
+    pid = os.getpid()
+    if pid != _SESSIONS_PID:
+        # Sem close(): os sockets continuam em uso no processo pai
+        _SESSIONS.clear()
+        _WARMUP_STATUS.clear()
+        _SESSIONS_PID = pid
+
+
+class PixSSLContextAdapter(HTTPAdapter):
+    """Adaptador HTTP que usa um contexto SSL já carregado (certificado de cliente)
+
+    O mesmo contexto é compartilhado por todas as conexões do pool da sessão,
+    evitando reler certificado e chave do disco a cada requisição.
+    """
+
+    def __init__(self, ssl_context, **kwargs):
+        self._ssl_context = ssl_context
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['ssl_context'] = self._ssl_context
+        return super().init_poolmanager(*args, **kwargs)
+
+    def proxy_manager_for(self, *args, **kwargs):
+        kwargs['ssl_context'] = self._ssl_context
+        return super().proxy_manager_for(*args, **kwargs)
+
+# Pausa de uma credencial após falha ou limitação, dobrada a cada falha seguida (segundos)
+CREDENTIAL_COOLDOWN_SECONDS = 30
+CREDENTIAL_MAX_COOLDOWN_SECONDS = 900
+
+# Respostas HTTP que indicam limitação/indisponibilidade: a requisição segue para a próxima credencial
+FAILOVER_HTTP_STATUS = (429, 500, 502, 503, 504)
+
+# Métodos repetidos em outra credencial após qualquer falha. Nos demais (ex.: POST de
+# transferência) só há failover quando a requisição certamente não chegou ao banco
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class PixOutcomeUnknown(UserError):
+    """O banco pode ter aceitado a transferência, mas o resultado não é conhecido
+
+    Timeout de leitura, queda da conexão após o envio, erro 5xx ou duplicidade
+    (409). O PIX não pode ser reenviado nem marcado como falha: fica pendente
+    até a sincronização de status confirmar o resultado pelo TXID.
+    """
+
+
+def _is_connect_failure(error):
+    """True se a conexão nem chegou a ser estabelecida (nada foi enviado ao banco)"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
 class BasePaymentApi(models.Model):
     _inherit = 'base.payment.api'
     
@@ -36,18 +138,459 @@ class BasePaymentApi(models.Model):
         default=60,
         help='Renova o token automaticamente X segundos antes de expirar'
     )
-    
+
+    # Campos para conciliação de status em lote
+    itau_pix_bulk_listing = fields.Boolean(
+        string='Conciliação por Listagem SISPAG',
+        default=False,
+        help='Utiliza a listagem paginada de pagamentos SISPAG para conciliar os status '
+             'em lote, em vez de uma consulta por TXID'
+    )
+
+    itau_pix_listing_page_size = fields.Integer(
+        string='Tamanho da Página da Listagem',
+        default=100,
+        help='Quantidade de pagamentos solicitados por página na listagem SISPAG'
+    )
+
+    itau_pix_rate_limit = fields.Integer(
+        string='Limite de Requisições (por minuto)',
+        default=60,
+        help='Quantidade máxima de envios PIX por minuto usada pelo agendador de envio'
+    )
+
+    # Pool de credenciais: várias integrações Itaú PIX ativas na mesma empresa
+    itau_pix_weight = fields.Integer(
+        string='Peso no Pool',
+        default=1,
+        help='Participação relativa desta credencial na distribuição de envios e consultas '
+             'entre as integrações Itaú PIX ativas da empresa'
+    )
+
+    itau_pix_sispag_modulo = fields.Selection(
+        selection=[
+            ('Fornecedores', 'Fornecedores'),
+            ('Diversos', 'Diversos'),
+        ],
+        string='Módulo SISPAG',
+        help='Restringe a credencial aos envios deste módulo SISPAG. Vazio: atende todos os módulos'
+    )
+
+    # Certificado de cliente (mTLS) exigido pelos endpoints SISPAG de produção
+    itau_pix_cert_file = fields.Binary(
+        string='Certificado de Cliente (PEM)',
+        groups='base.group_system',
+        help='Certificado do cliente para autenticação mútua TLS (mTLS) com o Itaú'
+    )
+    itau_pix_cert_filename = fields.Char(
+        string='Nome do Arquivo do Certificado',
+        groups='base.group_system'
+    )
+    itau_pix_key_file = fields.Binary(
+        string='Chave Privada (PEM)',
+        groups='base.group_system',
+        help='Chave privada do certificado. Pode ser omitida se estiver no mesmo arquivo do certificado'
+    )
+    itau_pix_key_filename = fields.Char(
+        string='Nome do Arquivo da Chave',
+        groups='base.group_system'
+    )
+    itau_pix_cert_password = fields.Char(
+        string='Senha da Chave Privada',
+        groups='base.group_system'
+    )
+    itau_pix_cert_fingerprint = fields.Char(
+        string='Impressão Digital do Certificado',
+        compute='_compute_itau_pix_cert_fingerprint',
+        store=True,
+        readonly=True,
+        help='SHA-256 do certificado, da chave e da senha. Cada processo compara com a versão '
+             'em cache e recarrega o contexto SSL quando o certificado é trocado em outro processo'
+    )
+
+    itau_pix_warmup = fields.Boolean(
+        string='Pré-aquecer ao Iniciar',
+        default=False,
+        help='Ao carregar o registro em cada worker, abre a conexão com a API e garante um token '
+             'válido, para que a primeira operação PIX não pague DNS, TCP, TLS e OAuth'
+    )
+
+    itau_pix_health = fields.Selection(
+        selection=[
+            ('healthy', 'Disponível'),
+            ('cooldown', 'Em Pausa'),
+        ],
+        string='Saúde da Credencial',
+        compute='_compute_itau_pix_health',
+        help='Credenciais em pausa (limitadas ou com falha) só são usadas se nenhuma outra estiver disponível'
+    )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        if any(vals.get('integracao') == 'itau_pix' for vals in vals_list):
+            self.env.registry.clear_cache()
+        return records
+
+    def write(self, vals):
+        result = super().write(vals)
+        if POOL_CONFIG_FIELDS.intersection(vals):
+            self._invalidate_itau_pix_cache()
+        return result
+
+    def unlink(self):
+        self._invalidate_itau_pix_cache()
+        return super().unlink()
+
+    @api.depends('itau_pix_cert_file', 'itau_pix_key_file', 'itau_pix_cert_password')
+    def _compute_itau_pix_cert_fingerprint(self):
+        for record in self:
+            config = record.sudo().with_context(bin_size=False)
+            if not config.itau_pix_cert_file:
+                record.itau_pix_cert_fingerprint = False
+                continue
+            digest = hashlib.sha256()
+            for value in (config.itau_pix_cert_file, config.itau_pix_key_file, config.itau_pix_cert_password):
+                digest.update(value.encode() if isinstance(value, str) else (value or b''))
+                digest.update(b'\0')
+            record.itau_pix_cert_fingerprint = digest.hexdigest()
+
+    @api.constrains('itau_pix_cert_file', 'itau_pix_key_file', 'itau_pix_cert_password')
+    def _check_itau_pix_certificate(self):
+        """Valida que certificado, chave e senha podem ser carregados"""
+        for record in self.sudo():
+            if record.itau_pix_cert_file:
+                record._load_itau_pix_ssl_context()
+
+    def _load_itau_pix_ssl_context(self):
+        """Monta um contexto SSL com o certificado de cliente da credencial
+
+        O ssl só carrega certificados a partir de arquivos: o material é gravado em
+        um diretório temporário apenas durante o carregamento.
+        """
+        self.ensure_one()
+        context = ssl.create_default_context()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cert_path = os.path.join(tmp_dir, 'cert.pem')
+            with open(cert_path, 'wb') as cert_file:
+                cert_file.write(base64.b64decode(self.itau_pix_cert_file))
+            key_path = None
+            if self.itau_pix_key_file:
+                key_path = os.path.join(tmp_dir, 'key.pem')
+                with open(key_path, 'wb') as key_file:
+                    key_file.write(base64.b64decode(self.itau_pix_key_file))
+            try:
+                context.load_cert_chain(cert_path, key_path, password=self.itau_pix_cert_password or None)
+            except (ssl.SSLError, ValueError) as e:
+                raise ValidationError(_('Não foi possível carregar o certificado de cliente Itaú PIX: %s') % str(e))
+        return context
+
+    def _get_itau_pix_ssl_context(self):
+        """Contexto SSL da credencial, carregado uma vez por processo e versão do certificado (None sem certificado)"""
+        self.ensure_one()
+        key = (self.env.cr.dbname, self.id)
+        fingerprint = self.sudo().itau_pix_cert_fingerprint or False
+        cached = _SSL_CONTEXTS.get(key)
+        if cached is None or cached[0] != fingerprint:
+            config = self.sudo()
+            _SSL_CONTEXTS[key] = (fingerprint, config._load_itau_pix_ssl_context() if fingerprint else None)
+        return _SSL_CONTEXTS[key][1]
+
+    def _invalidate_itau_pix_cache(self):
+        """Descarta a resolução em cache, as sessões HTTP, os tokens e os certificados destas credenciais"""
+        _check_process_sessions()
+        for record in self:
+            key = (self.env.cr.dbname, record.id)
+            _TOKENS.pop(key, None)
+            _SSL_CONTEXTS.pop(key, None)
+            session = _SESSIONS.pop(key, None)
+            if session is not None:
+                session.close()
+        self.env.registry.clear_cache()
+
+    @api.model
+    def _ensure_itau_pix_warmup(self):
+        """Dispara, uma vez por processo, o pré-aquecimento das credenciais marcadas
+
+        Chamado na primeira requisição HTTP ou execução de cron de cada processo, sem
+        bloqueá-la. No modo prefork o registro é carregado no processo principal antes
+        do fork: o pré-aquecimento precisa acontecer em cada worker.
+        """
+        key = (os.getpid(), self.env.cr.dbname)
+        if key in _WARMUP_STARTED:
+            return
+        with _WARMUP_LOCK:
+            if key in _WARMUP_STARTED:
+                return
+            _WARMUP_STARTED.add(key)
+        if self.env.registry.in_test_mode() or tools.config.get('stop_after_init') or tools.config.get('test_enable'):
+            return
+        threading.Thread(
+            target=self._warmup_itau_pix_thread,
+            args=(self.env.cr.dbname,),
+            name='itau_pix_warmup',
+            daemon=True,
+        ).start()
+
+    def _warmup_itau_pix_thread(self, dbname):
+        registry = Registry(dbname)
+        with registry.cursor() as cr:
+            cr.execute("""
+                SELECT 1 FROM information_schema.columns
+                 WHERE table_name = 'base_payment_api' AND column_name = 'itau_pix_warmup'
+            """)
+            if not cr.fetchone():
+                # Coluna ainda não criada (instalação/atualização do módulo em andamento)
+                return
+            cr.execute("""
+                SELECT id FROM base_payment_api
+                 WHERE integracao = 'itau_pix' AND active AND itau_pix_warmup
+            """)
+            api_ids = [row[0] for row in cr.fetchall()]
+            if api_ids:
+                env = api.Environment(cr, SUPERUSER_ID, {})
+                env['base.payment.api'].browse(api_ids)._warmup_itau_pix()
+
+    def _warmup_itau_pix(self):
+        """Abre a conexão (DNS, TCP, TLS) e garante um token válido para cada credencial"""
+        for api_config in self:
+            key = (self.env.cr.dbname, api_config.id)
+            started = time.monotonic()
+            status = {'connection': False, 'token': False, 'error': False}
+            try:
+                # A renovação do token usa a sessão da credencial: a conexão fica aberta no pool
+                self._get_itau_pix_token(api_config)
+                status['token'] = True
+                if not api_config._get_itau_pix_open_pools():
+                    # Token ainda válido no banco: abre a conexão com uma requisição leve
+                    api_config._get_itau_pix_session().head(
+                        api_config.base_url, timeout=api_config.timeout or 30
+                    )
+                status['connection'] = bool(api_config._get_itau_pix_open_pools())
+            except Exception as e:
+                status['error'] = str(e)
+                _logger.warning(f'Falha no pré-aquecimento da credencial Itaú PIX {api_config.id}: {e}')
+            status['duration_ms'] = int((time.monotonic() - started) * 1000)
+            status['checked_at'] = fields.Datetime.to_string(fields.Datetime.now())
+            _WARMUP_STATUS[key] = status
+            # Persiste o token renovado antes da próxima credencial
+            self.env.cr.commit()
+        _logger.info(f'Pré-aquecimento Itaú PIX concluído para {len(self)} credencial(is).')
+
+    def _get_itau_pix_open_pools(self):
+        """Pools de conexão já abertos na sessão da credencial, neste processo"""
+        self.ensure_one()
+        _check_process_sessions()
+        session = _SESSIONS.get((self.env.cr.dbname, self.id))
+        if session is None:
+            return []
+        return [
+            pool_key
+            for adapter in session.adapters.values()
+            for pool_key in adapter.poolmanager.pools.keys()
+        ]
+
+    @api.model
+    def _get_itau_pix_readiness(self):
+        """Prontidão de conexão e token de cada credencial Itaú PIX ativa, sem acessar a rede"""
+        self.env.cr.execute("""
+            SELECT id, company_id FROM base_payment_api WHERE integracao = 'itau_pix' AND active
+        """)
+        result = []
+        for api_id, company_id in self.env.cr.fetchall():
+            api_config = self.browse(api_id)
+            key = (self.env.cr.dbname, api_id)
+            token, refresh_at = _TOKENS.get(key, (None, 0.0))
+            warmup = _WARMUP_STATUS.get(key, {})
+            result.append({
+                'id': api_id,
+                'company_id': company_id,
+                'connection': bool(api_config._get_itau_pix_open_pools()),
+                'token': bool(token) and time.monotonic() < refresh_at,
+                'healthy': api_config._is_itau_pix_healthy(),
+                'warmup_failed': bool(warmup.get('error')),
+                'warmup_checked_at': warmup.get('checked_at') or False,
+            })
+        return result
+
+    def _compute_itau_pix_health(self):
+        for record in self:
+            record.itau_pix_health = 'healthy' if record._is_itau_pix_healthy() else 'cooldown'
+
+    def _is_itau_pix_healthy(self):
+        self.ensure_one()
+        _failures, until = _CREDENTIAL_HEALTH.get((self.env.cr.dbname, self.id), (0, 0.0))
+        return time.monotonic() >= until
+
+    def _mark_itau_pix_failure(self, reason):
+        """Coloca a credencial em pausa, com recuo exponencial a cada falha seguida"""
+        self.ensure_one()
+        key = (self.env.cr.dbname, self.id)
+        failures = _CREDENTIAL_HEALTH.get(key, (0, 0.0))[0] + 1
+        cooldown = min(CREDENTIAL_MAX_COOLDOWN_SECONDS, CREDENTIAL_COOLDOWN_SECONDS * 2 ** (failures - 1))
+        _CREDENTIAL_HEALTH[key] = (failures, time.monotonic() + cooldown)
+        _logger.warning(
+            f'Credencial Itaú PIX {self.id} em pausa por {cooldown}s '
+            f'({failures} falha(s) seguida(s)): {reason}'
+        )
+
+    def _mark_itau_pix_success(self):
+        self.ensure_one()
+        _CREDENTIAL_HEALTH.pop((self.env.cr.dbname, self.id), None)
+
+    @api.model
+    @tools.ormcache('company_id')
+    def _get_itau_pix_pool_data(self, company_id):
+        """Resolve as credenciais Itaú PIX da empresa: ((id, peso, módulo SISPAG), ...)
+
+        A credencial configurada na empresa (res.company.itau_pix_api_id) vem
+        primeiro, seguida das demais integrações Itaú PIX ativas. O resultado fica
+        em cache até uma alteração de configuração (credenciais ou empresa).
+        """
+        company = self.env['res.company'].browse(company_id).sudo()
+        apis = company.itau_pix_api_id.filtered('active') | self.sudo().search([
+            ('integracao', '=', 'itau_pix'),
+            ('company_id', '=', company_id),
+            ('active', '=', True)
+        ])
+        return tuple(
+            (api_config.id, max(api_config.itau_pix_weight, 1), api_config.itau_pix_sispag_modulo or False)
+            for api_config in apis
+        )
+
+    @api.model
+    def _get_itau_pix_pool(self, modulo=None):
+        """Credenciais Itaú PIX ativas da empresa, na ordem em que devem ser tentadas
+
+        A ordem é sorteada proporcionalmente ao peso de cada credencial (amostragem
+        ponderada sem reposição); credenciais em pausa ficam por último.
+        """
+        pool_data = [
+            (api_id, weight)
+            for api_id, weight, api_modulo in self._get_itau_pix_pool_data(self.env.company.id)
+            if not modulo or not api_modulo or api_modulo == modulo
+        ]
+        pool_data.sort(key=lambda item: random.random() ** (1.0 / item[1]), reverse=True)
+        ordered = [self.browse(api_id) for api_id, _weight in pool_data]
+        healthy = [api_config for api_config in ordered if api_config._is_itau_pix_healthy()]
+        return healthy + [api_config for api_config in ordered if api_config not in healthy]
+
+    def _get_itau_pix_session(self):
+        """Sessão HTTP da credencial, reaproveitada entre requisições neste processo
+
+        Com certificado de cliente configurado, as conexões HTTPS da sessão usam o
+        contexto SSL em cache; as conexões mantidas abertas no pool dispensam novos
+        handshakes TLS.
+        """
+        self.ensure_one()
+        _check_process_sessions()
+        key = (self.env.cr.dbname, self.id)
+        fingerprint = self.sudo().itau_pix_cert_fingerprint or False
+        session = _SESSIONS.get(key)
+        if session is not None and session.pix_cert_fingerprint != fingerprint:
+            # Certificado trocado (possivelmente em outro processo): descarta as conexões do anterior
+            session.close()
+            session = None
+        if session is None:
+            session = requests.Session()
+            session.pix_cert_fingerprint = fingerprint
+            ssl_context = self._get_itau_pix_ssl_context()
+            if ssl_context is not None:
+                session.mount('https://', PixSSLContextAdapter(ssl_context))
+            _SESSIONS[key] = session
+        return session
+
+    @api.model
+    def _itau_pix_request(self, method, path, modulo=None, **kwargs):
+        """Executa uma requisição à API Itaú PIX com failover entre as credenciais do pool
+
+        Falhas de conexão, timeouts, limitação (429) e erros 5xx colocam a credencial
+        em pausa. Em consultas (IDEMPOTENT_METHODS) a requisição segue para a
+        próxima credencial; nos demais métodos só segue quando nada chegou ao banco
+        (conexão não estabelecida ou 429) e, caso contrário, levanta
+        PixOutcomeUnknown, pois a primeira credencial pode já ter aceitado a
+        transferência. As demais respostas são devolvidas ao chamador. Se todas as
+        credenciais falharem, o último erro é relançado.
+        """
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        pool = self._get_itau_pix_pool(modulo)
+        if not pool:
+            raise UserError(_('Não foi encontrada a API de integração do Itau PIX para a empresa %s') % self.env.company.name)
+
+        last_error = None
+        for api_config in pool:
+            try:
+                token = self._get_itau_pix_token(api_config)
+            except ValidationError as e:
+                api_config._mark_itau_pix_failure(str(e))
+                last_error = e
+                continue
+
+            headers = {
+                'Content-Type': 'application/json',
+                'X-API-Key': api_config.client_id,
+                'Authorization': f'Bearer {token}',
+            }
+            try:
+                with pix_timing.phase('http'):
+                    response = api_config._get_itau_pix_session().request(
+                        method,
+                        url=f'{api_config.base_url}{path}',
+                        headers=headers,
+                        timeout=api_config.timeout or 30,
+                        **kwargs
+                    )
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                api_config._mark_itau_pix_failure(str(e))
+                if not idempotent and not _is_connect_failure(e):
+                    raise PixOutcomeUnknown(
+                        _('Sem resposta do Itaú após o envio (%s). O resultado será confirmado '
+                          'pela sincronização de status.') % str(e)
+                    )
+                last_error = e
+                continue
+
+            if response.status_code in FAILOVER_HTTP_STATUS:
+                api_config._mark_itau_pix_failure(f'HTTP {response.status_code}')
+                if not idempotent and response.status_code != 429:
+                    raise PixOutcomeUnknown(
+                        _('O Itaú respondeu HTTP %s ao envio. O resultado será confirmado '
+                          'pela sincronização de status.') % response.status_code
+                    )
+                last_error = requests.exceptions.HTTPError(
+                    f'{response.status_code} Error for url: {response.url}', response=response
+                )
+                continue
+
+            api_config._mark_itau_pix_success()
+            return response
+
+        raise last_error
+
+    @pix_timing.timed('token')
+    @pix_trace.traced('pix.token', phase='http')
     def _get_itau_pix_token(self, base_payment_api):
         """
         Retorna um token Itau PIX válido, renovando-o se necessário.
         """
         
+        # Validade mínima exigida do token (renovação antecipada pelo worker dedicado)
+        min_validity = self.env.context.get('itau_pix_token_min_validity', 0)
+
+        # Token já validado neste processo: dispensa a leitura do banco
+        token_key = (self.env.cr.dbname, base_payment_api.id)
+        cached_token, refresh_at = _TOKENS.get(token_key, (None, 0.0))
+        if cached_token and time.monotonic() + min_validity < refresh_at:
+            return cached_token
+
         # Verifica se já existe um token válido
         if base_payment_api.itau_pix_current_token and base_payment_api.itau_pix_token_expires_at:
             now = fields.Datetime.now()
             safety_margin = timedelta(seconds=base_payment_api.itau_pix_token_safety_margin or 60)
-            if now < (base_payment_api.itau_pix_token_expires_at - safety_margin):
+            if now + timedelta(seconds=min_validity) < (base_payment_api.itau_pix_token_expires_at - safety_margin):
                 _logger.info("Utilizando token Itau PIX existente e válido.")
+                remaining = (base_payment_api.itau_pix_token_expires_at - safety_margin - now).total_seconds()
+                _TOKENS[token_key] = (base_payment_api.itau_pix_current_token, time.monotonic() + remaining)
                 return base_payment_api.itau_pix_current_token
         
         _logger.info("Token Itau PIX inexistente ou expirado. Iniciando processo de renovação.")
@@ -68,7 +611,7 @@ class BasePaymentApi(models.Model):
             token_url = f'{api_url}/api/oauth/jwt'
             
             start_time = datetime.now()
-            response = requests.post(
+            response = base_payment_api._get_itau_pix_session().post(
                 url=token_url,
                 headers=headers,
                 data=payload,
@@ -99,6 +642,10 @@ class BasePaymentApi(models.Model):
                 'itau_pix_current_token': token_data['access_token'],
                 'itau_pix_token_expires_at': token_data['expires_at'],
             })
+            _TOKENS[token_key] = (
+                token_data['access_token'],
+                time.monotonic() + expires_in - (base_payment_api.itau_pix_token_safety_margin or 60),
+            )
 
             base_payment_api.create_token_log(
                 token_data,
@@ -118,49 +665,40 @@ class BasePaymentApi(models.Model):
         except Exception as e:
             raise ValidationError(_('Erro ao gerar o token de autorização Itau PIX: %s') % str(e))
   
-    def send_pix(self, payload, payment_id=None, move_line_id=None):
-        """Envia um PIX para o Itau"""
+    @pix_trace.traced('pix.api.send', phase='http', key=lambda self, payload, *args, **kwargs: payload.get('correlation_id'))
+    def send_pix(self, payload, payment_id=None, move_line_id=None, payload_json=None):
+        """Envia um PIX para o Itau
+
+        :param payload_json: payload já serializado (evita serializar o mesmo objeto de novo)
+        """
         # Validação: correlation_id deve sempre estar presente para idempotência
         if not payload.get('correlation_id'):
             raise ValidationError(_('correlation_id é obrigatório no payload para garantir idempotência.'))
         
         try:
-            base_payment_api = self.search([
-                ('integracao', '=', 'itau_pix'),
-                ('company_id', '=', self.env.company.id),
-                ('active', '=', True)
-            ], limit=1)
-            if not base_payment_api:
-                raise UserError(_('Não foi encontrada a API de integração do Itau PIX para a empresa %s') % self.env.company.name)
-            
-            token = self._get_itau_pix_token(base_payment_api)
-            headers = {
-                'Content-Type': 'application/json',
-                'X-API-Key': base_payment_api.client_id,
-                'Authorization': f'Bearer {token}',
-            }
-            
-            url = f'{base_payment_api.base_url}/itau-ep9-gtw-sispag-ext/v1/transferencias'
-            payload_json = json.dumps(payload, indent=2, ensure_ascii=False)
-            response = requests.post(
-                url=url,
-                json=payload,
-                headers=headers,
-                timeout=base_payment_api.timeout or 30
+            # Serializado uma única vez: o mesmo texto é enviado e devolvido para gravação
+            payload_json = payload_json or pix_json.dumps(payload)
+            response = self._itau_pix_request(
+                'POST',
+                '/itau-ep9-gtw-sispag-ext/v1/transferencias',
+                modulo=(payload.get('pagador') or {}).get('modulo_sispag'),
+                data=payload_json.encode('utf-8'),
             )
             
             try:
                 response.raise_for_status()
-                response_json = response.json()
-                response_str = json.dumps(response_json, indent=2, ensure_ascii=False)
+                response_json = pix_json.loads(response.content)
+                response_str = pix_json.dumps(response_json)
             except:
                 response_str = response.text
             
-            # Verifica erro de idempotência
+            # Duplicidade (idempotência): a transferência com este correlation_id já foi recebida
             if response.status_code == 409:
-                error_msg = 'Pagamento duplicado (idempotência). Verifique se o PIX já foi enviado anteriormente.'
-                _logger.warning(f'HTTP 409 - {error_msg}')
-                raise UserError(_(error_msg))
+                _logger.warning(f'HTTP 409 - PIX já recebido pelo Itaú (correlation_id {payload.get("correlation_id")}).')
+                raise PixOutcomeUnknown(
+                    _('Pagamento duplicado (idempotência): o PIX já foi recebido pelo Itaú. '
+                      'O resultado será confirmado pela sincronização de status.')
+                )
             
             # Extrai dados do payload e resposta
             txid = payload.get('txid', '')
@@ -172,6 +710,7 @@ class BasePaymentApi(models.Model):
                 'correlation_id': correlation_id,
                 'json_response': response_json,
                 'json_response_str': response_str,
+                'payload_json': payload_json,
                 'status': response_json.get('status_pagamento', ''),
                 'pix_id': response_json.get('cod_pagamento', ''),
             }
@@ -204,28 +743,13 @@ class BasePaymentApi(models.Model):
                 raise
             raise UserError(_('Erro ao enviar o PIX: %s') % str(e))
   
+    @pix_trace.traced('pix.api.status', phase='http')
     def update_payment_pix_status(self, txid):
         """Atualiza o status de um pagamento PIX enviado para o Itaú usando o TXID"""
         try:
-            base_payment_api = self.search([
-                ('integracao', '=', 'itau_pix'),
-                ('company_id', '=', self.env.company.id),
-                ('active', '=', True)
-            ], limit=1)
-            if not base_payment_api:
-                raise ValidationError(_('Não foi encontrada a API de integração do Itau PIX para a empresa %s') % self.env.company.name)
-            token = self._get_itau_pix_token(base_payment_api)
-            headers = {
-                'Content-Type': 'application/json',
-                'X-API-Key': base_payment_api.client_id,
-                'Authorization': f'Bearer {token}',
-            }
-            
-            url = f'{base_payment_api.base_url}/itau-ep9-gtw-sispag-ext/v1/pagamentos_sispag/{txid}'
-            response = requests.get(
-                url=url,
-                headers=headers,
-                timeout=base_payment_api.timeout or 30
+            response = self._itau_pix_request(
+                'GET',
+                f'/itau-ep9-gtw-sispag-ext/v1/pagamentos_sispag/{txid}',
             )
             response.raise_for_status()
             response_json = response.json()
@@ -238,4 +762,83 @@ class BasePaymentApi(models.Model):
             raise ValidationError(_('Erro ao atualizar status do pagamento PIX: %s') % str(e))
         except Exception as e:
             _logger.error(f'Erro inesperado ao atualizar status do pagamento PIX: {e}', exc_info=True)
-            raise ValidationError(_('Erro ao atualizar status do pagamento PIX: %s') % str(e))
\ No newline at end of file
+            raise ValidationError(_('Erro ao atualizar status do pagamento PIX: %s') % str(e))
+
+    def list_payments_pix(self, date_from, date_to, status=None):
+        """Percorre a listagem paginada de pagamentos SISPAG no período informado
+
+        Generator: busca uma página por vez e entrega os itens conforme chegam,
+        sem acumular a listagem completa em memória.
+        """
+        # A listagem é paginada com uma única credencial (a primeira disponível do pool)
+        pool = self._get_itau_pix_pool()
+        if not pool:
+            raise ValidationError(_('Não foi encontrada a API de integração do Itau PIX para a empresa %s') % self.env.company.name)
+        base_payment_api = pool[0]
+
+        url = f'{base_payment_api.base_url}/itau-ep9-gtw-sispag-ext/v1/pagamentos_sispag'
+        page_size = base_payment_api.itau_pix_listing_page_size or 100
+        page = 1
+
+        session = base_payment_api._get_itau_pix_session()
+        while True:
+            # O token é verificado a cada página, pois listagens longas podem ultrapassar a expiração
+            token = self._get_itau_pix_token(base_payment_api)
+            headers = {
+                'Content-Type': 'application/json',
+                'X-API-Key': base_payment_api.client_id,
+                'Authorization': f'Bearer {token}',
+            }
+            params = {
+                'data_inicial': fields.Date.to_string(date_from),
+                'data_final': fields.Date.to_string(date_to),
+                'pagina': page,
+                'tamanho_pagina': page_size,
+            }
+            if status:
+                params['status'] = status
+
+            try:
+                response = session.get(
+                    url=url,
+                    headers=headers,
+                    params=params,
+                    timeout=base_payment_api.timeout or 30
+                )
+                response.raise_for_status()
+                response_json = response.json()
+            except requests.exceptions.RequestException as e:
+                _logger.error(f'Erro ao listar pagamentos PIX (página {page}): {e}')
+                raise ValidationError(_('Erro ao listar pagamentos PIX: %s') % str(e))
+
+            items = response_json.get('data') or []
+            for item in items:
+                yield item
+
+            pagination = response_json.get('paginacao') or response_json.get('pagination') or {}
+            total_pages = pagination.get('total_paginas') or pagination.get('total_pages')
+            if not items:
+                break
+            if total_pages and page >= int(total_pages):
+                break
+            if not total_pages and len(items) < page_size:
+                break
+            page += 1
+
+    @api.model
+    def _parse_pix_listing_item(self, item):
+        """Extrai (txid, status) de um item da listagem SISPAG"""
+        dados = item.get('dados_pagamento') or item
+        txid = dados.get('txid') or item.get('txid')
+        status = dados.get('status') or item.get('status')
+        return txid, (status or '').lower()
+
+    @api.model
+    def _extract_end_to_end_id(self, api_return):
+        """Extrai o identificador End-to-End de uma resposta (consulta ou listagem)"""
+        data = api_return.get('data') if isinstance(api_return.get('data'), dict) else api_return
+        dados = data.get('dados_pagamento') or data
+        for key in ('end_to_end_id', 'id_end_to_end', 'endToEndId'):
+            if dados.get(key):
+                return dados[key]
+        return None
\ No newline at end of file
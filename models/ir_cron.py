@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models
+
+
+class IrCron(models.Model):
+    _inherit = 'ir.cron'
+
+    def _callback(self, cron_name, server_action_id):
+        # Primeira execução de cron do processo: pré-aquece as credenciais Itaú PIX
+        self.env['base.payment.api'].sudo()._ensure_itau_pix_warmup()
+        return super()._callback(cron_name, server_action_id)
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from odoo.tools import split_every
+from .pix_dispatch_scheduler import DISPATCH_REFILL_SECONDS
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Parcelas validadas por thread (cada thread usa seu próprio cursor)
+SIMULATION_CHUNK_SIZE = 500
+
+# Quantidade máxima de threads da simulação
+SIMULATION_WORKERS = 4
+
+
+class PixBatchSimulator(models.AbstractModel):
+    _name = 'pix.batch.simulator'
+    _description = 'Simulação de Envio PIX em Lote'
+
+    def _check_installment(self, installment, payload=None):
+        """Executa as validações do envio e monta o payload, sem efeitos colaterais
+
+        As validações são as mesmas do envio real (pix.installment._check_pix_sendable).
+        Não posta pagamentos, não gera TXID/Correlation ID e não chama a API.
+
+        :param payload: payload já montado em lote; quando omitido é montado aqui
+        """
+        installment._check_pix_sendable()
+        if payload is not None:
+            return payload
+        return installment.payment_id.with_context(pix_dry_run=True)._build_pix_payload_from_payment()
+
+    def _simulate_ids(self, installment_ids):
+        """Valida as parcelas e retorna a lista de erros (id, nome, mensagem)"""
+        errors = []
+        installments = self.env['pix.installment'].browse(installment_ids)
+        payloads = installments.payment_id.with_context(pix_dry_run=True)._build_pix_payloads()
+        for installment in installments:
+            try:
+                self._check_installment(installment, payloads.get(installment.payment_id.id))
+            except UserError as e:
+                errors.append((installment.id, installment.name, e.args[0]))
+            except Exception as e:
+                errors.append((installment.id, installment.name, str(e)))
+        return errors
+
+    def _simulate_ids_in_thread(self, installment_ids):
+        """Valida uma parte das parcelas em um cursor próprio, sempre descartado"""
+        with self.env.registry.cursor() as cr:
+            env = api.Environment(cr, self.env.uid, self.env.context)
+            try:
+                return env[self._name]._simulate_ids(installment_ids)
+            finally:
+                cr.rollback()
+
+    def _estimate_dispatch_seconds(self, installments):
+        """Tempo estimado de envio das parcelas pelo agendador
+
+        Repete as execuções do agendador com o orçamento de _get_tick_budget:
+        vencidas usam a capacidade de cada execução (reagendada a cada
+        DISPATCH_REFILL_SECONDS), as demais são distribuídas até o fim do dia.
+        Parcelas consolidadas no mesmo pagamento contam como um único envio; as
+        empresas são atendidas nas mesmas execuções, por isso vale a mais lenta.
+        """
+        scheduler = self.env['pix.dispatch.scheduler']
+        tick_seconds = scheduler._get_tick_seconds()
+        today = fields.Date.context_today(self)
+        overdue_by_company = defaultdict(dict)
+        for installment in installments:
+            payments = overdue_by_company[installment.company_id]
+            overdue = installment.due_date < today
+            payments[installment.payment_id.id] = payments.get(installment.payment_id.id) or overdue
+
+        estimate = 0.0
+        for company, payments in overdue_by_company.items():
+            rate_limit = scheduler._get_rate_limit(company)
+            queue_size, overdue_count = len(payments), sum(payments.values())
+            seconds = 0.0
+            while queue_size > 0:
+                budget = scheduler._get_tick_budget(queue_size, overdue_count, rate_limit, tick_seconds)
+                queue_size -= budget
+                overdue_count -= min(overdue_count, budget)
+                if queue_size > 0:
+                    seconds += DISPATCH_REFILL_SECONDS if overdue_count else tick_seconds
+            estimate = max(estimate, seconds)
+        return estimate
+
+    def _simulate(self, installments):
+        """Simula o envio das parcelas
+
+        A validação é distribuída em threads (uma parte de parcelas por thread).
+        As threads leem apenas dados já confirmados no banco; em modo de teste,
+        ou com uma única parte, a validação roda no cursor atual.
+
+        :return: dicionário com total, válidas, erros e tempo estimado (segundos)
+        """
+        chunks = list(split_every(SIMULATION_CHUNK_SIZE, installments.ids))
+        if len(chunks) <= 1 or self.env.registry.in_test_mode():
+            errors = self._simulate_ids(installments.ids)
+        else:
+            errors = []
+            with ThreadPoolExecutor(max_workers=min(SIMULATION_WORKERS, len(chunks))) as executor:
+                for chunk_errors in executor.map(self._simulate_ids_in_thread, chunks):
+                    errors.extend(chunk_errors)
+
+        error_ids = {installment_id for installment_id, _name, _message in errors}
+        valid = installments.filtered(lambda i: i.id not in error_ids)
+        result = {
+            'total': len(installments),
+            'valid_count': len(valid),
+            'errors': errors,
+            'estimated_seconds': self._estimate_dispatch_seconds(valid),
+        }
+        _logger.info(
+            f'Simulação de envio PIX: {result["valid_count"]}/{result["total"]} parcela(s) válida(s), '
+            f'envio estimado em {result["estimated_seconds"]:.0f}s.'
+        )
+        return result
+
+    @api.model
+    def _format_error_report(self, errors, max_names=10):
+        """Agrupa os erros por mensagem, listando algumas parcelas de cada grupo"""
+        by_message = defaultdict(list)
+        for _installment_id, name, message in errors:
+            by_message[message].append(name)
+        lines = []
+        for message, names in sorted(by_message.items(), key=lambda item: -len(item[1])):
+            sample = ', '.join(names[:max_names])
+            if len(names) > max_names:
+                sample += _(' e mais %d') % (len(names) - max_names)
+            lines.append(_('%s (%d parcela(s)): %s') % (message, len(names), sample))
+        return '\n'.join(lines)
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+from psycopg2.extras import execute_values
+from odoo import models, fields, api
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Campos de pix.installment que alteram os agregados do painel
+SUMMARY_TRACKED_FIELDS = {'pix_status', 'amount', 'due_date', 'payment_id', 'company_id', 'currency_id'}
+
+SUMMARY_REBUILD_QUERY = """
+    INSERT INTO pix_dashboard_summary
+        (company_id, journal_id, currency_id, date, pix_status, installment_count, amount,
+         create_date, write_date)
+    SELECT i.company_id, p.journal_id, i.currency_id, i.due_date, i.pix_status,
+           count(*), sum(i.amount),
+           now() at time zone 'UTC', now() at time zone 'UTC'
+      FROM pix_installment i
+      JOIN account_payment p ON p.id = i.payment_id
+  GROUP BY i.company_id, p.journal_id, i.currency_id, i.due_date, i.pix_status
+"""
+
+# Deltas pendentes, só com INSERT: as transações de envio/sincronização não
+# disputam as linhas do resumo; o cron consolida os deltas periodicamente
+SUMMARY_DELTA_TABLE = """
+    CREATE TABLE IF NOT EXISTS pix_dashboard_summary_delta (
+        id bigserial PRIMARY KEY,
+        company_id integer NOT NULL,
+        journal_id integer NOT NULL,
+        currency_id integer NOT NULL,
+        date date NOT NULL,
+        pix_status varchar NOT NULL,
+        installment_count integer NOT NULL,
+        amount numeric NOT NULL
+    )
+"""
+
+# Remove os deltas visíveis e soma-os no resumo, em uma única instrução
+SUMMARY_FOLD_QUERY = """
+    WITH moved AS (
+        DELETE FROM pix_dashboard_summary_delta
+         RETURNING company_id, journal_id, currency_id, date, pix_status, installment_count, amount
+    )
+    INSERT INTO pix_dashboard_summary
+        (company_id, journal_id, currency_id, date, pix_status, installment_count, amount,
+         create_date, write_date)
+    SELECT company_id, journal_id, currency_id, date, pix_status,
+           sum(installment_count), sum(amount),
+           now() at time zone 'UTC', now() at time zone 'UTC'
+      FROM moved
+  GROUP BY company_id, journal_id, currency_id, date, pix_status
+    HAVING sum(installment_count) <> 0 OR sum(amount) <> 0
+    ON CONFLICT (company_id, journal_id, currency_id, date, pix_status) DO UPDATE SET
+        installment_count = pix_dashboard_summary.installment_count + EXCLUDED.installment_count,
+        amount = pix_dashboard_summary.amount + EXCLUDED.amount,
+        write_date = EXCLUDED.write_date
+"""
+
+
+class PixDashboardSummary(models.Model):
+    _name = 'pix.dashboard.summary'
+    _description = 'Resumo de Operações PIX'
+    _order = 'date desc, company_id, journal_id'
+
+    company_id = fields.Many2one(
+        'res.company',
+        string='Empresa',
+        required=True,
+        readonly=True,
+        index=True
+    )
+    journal_id = fields.Many2one(
+        'account.journal',
+        string='Diário',
+        required=True,
+        readonly=True
+    )
+    currency_id = fields.Many2one(
+        'res.currency',
+        string='Moeda',
+        required=True,
+        readonly=True
+    )
+    date = fields.Date(
+        string='Vencimento',
+        required=True,
+        readonly=True,
+        index=True
+    )
+    pix_status = fields.Selection(
+        [
+            ('draft', 'Rascunho'),
+            ('pending', 'Pendente'),
+            ('paid', 'Pago'),
+            ('failed', 'Falhou'),
+        ],
+        string='Status PIX',
+        required=True,
+        readonly=True
+    )
+    installment_count = fields.Integer(
+        string='Quantidade',
+        readonly=True,
+        aggregator='sum'
+    )
+    amount = fields.Monetary(
+        string='Valor',
+        currency_field='currency_id',
+        readonly=True,
+        aggregator='sum'
+    )
+
+    def init(self):
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS pix_dashboard_summary_key_uniq
+            ON pix_dashboard_summary (company_id, journal_id, currency_id, date, pix_status)
+        """)
+        self.env.cr.execute(SUMMARY_DELTA_TABLE)
+        # Na instalação (ou se o resumo estiver vazio) popula a partir das parcelas existentes
+        self.env.cr.execute("SELECT 1 FROM pix_dashboard_summary LIMIT 1")
+        if not self.env.cr.fetchone():
+            self.env.cr.execute(SUMMARY_REBUILD_QUERY)
+
+    @api.model
+    def _apply_delta(self, delta):
+        """Registra os deltas {(empresa, diário, moeda, data, status): [qtd, valor]} para o resumo
+
+        Um único INSERT na tabela de deltas por chamada, independente da quantidade
+        de chaves. Nenhuma linha do resumo é alterada nesta transação: os deltas
+        são somados pelo cron (_fold_deltas).
+        """
+        rows = [
+            key + (count, amount)
+            for key, (count, amount) in delta.items()
+            if count or amount
+        ]
+        if not rows:
+            return
+        execute_values(self.env.cr, """
+            INSERT INTO pix_dashboard_summary_delta
+                (company_id, journal_id, currency_id, date, pix_status, installment_count, amount)
+            VALUES %s
+        """, rows)
+
+    @api.model
+    def _fold_deltas(self):
+        """Soma no resumo os deltas registrados pelas parcelas e os remove"""
+        self.env.cr.execute(SUMMARY_FOLD_QUERY)
+        self.invalidate_model()
+        return True
+
+    @api.model
+    def _cron_fold_deltas(self):
+        self._fold_deltas()
+
+    @api.model
+    def _rebuild(self):
+        """Recalcula todo o resumo a partir das parcelas (correção de divergências)"""
+        self.env['pix.installment'].flush_model()
+        self.env['account.payment'].flush_model(['journal_id'])
+        self.env.cr.execute("DELETE FROM pix_dashboard_summary_delta")
+        self.env.cr.execute("DELETE FROM pix_dashboard_summary")
+        self.env.cr.execute(SUMMARY_REBUILD_QUERY)
+        self.invalidate_model()
+        _logger.info('Resumo de operações PIX recalculado.')
+        return True
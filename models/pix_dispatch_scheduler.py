@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+
+import math
+import time
+import uuid
+from datetime import datetime, timedelta
+from odoo import models, fields, api, _
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Intervalo padrão do agendamento, usado se o cron não for encontrado
+DISPATCH_TICK_MINUTES = 5
+
+# Fração do limite por minuto usada em uma execução (o restante é folga para outros envios)
+DISPATCH_TICK_USAGE = 0.8
+
+# Intervalo de reagendamento quando ainda há parcelas vencidas na fila (segundos)
+DISPATCH_REFILL_SECONDS = 60
+
+# Canais PostgreSQL sinalizados (com o id da empresa) quando há trabalho de envio ou sincronização
+DISPATCH_WAKEUP_CHANNEL = 'pix_dispatch_wakeup'
+SYNC_WAKEUP_CHANNEL = 'pix_sync_wakeup'
+
+# Atraso da sincronização disparada após um envio (a liquidação no SPI leva segundos)
+SYNC_WAKEUP_DELAY_SECONDS = 60
+
+
+class PixDispatchScheduler(models.AbstractModel):
+    _name = 'pix.dispatch.scheduler'
+    _description = 'Agendador de Envio PIX'
+
+    def _get_tick_seconds(self):
+        """Intervalo entre execuções do agendamento, em segundos"""
+        cron = self.env.ref('payment_itau_pix.ir_cron_dispatch_pix_installments', raise_if_not_found=False)
+        if not cron:
+            return DISPATCH_TICK_MINUTES * 60
+        unit_seconds = {'minutes': 60, 'hours': 3600, 'days': 86400, 'weeks': 604800}
+        return cron.interval_number * unit_seconds.get(cron.interval_type, 60)
+
+    def _get_rate_limit(self, company):
+        """Limite de requisições por minuto da empresa: soma dos limites das credenciais do pool"""
+        pool = self.env['base.payment.api'].with_company(company)._get_itau_pix_pool()
+        return sum(api_config.itau_pix_rate_limit or 60 for api_config in pool) or 60
+
+    def _get_dispatch_queue(self, company, with_overdue=False):
+        """Retorna as parcelas liberadas para envio, em ordem de prioridade
+
+        Liberadas: rascunho, vencendo até hoje + antecedência configurada, e na
+        fila de envio (ou empresa com envio automático). Prioridade: vencidas
+        primeiro, depois maior valor, depois vencimento.
+
+        :param with_overdue: também retorna a quantidade de vencidas (no início da fila)
+        """
+        today = fields.Date.context_today(self)
+        release_date = today + timedelta(days=company.pix_dispatch_lead_days or 0)
+        domain = [
+            ('company_id', '=', company.id),
+            ('pix_status', '=', 'draft'),
+            ('due_date', '<=', release_date),
+        ]
+        if not company.pix_auto_dispatch:
+            domain.append(('pix_queued', '=', True))
+
+        rows = self.env['pix.installment'].search_read(domain, ['due_date', 'amount'])
+        rows.sort(key=lambda r: (r['due_date'] >= today, -r['amount'], r['due_date'], r['id']))
+        queue = [row['id'] for row in rows]
+        if with_overdue:
+            return queue, sum(1 for row in rows if row['due_date'] < today)
+        return queue
+
+    def _get_tick_budget(self, queue_size, overdue_count, rate_limit, tick_seconds):
+        """Quantidade de envios desta execução
+
+        A capacidade de uma execução é o limite da API em um minuto (balde de
+        fichas reabastecido a cada minuto). Parcelas vencidas usam toda a
+        capacidade; as demais são distribuídas pelas execuções restantes do dia,
+        sem rajadas no horário do cron.
+        """
+        now = fields.Datetime.context_timestamp(self, fields.Datetime.now())
+        end_of_day = now.replace(hour=23, minute=59, second=59, microsecond=999999)
+        remaining_ticks = max(1, int((end_of_day - now).total_seconds() // tick_seconds))
+        capacity = max(1, int(rate_limit * DISPATCH_TICK_USAGE))
+        spread = math.ceil((queue_size - overdue_count) / remaining_ticks) if queue_size > overdue_count else 0
+        return min(capacity, overdue_count + spread)
+
+    def _send_installment(self, installment, payload=None):
+        """Envia uma parcela; em caso de erro, marca a parcela (e as do mesmo pagamento) como falha
+
+        :param payload: payload do pagamento já montado em lote
+        :return: True se o PIX foi enviado
+        """
+        try:
+            with self.env.cr.savepoint():
+                installment.action_send_pix(payload=payload)
+            return True
+        except Exception as e:
+            _logger.error(f'Erro no envio agendado da parcela PIX {installment.id}: {e}')
+            installment._with_payment_siblings().write({
+                'pix_status': 'failed',
+                'last_sync': fields.Datetime.now(),
+            })
+            installment.message_post(
+                body=_('Erro no envio agendado do PIX: %s') % str(e),
+                message_type='notification',
+            )
+            return False
+
+    def _dispatch_company(self, company):
+        """Envia as parcelas prioritárias da empresa, dentro da capacidade de um minuto da API
+
+        Os envios são espaçados em 60 / limite por minuto segundos, sem rajada no
+        horário do cron: o orçamento (no máximo DISPATCH_TICK_USAGE do limite)
+        termina antes do minuto seguinte. Se ainda restarem parcelas vencidas, o
+        cron é reagendado para quando a capacidade é reabastecida.
+        """
+        queue, overdue_count = self._get_dispatch_queue(company, with_overdue=True)
+        if not queue:
+            return 0
+
+        tick_seconds = self._get_tick_seconds()
+        rate_limit = self._get_rate_limit(company)
+        budget = self._get_tick_budget(len(queue), overdue_count, rate_limit, tick_seconds)
+        in_test_mode = self.env.registry.in_test_mode()
+
+        sent = 0
+        # Medições de tempo da execução agrupadas no mesmo lote
+        Installment = self.env['pix.installment'].with_company(company).with_context(
+            pix_timing_batch=uuid.uuid4().hex[:12],
+        )
+        # Identificadores e payloads da execução montados em lote
+        payloads = Installment.browse(queue[:budget]).payment_id._build_pix_payloads()
+        if not in_test_mode:
+            self.env.cr.commit()
+        interval = 60.0 / rate_limit
+        next_send = time.monotonic()
+        for installment_id in queue[:budget]:
+            installment = Installment.browse(installment_id)
+            if installment.pix_status != 'draft':
+                # Já enviada junto com outra parcela do mesmo pagamento (modo consolidado)
+                continue
+            wait = next_send - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            next_send = max(next_send, time.monotonic()) + interval
+            if self._send_installment(installment, payload=payloads.get(installment.payment_id.id)):
+                sent += 1
+            if not in_test_mode:
+                # O PIX já foi enviado ao banco: persiste antes do próximo envio
+                self.env.cr.commit()
+
+        if overdue_count > budget:
+            # Vencidas restantes: nova execução assim que a capacidade for reabastecida
+            at = fields.Datetime.now() + timedelta(seconds=DISPATCH_REFILL_SECONDS)
+            self._wakeup(
+                DISPATCH_WAKEUP_CHANNEL,
+                'payment_itau_pix.ir_cron_dispatch_pix_installments',
+                self.env['res.company'],
+                at=at.replace(microsecond=0),
+            )
+
+        _logger.info(
+            f'Envio agendado PIX ({company.name}): {sent} enviada(s) de {len(queue)} na fila '
+            f'({overdue_count} vencida(s)), orçamento {budget}.'
+        )
+        return sent
+
+    @api.model
+    def _wakeup(self, channel, cron_xmlid, companies, at=None):
+        """Acorda o cron e os workers que aguardam no canal
+
+        O gatilho do cron (ir.cron.trigger) é agendado para 'at' (ou imediato),
+        sem duplicar um gatilho futuro já agendado para o mesmo instante; o
+        NOTIFY no canal, com o id de cada empresa, só é enviado para trabalho
+        imediato. Ambos são entregues apenas no commit da transação.
+        """
+        cron = self.env.ref(cron_xmlid, raise_if_not_found=False)
+        if cron and not (at and self.env['ir.cron.trigger'].sudo().search_count(
+            [('cron_id', '=', cron.id), ('call_at', '=', at)], limit=1
+        )):
+            cron.sudo()._trigger(at)
+        if at is None or at <= fields.Datetime.now():
+            for company in companies:
+                self.env.cr.execute('SELECT pg_notify(%s, %s)', (channel, str(company.id)))
+
+    @api.model
+    def _wakeup_dispatch(self, installments):
+        """Sinaliza o envio das parcelas liberadas agora e agenda o das que vencem depois
+
+        Uma parcela é liberada à meia-noite do dia (vencimento - antecedência),
+        desde que esteja na fila ou a empresa use envio automático.
+        """
+        today = fields.Date.context_today(self)
+        immediate = self.env['res.company']
+        release_dates = set()
+        for installment in installments:
+            company = installment.company_id
+            if installment.pix_status != 'draft' or not (installment.pix_queued or company.pix_auto_dispatch):
+                continue
+            release_date = installment.due_date - timedelta(days=company.pix_dispatch_lead_days or 0)
+            if release_date <= today:
+                immediate |= company
+            else:
+                release_dates.add(release_date)
+
+        cron_xmlid = 'payment_itau_pix.ir_cron_dispatch_pix_installments'
+        if immediate:
+            self._wakeup(DISPATCH_WAKEUP_CHANNEL, cron_xmlid, immediate)
+        for release_date in release_dates:
+            self._wakeup(DISPATCH_WAKEUP_CHANNEL, cron_xmlid, self.env['res.company'],
+                         at=datetime.combine(release_date, datetime.min.time()))
+
+    @api.model
+    def _wakeup_sync(self, companies):
+        """Agenda a sincronização de status logo após um envio"""
+        if not companies:
+            return
+        # Arredondado ao minuto seguinte: envios do mesmo minuto compartilham o gatilho
+        at = fields.Datetime.now() + timedelta(seconds=SYNC_WAKEUP_DELAY_SECONDS + 60)
+        self._wakeup(
+            SYNC_WAKEUP_CHANNEL,
+            'payment_itau_pix.ir_cron_update_payments_itau_pix',
+            companies,
+            at=at.replace(second=0, microsecond=0),
+        )
+        # Workers dedicados decidem o próprio atraso a partir do sinal
+        for company in companies:
+            self.env.cr.execute('SELECT pg_notify(%s, %s)', (SYNC_WAKEUP_CHANNEL, str(company.id)))
+
+    @api.model
+    def _cron_dispatch_pix_installments(self):
+        """Envia as parcelas PIX liberadas, respeitando o limite de requisições de cada empresa"""
+        companies = self.env['res.company'].search([('itau_pix_api_id', '!=', False)])
+        for company in companies:
+            self.with_company(company)._dispatch_company(company)
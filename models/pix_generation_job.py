@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+
+from datetime import date
+from odoo import models, fields, api, _
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Quantidade de linhas processadas (e confirmadas) por vez
+GENERATION_CHUNK_SIZE = 200
+
+# Acima desta quantidade de linhas a geração é feita em segundo plano
+GENERATION_BACKGROUND_THRESHOLD = 200
+
+
+class PixGenerationJob(models.Model):
+    _name = 'pix.generation.job'
+    _description = 'Geração de Parcelas PIX em Lote'
+    _order = 'id desc'
+
+    name = fields.Char(
+        string='Referência',
+        required=True,
+        readonly=True,
+        default=lambda self: _('Geração PIX %s') % fields.Datetime.now().strftime('%d/%m/%Y %H:%M'),
+    )
+    company_id = fields.Many2one(
+        'res.company',
+        string='Empresa',
+        required=True,
+        readonly=True,
+        default=lambda self: self.env.company
+    )
+    user_id = fields.Many2one(
+        'res.users',
+        string='Responsável',
+        required=True,
+        readonly=True,
+        default=lambda self: self.env.user,
+        help='Usuário em nome de quem as parcelas são geradas'
+    )
+    state = fields.Selection([
+        ('queued', 'Na Fila'),
+        ('running', 'Em Execução'),
+        ('done', 'Concluído'),
+        ('failed', 'Falhou'),
+    ], string='Status', default='queued', required=True, readonly=True, index=True)
+    netting = fields.Boolean(
+        string='Consolidado',
+        readonly=True,
+        help='Gera um pagamento por fornecedor, conta bancária e vencimento'
+    )
+    memo = fields.Char(string='Memorando', readonly=True)
+    pending_line_ids = fields.Many2many(
+        'account.move.line',
+        'pix_generation_job_pending_line_rel',
+        'job_id',
+        'line_id',
+        string='Linhas Pendentes',
+        readonly=True,
+        help='Linhas de contas a pagar ainda não processadas (ponto de retomada)'
+    )
+    installment_ids = fields.Many2many(
+        'pix.installment',
+        'pix_generation_job_installment_rel',
+        'job_id',
+        'installment_id',
+        string='Parcelas Geradas',
+        readonly=True
+    )
+    total_count = fields.Integer(string='Total de Linhas', readonly=True)
+    processed_count = fields.Integer(string='Linhas Processadas', readonly=True)
+    progress = fields.Float(
+        string='Progresso',
+        compute='_compute_progress'
+    )
+    last_error = fields.Text(string='Último Erro', readonly=True)
+    date_start = fields.Datetime(string='Início', readonly=True)
+    date_done = fields.Datetime(string='Conclusão', readonly=True)
+
+    @api.depends('total_count', 'processed_count')
+    def _compute_progress(self):
+        for job in self:
+            job.progress = job.total_count and 100.0 * job.processed_count / job.total_count
+
+    @api.model
+    def _enqueue(self, lines, netting=False, memo=None):
+        """Cria um job para as linhas informadas e agenda sua execução imediata"""
+        job = self.create({
+            'company_id': lines.company_id[:1].id or self.env.company.id,
+            'netting': netting,
+            'memo': memo,
+            'pending_line_ids': [(6, 0, lines.ids)],
+            'total_count': len(lines),
+        })
+        job._trigger_processing()
+        return job
+
+    def _trigger_processing(self):
+        cron = self.env.ref('payment_itau_pix.ir_cron_process_pix_generation_jobs', raise_if_not_found=False)
+        if cron:
+            cron._trigger()
+
+    def _action_open_form(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Geração de Parcelas PIX'),
+            'res_model': 'pix.generation.job',
+            'view_mode': 'form',
+            'res_id': self.id,
+        }
+
+    def action_resume(self):
+        """Retoma jobs com falha a partir da última parte confirmada"""
+        jobs = self.filtered(lambda j: j.state == 'failed' and j.pending_line_ids)
+        jobs.write({'state': 'queued', 'last_error': False})
+        jobs._trigger_processing()
+        return True
+
+    def action_view_installments(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Parcelas PIX Geradas'),
+            'res_model': 'pix.installment',
+            'view_mode': 'list,form',
+            'domain': [('id', 'in', self.installment_ids.ids)],
+            'context': {'create': False},
+        }
+
+    def _lock(self):
+        """Bloqueia o job para esta transação; False se outro processo já o executa"""
+        self.env.cr.execute(
+            'SELECT id FROM pix_generation_job WHERE id = %s FOR UPDATE SKIP LOCKED',
+            (self.id,)
+        )
+        return bool(self.env.cr.fetchone())
+
+    def _next_chunk(self):
+        """Próxima parte a processar, ordenada por fornecedor e vencimento
+
+        No modo consolidado a parte é estendida até o fim do fornecedor da última
+        linha, para que um mesmo pagamento nunca seja dividido entre partes.
+        """
+        lines = self.pending_line_ids.sorted(
+            lambda l: (l.partner_id.id, l.date_maturity or date.min, l.id)
+        )
+        chunk = lines[:GENERATION_CHUNK_SIZE]
+        if self.netting and len(lines) > GENERATION_CHUNK_SIZE:
+            last_partner = chunk[-1].partner_id
+            chunk |= lines[GENERATION_CHUNK_SIZE:].filtered(lambda l: l.partner_id == last_partner)
+        return chunk
+
+    def _process_chunk(self, chunk):
+        Installment = self.env['pix.installment']
+        # Linhas pagas por outro meio desde o enfileiramento são apenas descartadas
+        lines = chunk.filtered(lambda l: not l.reconciled and l.parent_state == 'posted')
+        if self.netting:
+            installments = Installment._create_netted_installments(lines, memo=self.memo)
+        else:
+            installments = Installment._create_split_installments(lines, memo=self.memo)
+        lines.move_id.invalidate_recordset(['amount_residual', 'payment_state'])
+        self.write({
+            'pending_line_ids': [(3, line.id) for line in chunk],
+            'installment_ids': [(4, installment.id) for installment in installments],
+            'processed_count': self.processed_count + len(chunk),
+        })
+
+    def _process(self):
+        """Processa o job em partes, confirmando cada parte junto com seu checkpoint
+
+        Uma falha reverte apenas a parte em andamento; as partes anteriores ficam
+        gravadas e o job pode ser retomado de onde parou.
+        """
+        self.ensure_one()
+        cr = self.env.cr
+        in_test_mode = self.env.registry.in_test_mode()
+        job = self.with_user(self.user_id).with_company(self.company_id)
+
+        if not self._lock():
+            return False
+        self.write({
+            'state': 'running',
+            'date_start': self.date_start or fields.Datetime.now(),
+        })
+        if not in_test_mode:
+            cr.commit()
+
+        while True:
+            if not in_test_mode and not self._lock():
+                return False
+            chunk = job._next_chunk()
+            if not chunk:
+                break
+            try:
+                with cr.savepoint():
+                    job._process_chunk(chunk)
+            except Exception as e:
+                _logger.error(f'Erro na geração de parcelas PIX do job {self.id}: {e}', exc_info=True)
+                self.write({'state': 'failed', 'last_error': str(e)})
+                if not in_test_mode:
+                    cr.commit()
+                return False
+            if not in_test_mode:
+                cr.commit()
+
+        self.write({'state': 'done', 'date_done': fields.Datetime.now()})
+        if not in_test_mode:
+            cr.commit()
+        _logger.info(
+            f'Job de geração PIX {self.id} concluído: {len(self.installment_ids)} parcela(s) '
+            f'para {self.processed_count} linha(s).'
+        )
+        return True
+
+    @api.model
+    def _cron_process_generation_jobs(self):
+        """Processa os jobs na fila e retoma os interrompidos (ex.: queda do servidor)"""
+        for job in self.search([('state', 'in', ('queued', 'running'))], order='id'):
+            job._process()
@@ -2,16 +2,32 @@
 
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
-import json
+from .base_payment_api import PixOutcomeUnknown
+from .pix_dashboard_summary import SUMMARY_TRACKED_FIELDS
+from . import pix_json, pix_timing, pix_trace
 import logging
+import uuid
 
 _logger = logging.getLogger(__name__)
 
+# Gatilho que grava em xact_id a transação da última gravação da parcela
+INSTALLMENT_XACT_TRIGGER_FUNCTION = """
+    CREATE OR REPLACE FUNCTION pix_installment_set_xact_id() RETURNS trigger AS $$
+    BEGIN
+        NEW.xact_id := txid_current();
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+# Campos armazenados derivados da fatura/pagamento (calculados antes do INSERT)
+DERIVED_STORED_FIELDS = ('name', 'currency_id', 'partner_id', 'invoice_name', 'payment_name')
+
 
 class PixInstallment(models.Model):
     _name = 'pix.installment'
     _description = 'Parcela PIX'
-    _inherit = 'mail.thread'
+    _inherit = ['mail.thread', 'pix.timing.mixin']
     _order = 'due_date, id'
     _check_company_auto = True
 
@@ -19,6 +35,7 @@ class PixInstallment(models.Model):
         string='Nome',
         compute='_compute_name',
         store=True,
+        precompute=True,
         readonly=True
     )
     invoice_id = fields.Many2one(
@@ -47,6 +64,7 @@ class PixInstallment(models.Model):
         string='Moeda',
         compute='_compute_currency_id',
         store=True,
+        precompute=True,
         readonly=True,
         required=True
     )
@@ -80,14 +98,17 @@ class PixInstallment(models.Model):
     pix_txid = fields.Char(
         string='TXID PIX',
         copy=False,
+        index='btree_not_null',
         help='Identificador único da transação PIX'
     )
     pix_payload = fields.Text(
         string='Payload PIX',
+        prefetch=False,
         help='JSON completo do payload enviado para a API'
     )
     pix_response = fields.Text(
         string='Resposta PIX',
+        prefetch=False,
         help='JSON completo da resposta da API'
     )
     last_sync = fields.Datetime(
@@ -99,6 +120,51 @@ class PixInstallment(models.Model):
         copy=False,
         help='Data e hora em que o PIX foi confirmado como pago pela API'
     )
+    pix_sent_date = fields.Datetime(
+        string='Data de Envio',
+        copy=False,
+        readonly=True,
+        help='Data e hora em que a parcela passou para pendente (enviada ao banco)'
+    )
+    pix_stuck = fields.Boolean(
+        string='Travado',
+        copy=False,
+        readonly=True,
+        help='Parcela pendente há mais tempo que o limite configurado na empresa'
+    )
+    pix_queued = fields.Boolean(
+        string='Na Fila de Envio',
+        default=False,
+        copy=False,
+        index=True,
+        help='Parcela liberada para envio automático pelo agendador, conforme o vencimento'
+    )
+    pix_end_to_end_id = fields.Char(
+        string='End-to-End ID',
+        copy=False,
+        index=True,
+        help='Identificador End-to-End do PIX no SPI, retornado pela API'
+    )
+    pix_bank_match = fields.Selection(
+        [
+            ('matched', 'Conciliado no Extrato'),
+            ('amount_mismatch', 'Valor Divergente'),
+            ('missing', 'Não Encontrado no Extrato'),
+        ],
+        string='Conferência de Extrato',
+        copy=False,
+        index=True,
+        tracking=True,
+        help='Resultado da conferência da parcela com o extrato bancário importado'
+    )
+    pix_statement_line_id = fields.Many2one(
+        'account.bank.statement.line',
+        string='Linha do Extrato',
+        copy=False,
+        readonly=True,
+        ondelete='set null',
+        help='Linha do extrato bancário que comprova a liquidação do PIX'
+    )
     company_id = fields.Many2one(
         'res.company',
         string='Empresa',
@@ -110,6 +176,7 @@ class PixInstallment(models.Model):
         string='Fornecedor',
         related='invoice_id.partner_id',
         store=True,
+        precompute=True,
         readonly=True
     )
     
@@ -121,19 +188,57 @@ class PixInstallment(models.Model):
     )
     
     # Campos relacionados para facilitar visualização
+    # precompute: calculados em lote antes do INSERT, sem um UPDATE por parcela após a criação
     invoice_name = fields.Char(
         related='invoice_id.name',
         string='Número da Fatura',
         store=True,
+        precompute=True,
         readonly=True
     )
     payment_name = fields.Char(
         related='payment_id.name',
         string='Número do Pagamento',
         store=True,
+        precompute=True,
         readonly=True
     )
 
+    def init(self):
+        # Índices parciais: as varreduras de pendentes/falhas não dependem do tamanho do histórico
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS pix_installment_pending_sent_idx
+            ON pix_installment (company_id, pix_sent_date) WHERE pix_status = 'pending'
+        """)
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS pix_installment_failed_write_idx
+            ON pix_installment (company_id, write_date) WHERE pix_status = 'failed'
+        """)
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS pix_installment_paid_date_idx
+            ON pix_installment (company_id, pix_paid_date) WHERE pix_status = 'paid'
+        """)
+        # Início da varredura por data (updated_since) da consulta de status (pix.status.api)
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS pix_installment_write_date_id_idx
+            ON pix_installment (write_date, id)
+        """)
+        # Paginação da consulta de status na ordem de confirmação: xact_id guarda a
+        # transação que gravou a parcela por último (coluna fora do ORM, mantida por gatilho)
+        self.env.cr.execute("ALTER TABLE pix_installment ADD COLUMN IF NOT EXISTS xact_id bigint")
+        self.env.cr.execute(INSTALLMENT_XACT_TRIGGER_FUNCTION)
+        self.env.cr.execute("""
+            DROP TRIGGER IF EXISTS pix_installment_xact_id ON pix_installment;
+            CREATE TRIGGER pix_installment_xact_id
+            BEFORE INSERT OR UPDATE ON pix_installment
+            FOR EACH ROW EXECUTE PROCEDURE pix_installment_set_xact_id()
+        """)
+        self.env.cr.execute("UPDATE pix_installment SET xact_id = txid_current() WHERE xact_id IS NULL")
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS pix_installment_xact_id_idx
+            ON pix_installment (xact_id, id)
+        """)
+
     @api.depends('payment_id')
     def _compute_name(self):
         for record in self:
@@ -162,6 +267,68 @@ class PixInstallment(models.Model):
                 continue
             # A proteção real é feita no método unlink
 
+    def _get_summary_delta(self, sign=1):
+        """Agrega as parcelas nas chaves do resumo do painel PIX"""
+        delta = {}
+        for installment in self:
+            key = (
+                installment.company_id.id,
+                installment.payment_id.journal_id.id,
+                installment.currency_id.id,
+                installment.due_date,
+                installment.pix_status,
+            )
+            values = delta.setdefault(key, [0, 0.0])
+            values[0] += sign
+            values[1] += sign * installment.amount
+        return delta
+
+    @staticmethod
+    def _merge_summary_delta(*deltas):
+        merged = {}
+        for delta in deltas:
+            for key, (count, amount) in delta.items():
+                values = merged.setdefault(key, [0, 0.0])
+                values[0] += count
+                values[1] += amount
+        return merged
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        installments = super().create(vals_list)
+        self.env['pix.dashboard.summary']._apply_delta(installments._get_summary_delta())
+        self.env['pix.dispatch.scheduler']._wakeup_dispatch(installments)
+        return installments
+
+    def write(self, vals):
+        if 'pix_status' in vals:
+            vals = dict(vals)
+            if vals['pix_status'] != 'pending':
+                vals.setdefault('pix_stuck', False)
+            elif 'pix_sent_date' not in vals:
+                # Só a transição para pendente registra o envio: ressincronizações não a alteram
+                newly_sent = self.filtered(lambda i: i.pix_status != 'pending')
+                if newly_sent:
+                    super(PixInstallment, newly_sent).write({'pix_sent_date': fields.Datetime.now()})
+        if not SUMMARY_TRACKED_FIELDS.intersection(vals):
+            result = super().write(vals)
+        else:
+            before = self._get_summary_delta(sign=-1)
+            result = super().write(vals)
+            self.env['pix.dashboard.summary']._apply_delta(
+                self._merge_summary_delta(before, self._get_summary_delta())
+            )
+        self._wakeup_workers(vals)
+        return result
+
+    def _wakeup_workers(self, vals):
+        """Acorda o envio (parcela na fila ou com novo vencimento) ou a sincronização (parcela enviada)"""
+        scheduler = self.env['pix.dispatch.scheduler']
+        if vals.get('pix_status') == 'pending':
+            scheduler._wakeup_sync(self.company_id)
+        elif vals.get('pix_queued') or 'due_date' in vals or vals.get('pix_status') == 'draft':
+            scheduler._wakeup_dispatch(self)
+
     def unlink(self):
         """Impede deletar parcelas pagas"""
         paid_installments = self.filtered(lambda i: i.pix_status == 'paid')
@@ -170,120 +337,137 @@ class PixInstallment(models.Model):
                 _('Não é possível deletar parcelas PIX pagas. Parcelas: %s') %
                 ', '.join(paid_installments.mapped('name'))
             )
-        return super().unlink()
+        if self.env.context.get('pix_archiving'):
+            return super().unlink()
+        delta = self._get_summary_delta(sign=-1)
+        result = super().unlink()
+        self.env['pix.dashboard.summary']._apply_delta(delta)
+        return result
 
-    def action_send_pix(self):
-        """Envia o PIX para a API Itaú
-        
-        Apenas monta payload, chama API, salva JSON completo e muda status para pending.
-        Sem qualquer impacto contábil.
+    def action_view_pix_payload(self):
+        """Exibe o payload enviado, truncado conforme o limite do visualizador"""
+        self.ensure_one()
+        return self.env['pix.json.viewer']._open(self, 'pix_payload', _('Payload PIX - %s') % self.name)
+
+    def action_view_pix_response(self):
+        """Exibe a resposta da API, truncada conforme o limite do visualizador"""
+        self.ensure_one()
+        return self.env['pix.json.viewer']._open(self, 'pix_response', _('Resposta PIX - %s') % self.name)
+
+    def action_queue_pix(self):
+        """Coloca as parcelas na fila de envio agendado"""
+        to_queue = self.filtered(lambda i: i.pix_status in ('draft', 'failed'))
+        to_queue.write({
+            'pix_queued': True,
+            'pix_status': 'draft',
+        })
+        return True
+
+    def _check_pix_sendable(self):
+        """Validações do envio, sem efeitos colaterais (usadas também pela simulação)
+
+        Pagamentos em rascunho são aceitos: o envio os posta antes de chamar a API.
         """
         self.ensure_one()
-        
         if self.pix_status in ('pending', 'paid'):
             raise UserError(
                 _('Esta parcela já foi enviada. Status atual: %s') % self.pix_status
             )
-        
-        if not self.payment_id:
+
+        payment = self.payment_id
+        if not payment:
             raise UserError(_('A parcela deve estar vinculada a um pagamento.'))
+
+        # Estados válidos: posted, in_process (aguardando reconciliação), paid (já reconciliado)
+        if payment.state not in ('draft', 'posted', 'in_process', 'paid'):
+            raise UserError(
+                _('O pagamento deve estar postado antes de enviar o PIX. Estado atual: %s') %
+                payment.state
+            )
+
+        if payment.state != 'draft' and not payment.move_id:
+            raise UserError(
+                _('O lançamento contábil do pagamento deve estar postado. '
+                  'Estado do pagamento: %s, Estado do lançamento: %s') %
+                (payment.state, 'N/A')
+            )
+
+        if not payment.company_id.itau_pix_api_id:
+            raise UserError(
+                _('É necessário configurar a API Itaú PIX na empresa %s.') %
+                payment.company_id.name
+            )
+
+        if not payment.partner_bank_id:
+            raise UserError(
+                _('É necessário configurar uma conta bancária do fornecedor no pagamento.')
+            )
+
+    @pix_timing.profiled('send')
+    @pix_trace.traced('pix.send_installment', phase='orm', key=lambda self, *args, **kwargs: self.payment_id.pix_correlation_id)
+    def action_send_pix(self, payload=None):
+        """Envia o PIX para a API Itaú
         
+        Apenas monta payload, chama API, salva JSON completo e muda status para pending.
+        Sem qualquer impacto contábil.
+
+        :param payload: payload do pagamento já montado (envio em lote); quando omitido é montado aqui
+        """
+        self.ensure_one()
+        self._check_pix_sendable()
         payment = self.payment_id
         
-        # Validações e garante que o payment está postado
-        # Estados válidos: posted, in_process (aguardando reconciliação), paid (já reconciliado)
+        # Garante que o payment está postado
         if payment.state == 'draft':
             # Tenta postar automaticamente se estiver em draft
-            payment.action_post()
-        elif payment.state not in ('posted', 'in_process', 'paid'):
-            raise UserError(
-                _('O pagamento deve estar postado antes de enviar o PIX. Estado atual: %s') % 
-                payment.state
-            )
+            with pix_timing.phase('posting'):
+                payment.action_post()
         
         # Verifica se o move_id está postado
         if not payment.move_id or payment.move_id.state != 'posted':
-            if payment.state in ('posted', 'in_process', 'paid') and payment.move_id and payment.move_id.state != 'posted':
+            if payment.move_id:
                 # Tenta postar o move se o payment estiver postado mas o move não
                 payment.move_id._post(soft=False)
             else:
                 raise UserError(
                     _('O lançamento contábil do pagamento deve estar postado. '
                       'Estado do pagamento: %s, Estado do lançamento: %s') %
-                    (payment.state, payment.move_id.state if payment.move_id else 'N/A')
+                    (payment.state, 'N/A')
                 )
         
-        if not payment.company_id.itau_pix_api_id:
-            raise UserError(
-                _('É necessário configurar a API Itaú PIX na empresa %s.') % 
-                payment.company_id.name
-            )
-        
-        if not payment.partner_bank_id:
-            raise UserError(
-                _('É necessário configurar uma conta bancária do fornecedor no pagamento.')
-            )
-        
+        # Parcelas consolidadas no mesmo pagamento são enviadas em uma única transferência
+        installments = self._with_payment_siblings()
+
         try:
             # Monta o payload usando o método existente do account.payment
-            payload = payment._build_pix_payload_from_payment()
-            
+            if payload is None:
+                payload = payment._build_pix_payload_from_payment()
+
             # Salva o payload antes de enviar
-            self.pix_payload = json.dumps(payload, indent=2, ensure_ascii=False)
+            payload_json = pix_json.dumps(payload)
+            installments.pix_payload = payload_json
             
             # Envia via API
             base_payment_api = self.env['base.payment.api']
             pix_data = base_payment_api.send_pix(
                 payload,
                 payment_id=payment.id,
-                move_line_id=None
+                move_line_id=None,
+                payload_json=payload_json,
             )
-            
-            # Atualiza campos do payment
-            payment.write({
-                'pix_txid': pix_data.get('txid') or payment.pix_txid,
-                'pix_correlation_id': pix_data.get('correlation_id') or payment.pix_correlation_id,
-                'pix_raw_response': pix_data.get('json_response_str', ''),
-                'pix_status': 'pending',
-                'pix_last_sync': fields.Datetime.now(),
-            })
-            
-            # Salva resposta completa no installment
-            self.pix_response = pix_data.get('json_response_str', '')
-            self.pix_txid = pix_data.get('txid', '')
-            self.pix_status = 'pending'
-            self.last_sync = fields.Datetime.now()
-            
-            # Registra no chatter
-            self.message_post(
-                body=_('PIX enviado com sucesso para o Itaú. TXID: %s') % (self.pix_txid or 'N/A'),
-                message_type='notification',
-            )
-            payment.message_post(
-                body=_('PIX enviado via parcela %s. TXID: %s') % (self.name, self.pix_txid or 'N/A'),
-                message_type='notification',
-            )
-            
-            return {
-                'type': 'ir.actions.client',
-                'tag': 'display_notification',
-                'params': {
-                    'title': _('Sucesso'),
-                    'message': _('PIX enviado com sucesso. TXID: %s') % (self.pix_txid or 'N/A'),
-                    'type': 'success',
-                    'sticky': False,
-                }
-            }
-            
+        except PixOutcomeUnknown as e:
+            return installments._mark_pix_send_uncertain(e.args[0])
         except Exception as e:
             _logger.error(
                 f'Erro ao enviar PIX para a parcela {self.id}: {e}',
                 exc_info=True
             )
             
-            self.pix_status = 'failed'
-            self.last_sync = fields.Datetime.now()
-            
+            installments.write({
+                'pix_status': 'failed',
+                'last_sync': fields.Datetime.now(),
+            })
+
             error_msg = str(e)
             if isinstance(e, (UserError, ValidationError)):
                 error_msg = e.name if hasattr(e, 'name') else str(e)
@@ -297,6 +481,88 @@ class PixInstallment(models.Model):
                 raise
             raise UserError(_('Erro ao enviar o PIX: %s') % error_msg)
 
+        try:
+            with self.env.cr.savepoint():
+                # Atualiza campos do payment
+                payment.write({
+                    'pix_txid': pix_data.get('txid') or payment.pix_txid,
+                    'pix_correlation_id': pix_data.get('correlation_id') or payment.pix_correlation_id,
+                    'pix_raw_response': pix_data.get('json_response_str', ''),
+                    'pix_status': 'pending',
+                    'pix_last_sync': fields.Datetime.now(),
+                })
+
+                # Salva resposta completa no installment
+                installments.write({
+                    'pix_response': pix_data.get('json_response_str', ''),
+                    'pix_txid': pix_data.get('txid', ''),
+                    'pix_status': 'pending',
+                    'last_sync': fields.Datetime.now(),
+                })
+
+                # Registra no chatter
+                self.message_post(
+                    body=_('PIX enviado com sucesso para o Itaú. TXID: %s') % (self.pix_txid or 'N/A'),
+                    message_type='notification',
+                )
+                payment.message_post(
+                    body=_('PIX enviado via parcela %s. TXID: %s') % (self.name, self.pix_txid or 'N/A'),
+                    message_type='notification',
+                )
+        except Exception as e:
+            # O Itaú já aceitou a transferência: a parcela nunca volta para rascunho nem falha
+            _logger.error(f'PIX da parcela {self.id} enviado, mas o registro do envio falhou: {e}', exc_info=True)
+            return installments._mark_pix_send_uncertain(
+                _('PIX enviado, mas o registro do envio falhou: %s') % str(e)
+            )
+
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Sucesso'),
+                'message': _('PIX enviado com sucesso. TXID: %s') % (self.pix_txid or 'N/A'),
+                'type': 'success',
+                'sticky': False,
+            }
+        }
+
+    def _mark_pix_send_uncertain(self, reason):
+        """Marca como pendentes as parcelas cujo envio pode ter chegado ao banco
+
+        A parcela não volta para rascunho nem é marcada como falha (o que
+        permitiria reenviá-la): a sincronização de status confirma o resultado
+        pelo TXID, já gravado antes do envio.
+        """
+        now = fields.Datetime.now()
+        for payment in self.payment_id:
+            payment.write({
+                'pix_status': 'pending',
+                'pix_last_sync': now,
+            })
+            self.filtered(lambda i: i.payment_id == payment).write({
+                'pix_txid': payment.pix_txid,
+                'pix_status': 'pending',
+                'last_sync': now,
+            })
+        for installment in self:
+            installment.message_post(
+                body=_('Resultado do envio PIX incerto: %s') % reason,
+                message_type='notification',
+            )
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Aviso'),
+                'message': _('Resultado do envio PIX incerto: %s') % reason,
+                'type': 'warning',
+                'sticky': True,
+            }
+        }
+
+    @pix_timing.profiled('sync')
+    @pix_trace.traced('pix.sync_installment', phase='orm', key=lambda self: self.payment_id.pix_correlation_id)
     def action_sync_pix_status(self):
         """Sincroniza o status do PIX com a API Itaú
         
@@ -341,7 +607,10 @@ class PixInstallment(models.Model):
             
             status = api_status.lower()
             self.last_sync = fields.Datetime.now()
-            self.pix_response = json.dumps(api_return, indent=2, ensure_ascii=False)
+            self.pix_response = pix_json.dumps(api_return)
+            end_to_end_id = base_payment_api._extract_end_to_end_id(api_return)
+            if end_to_end_id:
+                self._with_payment_siblings().pix_end_to_end_id = end_to_end_id
             
             # Atualiza apenas o estado PIX, nunca o estado contábil
             if status == 'efetuado':
@@ -358,93 +627,11 @@ class PixInstallment(models.Model):
                         }
                     }
                 
-                # Marca como pago e registra a data de confirmação
-                paid_datetime = fields.Datetime.now()
-                self.write({
-                    'pix_status': 'paid',
-                    'pix_paid_date': paid_datetime,
-                })
-                payment.write({
-                    'pix_status': 'paid',
-                    'pix_last_sync': paid_datetime,
-                })
-                
-                # Garante que o pagamento está postado
-                if payment.state != 'posted':
-                    payment.action_post()
-                
-                if not payment.move_id or payment.move_id.state != 'posted':
-                    raise UserError(
-                        _('O lançamento contábil do pagamento deve estar postado para criar a liquidação.')
-                    )
-                
-                # Cria lançamento de liquidação: débito conta transitória PIX, crédito banco
-                company = payment.company_id
-                if not company.pix_transit_account_id:
-                    raise UserError(
-                        _('É necessário configurar a conta transitória PIX na empresa %s.') %
-                        company.name
-                    )
-                
-                if not payment.journal_id.default_account_id:
-                    raise UserError(
-                        _('O diário %s não possui conta padrão configurada.') %
-                        payment.journal_id.name
-                    )
-                
-                # Cria o lançamento de liquidação
-                transit_account = company.pix_transit_account_id
-                bank_account = payment.journal_id.default_account_id
-                amount = abs(payment.amount)
-                
-                # Cria move de liquidação
-                liquidation_move = self.env['account.move'].create({
-                    'move_type': 'entry',
-                    'date': fields.Date.today(),
-                    'journal_id': payment.journal_id.id,
-                    'company_id': company.id,
-                    'ref': _('Liquidação PIX - %s') % payment.name,
-                    'line_ids': [
-                        (0, 0, {
-                            'name': _('Liquidação PIX - %s') % payment.name,
-                            'account_id': transit_account.id,
-                            'debit': amount,
-                            'credit': 0.0,
-                            'partner_id': payment.partner_id.id,
-                            'currency_id': payment.currency_id.id,
-                        }),
-                        (0, 0, {
-                            'name': _('Liquidação PIX - %s') % payment.name,
-                            'account_id': bank_account.id,
-                            'debit': 0.0,
-                            'credit': amount,
-                            'partner_id': payment.partner_id.id,
-                            'currency_id': payment.currency_id.id,
-                        }),
-                    ],
-                })
-                
-                liquidation_move._post()
-                
-                # Vincula o lançamento ao payment (através de referência)
-                payment.message_post(
-                    body=_(
-                        'PIX confirmado como pago pela API. '
-                        'Lançamento de liquidação criado: %s'
-                    ) % liquidation_move._get_html_link(),
-                    message_type='notification',
-                )
-                
-                self.message_post(
-                    body=_(
-                        'PIX confirmado como pago pela API. '
-                        'Lançamento de liquidação: %s'
-                    ) % liquidation_move._get_html_link(),
-                    message_type='notification',
-                )
-                
+                # Marca como pago e cria o lançamento de liquidação
+                self._mark_pix_paid()
+
                 # NÃO mexe em reconciliação existente - ela já foi feita na criação do payment
-                
+
                 return {
                     'type': 'ir.actions.client',
                     'tag': 'display_notification',
@@ -457,15 +644,7 @@ class PixInstallment(models.Model):
                 }
                 
             elif status == 'não efetuado':
-                self.pix_status = 'failed'
-                payment.write({
-                    'pix_status': 'failed',
-                    'pix_last_sync': fields.Datetime.now(),
-                })
-                self.message_post(
-                    body=_('Pagamento PIX não efetuado pela API'),
-                    message_type='notification',
-                )
+                self._mark_pix_failed()
                 return {
                     'type': 'ir.actions.client',
                     'tag': 'display_notification',
@@ -512,3 +691,464 @@ class PixInstallment(models.Model):
                 raise
             raise UserError(_('Erro ao sincronizar status do PIX: %s') % error_msg)
 
+    def _prepare_liquidation_move_vals(self):
+        """Prepara os valores do lançamento de liquidação: débito conta transitória PIX, crédito banco"""
+        self.ensure_one()
+        payment = self.payment_id
+
+        if not payment.move_id or payment.move_id.state != 'posted':
+            raise UserError(
+                _('O lançamento contábil do pagamento deve estar postado para criar a liquidação.')
+            )
+
+        company = payment.company_id
+        if not company.pix_transit_account_id:
+            raise UserError(
+                _('É necessário configurar a conta transitória PIX na empresa %s.') %
+                company.name
+            )
+
+        if not payment.journal_id.default_account_id:
+            raise UserError(
+                _('O diário %s não possui conta padrão configurada.') %
+                payment.journal_id.name
+            )
+
+        transit_account = company.pix_transit_account_id
+        bank_account = payment.journal_id.default_account_id
+        amount = abs(payment.amount)
+
+        return {
+            'move_type': 'entry',
+            'date': fields.Date.today(),
+            'journal_id': payment.journal_id.id,
+            'company_id': company.id,
+            'ref': _('Liquidação PIX - %s') % payment.name,
+            'line_ids': [
+                (0, 0, {
+                    'name': _('Liquidação PIX - %s') % payment.name,
+                    'account_id': transit_account.id,
+                    'debit': amount,
+                    'credit': 0.0,
+                    'partner_id': payment.partner_id.id,
+                    'currency_id': payment.currency_id.id,
+                }),
+                (0, 0, {
+                    'name': _('Liquidação PIX - %s') % payment.name,
+                    'account_id': bank_account.id,
+                    'debit': 0.0,
+                    'credit': amount,
+                    'partner_id': payment.partner_id.id,
+                    'currency_id': payment.currency_id.id,
+                }),
+            ],
+        }
+
+    def _with_payment_siblings(self):
+        """Retorna as parcelas junto com as demais parcelas dos mesmos pagamentos
+
+        No modo consolidado várias parcelas compartilham um único pagamento/PIX,
+        portanto qualquer transição de status vale para todas elas.
+        """
+        return self | self.payment_id.pix_installment_ids
+
+    def _mark_pix_paid(self):
+        """Marca as parcelas como pagas e cria os lançamentos de liquidação em lote
+
+        Os status são gravados com um único write por modelo e todos os
+        lançamentos de liquidação são criados e postados de uma só vez,
+        um por pagamento (parcelas consolidadas são liquidadas juntas).
+        """
+        installments = self._with_payment_siblings().filtered(lambda i: i.pix_status != 'paid')
+        if not installments:
+            return self.env['account.move']
+
+        paid_datetime = fields.Datetime.now()
+        payments = installments.payment_id
+        installments.write({
+            'pix_status': 'paid',
+            'pix_paid_date': paid_datetime,
+            'last_sync': paid_datetime,
+        })
+        payments.write({
+            'pix_status': 'paid',
+            'pix_last_sync': paid_datetime,
+        })
+
+        # Garante que os pagamentos estão postados
+        payments.filtered(lambda p: p.state != 'posted').action_post()
+
+        # Uma liquidação por pagamento, usando a primeira parcela de cada um
+        first_by_payment = {}
+        for installment in installments:
+            first_by_payment.setdefault(installment.payment_id.id, installment)
+        leaders = self.browse([installment.id for installment in first_by_payment.values()])
+
+        trace_key = payments.pix_correlation_id if len(payments) == 1 else None
+        with pix_trace.span('pix.liquidation', key=trace_key, phase='posting', **{'pix.payment_count': len(payments)}):
+            with pix_timing.phase('posting'):
+                liquidation_moves = self.env['account.move'].create([
+                    leader._prepare_liquidation_move_vals() for leader in leaders
+                ])
+                liquidation_moves._post()
+
+        for leader, liquidation_move in zip(leaders, liquidation_moves):
+            leader.payment_id.message_post(
+                body=_(
+                    'PIX confirmado como pago pela API. '
+                    'Lançamento de liquidação criado: %s'
+                ) % liquidation_move._get_html_link(),
+                message_type='notification',
+            )
+            for installment in installments.filtered(lambda i: i.payment_id == leader.payment_id):
+                installment.message_post(
+                    body=_(
+                        'PIX confirmado como pago pela API. '
+                        'Lançamento de liquidação: %s'
+                    ) % liquidation_move._get_html_link(),
+                    message_type='notification',
+                )
+
+        return liquidation_moves
+
+    def _mark_pix_failed(self):
+        """Marca as parcelas como não efetuadas em lote"""
+        installments = self._with_payment_siblings()
+        if not installments:
+            return
+        now = fields.Datetime.now()
+        installments.write({
+            'pix_status': 'failed',
+            'last_sync': now,
+        })
+        installments.payment_id.write({
+            'pix_status': 'failed',
+            'pix_last_sync': now,
+        })
+        for installment in installments:
+            installment.message_post(
+                body=_('Pagamento PIX não efetuado pela API'),
+                message_type='notification',
+            )
+
+    def _reconcile_pix_status_bulk(self):
+        """Concilia o status das parcelas pendentes pela listagem paginada SISPAG
+
+        Monta um índice TXID -> parcela, percorre a listagem da API página a página
+        e aplica as transições em lote. As parcelas não encontradas na listagem
+        são sincronizadas individualmente por TXID (fallback).
+        """
+        installments = self.filtered(lambda i: i.pix_status == 'pending' and i.payment_id.pix_txid)
+        if not installments:
+            return
+
+        base_payment_api = self.env['base.payment.api']
+        pool = base_payment_api._get_itau_pix_pool()
+        api_config = pool[0] if pool else base_payment_api
+
+        index = {installment.payment_id.pix_txid: installment for installment in installments}
+        paid_ids, failed_ids = [], []
+        responses = {}
+
+        if api_config.itau_pix_bulk_listing:
+            date_from = min(installments.payment_id.mapped('date') or [fields.Date.today()])
+            date_to = fields.Date.today()
+            try:
+                for item in base_payment_api.list_payments_pix(date_from, date_to):
+                    txid, status = base_payment_api._parse_pix_listing_item(item)
+                    installment = index.pop(txid, None)
+                    if not installment:
+                        continue
+                    if status == 'efetuado':
+                        paid_ids.append(installment.id)
+                        responses[installment.id] = item
+                    elif status == 'não efetuado':
+                        failed_ids.append(installment.id)
+                        responses[installment.id] = item
+                    if not index:
+                        break
+            except (UserError, ValidationError) as e:
+                # Falha na listagem: todas as parcelas restantes seguem pelo fallback
+                _logger.warning(f'Listagem SISPAG indisponível, usando consulta por TXID: {e}')
+
+            for installment_id, item in responses.items():
+                self.browse(installment_id).write({
+                    'pix_response': pix_json.dumps(item),
+                    'pix_end_to_end_id': base_payment_api._extract_end_to_end_id(item) or False,
+                })
+            self.browse(paid_ids)._mark_pix_paid()
+            self.browse(failed_ids)._mark_pix_failed()
+            _logger.info(
+                f'Conciliação PIX em lote: {len(paid_ids)} paga(s), {len(failed_ids)} não efetuada(s), '
+                f'{len(index)} sem correspondência na listagem.'
+            )
+
+        # Fallback: consulta individual por TXID para as parcelas não encontradas
+        for installment in index.values():
+            try:
+                with self.env.cr.savepoint():
+                    installment.action_sync_pix_status()
+            except Exception as e:
+                _logger.error(f'Erro ao sincronizar status PIX da parcela {installment.id}: {e}')
+
+    @api.model
+    def _cron_reconcile_pix_status(self):
+        """Concilia o status de todas as parcelas PIX pendentes, por empresa
+
+        Cada empresa é conciliada em um savepoint: um erro em uma empresa é
+        registrado e não impede a conciliação das demais.
+        """
+        installments = self.search([
+            ('pix_status', '=', 'pending'),
+            ('payment_id.pix_txid', '!=', False),
+        ])
+        for company in installments.company_id:
+            try:
+                with self.env.cr.savepoint():
+                    installments.filtered(
+                        lambda i: i.company_id == company
+                    ).with_company(company)._reconcile_pix_status_bulk()
+            except Exception as e:
+                _logger.error(f'Erro ao conciliar o status PIX das parcelas da empresa {company.name}: {e}', exc_info=True)
+
+    @api.model
+    def _create_split_installments(self, lines, memo=None):
+        """Cria uma parcela PIX (com seu pagamento) para cada linha de contas a pagar
+
+        Cada pagamento é postado e reconciliado apenas com a sua linha.
+        """
+        installments = self.browse()
+        for line in lines:
+            amount = abs(line.amount_residual)
+            if amount <= 0:
+                continue
+
+            invoice = line.move_id
+            company = invoice.company_id
+            due_date = line.date_maturity or invoice.invoice_date_due or fields.Date.today()
+
+            # Cria o payment
+            payment = self.env['account.payment'].create({
+                'payment_type': 'outbound',
+                'partner_type': 'supplier',
+                'partner_id': invoice.partner_id.id,
+                'amount': amount,
+                'currency_id': invoice.currency_id.id,
+                'date': fields.Date.today(),
+                'journal_id': company.pix_journal_id.id,
+                'company_id': company.id,
+                'is_pix': True,
+                'payment_reference': _('Parcela PIX - %s') % invoice.name,
+                'memo': memo,
+                # Chave do rastreamento (trace) de todo o ciclo de vida do PIX
+                'pix_correlation_id': str(uuid.uuid4()),
+            })
+
+            # Vincula invoice ao payment
+            payment.invoice_ids = [(4, invoice.id)]
+
+            # Posta o payment
+            with pix_trace.span('pix.post_payment', key=payment.pix_correlation_id, phase='posting'):
+                payment.action_post()
+
+            # Verifica se foi postado corretamente
+            payment.invalidate_recordset(['state', 'move_id'])
+            if payment.state not in ('posted', 'in_process'):
+                raise UserError(
+                    _('Erro ao postar o pagamento. Estado atual: %s') % payment.state
+                )
+            if not payment.move_id or payment.move_id.state != 'posted':
+                raise UserError(
+                    _('Erro ao postar o lançamento contábil do pagamento. '
+                      'Estado do lançamento: %s') %
+                    (payment.move_id.state if payment.move_id else 'N/A')
+                )
+
+            # Cria a parcela
+            installment = self.create({
+                'invoice_id': invoice.id,
+                'payment_id': payment.id,
+                'amount': amount,
+                'due_date': due_date,
+                'pix_status': 'draft',
+                'company_id': company.id,
+                'currency_id': invoice.currency_id.id,  # Define explicitamente para evitar erro de campo obrigatório
+            })
+
+            # Vincula installment ao payment
+            payment.write({
+                'pix_installment_id': installment.id,
+                'pix_status': 'draft',
+            })
+
+            installments |= installment
+
+            # Reconciliação automática apenas com a linha selecionada
+            payment_lines = payment.move_id.line_ids.filtered(
+                lambda l: l.account_id.account_type == 'liability_payable'
+                         and not l.reconciled
+                         and l.partner_id == payment.partner_id
+                         and l.parent_state == 'posted'
+            )
+            invoice_lines = line.filtered(
+                lambda l: not l.reconciled
+                         and l.partner_id == payment.partner_id
+                         and l.parent_state == 'posted'
+            )
+            for account in payment_lines.account_id:
+                to_reconcile = (payment_lines | invoice_lines).filtered(
+                    lambda l: l.account_id == account
+                )
+                if len(to_reconcile) < 2:
+                    continue
+                try:
+                    to_reconcile.filtered(
+                        lambda l: not l.reconciled and l.parent_state == 'posted'
+                    ).reconcile()
+                    invoice.matched_payment_ids |= payment
+                except Exception as e:
+                    _logger.error(
+                        f'Erro ao reconciliar payment {payment.id} com invoice {invoice.id}: {e}',
+                        exc_info=True
+                    )
+
+        return installments
+
+    @api.model
+    def _create_netted_installments(self, lines, memo=None):
+        """Cria parcelas PIX consolidadas a partir de linhas de contas a pagar
+
+        Agrupa as linhas por empresa, fornecedor, conta bancária do fornecedor, moeda
+        e vencimento, criando um único pagamento (e portanto uma única transferência PIX)
+        por grupo. Cada linha continua com sua própria parcela, vinculada ao pagamento
+        do grupo, e todas as linhas do grupo são reconciliadas com esse pagamento.
+
+        O valor do grupo é o saldo líquido: créditos do fornecedor (ex.: devoluções)
+        abatem as linhas em aberto, começando pelas de vencimento mais distante.
+        Grupos sem saldo a pagar são ignorados.
+        """
+        groups = {}
+        for line in lines.sorted(lambda l: (l.date_maturity or fields.Date.today(), l.id)):
+            if line.company_currency_id.is_zero(line.amount_residual):
+                continue
+            invoice = line.move_id
+            due_date = line.date_maturity or invoice.invoice_date_due or fields.Date.today()
+            key = (
+                invoice.company_id.id,
+                line.partner_id.id,
+                invoice.partner_bank_id.id,
+                invoice.currency_id.id,
+                due_date,
+            )
+            groups.setdefault(key, self.env['account.move.line'])
+            groups[key] |= line
+
+        installments = self.browse()
+        for (company_id, partner_id, partner_bank_id, currency_id, due_date), group_lines in groups.items():
+            company = self.env['res.company'].browse(company_id)
+            invoices = group_lines.move_id
+
+            # Linhas de contas a pagar têm saldo negativo; créditos do fornecedor, positivo
+            amount = -sum(group_lines.mapped('amount_residual'))
+            if company.currency_id.compare_amounts(amount, 0) <= 0:
+                _logger.warning(
+                    f'Grupo PIX consolidado sem saldo a pagar ({amount}) para o parceiro {partner_id} '
+                    f'e as faturas {invoices.ids}: nenhum pagamento criado.'
+                )
+                continue
+            installment_amounts = self._allocate_netted_amounts(group_lines)
+
+            payment_vals = {
+                'payment_type': 'outbound',
+                'partner_type': 'supplier',
+                'partner_id': partner_id,
+                'amount': amount,
+                'currency_id': currency_id,
+                'date': fields.Date.today(),
+                'journal_id': company.pix_journal_id.id,
+                'company_id': company.id,
+                'is_pix': True,
+                'payment_reference': _('Parcela PIX - %s') % ', '.join(invoices.mapped('name')),
+                'memo': memo,
+                # Chave do rastreamento (trace) de todo o ciclo de vida do PIX
+                'pix_correlation_id': str(uuid.uuid4()),
+            }
+            if partner_bank_id:
+                payment_vals['partner_bank_id'] = partner_bank_id
+
+            payment = self.env['account.payment'].create(payment_vals)
+            payment.invoice_ids = [(4, invoice.id) for invoice in invoices]
+            with pix_trace.span('pix.post_payment', key=payment.pix_correlation_id, phase='posting'):
+                payment.action_post()
+
+            payment.invalidate_recordset(['state', 'move_id'])
+            if payment.state not in ('posted', 'in_process'):
+                raise UserError(
+                    _('Erro ao postar o pagamento. Estado atual: %s') % payment.state
+                )
+            if not payment.move_id or payment.move_id.state != 'posted':
+                raise UserError(
+                    _('Erro ao postar o lançamento contábil do pagamento. '
+                      'Estado do lançamento: %s') %
+                    (payment.move_id.state if payment.move_id else 'N/A')
+                )
+
+            group_installments = self.create([{
+                'invoice_id': line.move_id.id,
+                'payment_id': payment.id,
+                'amount': line_amount,
+                'due_date': due_date,
+                'pix_status': 'draft',
+                'company_id': company.id,
+                'currency_id': currency_id,
+            } for line, line_amount in installment_amounts])
+
+            payment.write({
+                'pix_installment_id': group_installments[0].id,
+                'pix_status': 'draft',
+            })
+
+            # Reconcilia o pagamento consolidado com todas as linhas do grupo
+            payment_lines = payment.move_id.line_ids.filtered(
+                lambda l: l.account_id.account_type == 'liability_payable'
+                         and not l.reconciled
+                         and l.partner_id == payment.partner_id
+                         and l.parent_state == 'posted'
+            )
+            for account in payment_lines.account_id:
+                to_reconcile = (payment_lines | group_lines).filtered(
+                    lambda l: l.account_id == account
+                             and not l.reconciled
+                             and l.parent_state == 'posted'
+                )
+                try:
+                    to_reconcile.reconcile()
+                    for invoice in invoices:
+                        invoice.matched_payment_ids |= payment
+                except Exception as e:
+                    _logger.error(
+                        f'Erro ao reconciliar payment {payment.id} com as faturas {invoices.ids}: {e}',
+                        exc_info=True
+                    )
+
+            installments |= group_installments
+
+        return installments
+
+    @api.model
+    def _allocate_netted_amounts(self, group_lines):
+        """Valor de cada parcela de um grupo consolidado: [(linha, valor), ...]
+
+        Os créditos do grupo abatem as linhas a pagar a partir da última (as linhas
+        chegam ordenadas por vencimento); linhas totalmente abatidas não geram
+        parcela, mas são reconciliadas com o pagamento do grupo.
+        """
+        credit = sum(line.amount_residual for line in group_lines if line.amount_residual > 0)
+        allocation = []
+        for line in reversed(group_lines.filtered(lambda l: l.amount_residual < 0)):
+            line_amount = -line.amount_residual
+            used = min(credit, line_amount)
+            credit -= used
+            if not line.company_currency_id.is_zero(line_amount - used):
+                allocation.append((line, line_amount - used))
+        return allocation[::-1]
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+
+import base64
+import zlib
+from datetime import timedelta
+from odoo import models, fields, api
+from . import pix_json
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Quantidade de parcelas movidas para o arquivo por transação
+ARCHIVE_CHUNK_SIZE = 500
+
+# Campos copiados da parcela para o arquivo sem transformação
+ARCHIVE_COPIED_FIELDS = [
+    'name', 'invoice_id', 'payment_id', 'amount', 'currency_id', 'due_date', 'pix_status',
+    'pix_txid', 'pix_end_to_end_id', 'pix_paid_date', 'pix_sent_date', 'last_sync',
+    'company_id', 'partner_id', 'invoice_name', 'payment_name', 'pix_bank_match',
+    'pix_statement_line_id',
+]
+
+# Tabelas cujos vínculos (modelo, id) com a parcela passam para o arquivo: histórico
+# do chatter, seguidores e anexos, que o unlink da parcela apagaria
+ARCHIVE_RELINKED_TABLES = [
+    ('mail_message', 'model', 'res_id'),
+    ('mail_followers', 'res_model', 'res_id'),
+    ('ir_attachment', 'res_model', 'res_id'),
+]
+
+
+class PixInstallmentArchive(models.Model):
+    _name = 'pix.installment.archive'
+    _description = 'Parcela PIX Arquivada'
+    _inherit = ['mail.thread']
+    _order = 'due_date desc, id desc'
+    _check_company_auto = True
+
+    original_id = fields.Integer(
+        string='ID Original',
+        readonly=True,
+        index=True
+    )
+    name = fields.Char(string='Nome', readonly=True)
+    invoice_id = fields.Many2one(
+        'account.move',
+        string='Fatura',
+        readonly=True,
+        index=True,
+        ondelete='cascade'
+    )
+    payment_id = fields.Many2one(
+        'account.payment',
+        string='Pagamento',
+        readonly=True,
+        index=True,
+        ondelete='restrict'
+    )
+    amount = fields.Monetary(string='Valor', readonly=True, currency_field='currency_id')
+    currency_id = fields.Many2one('res.currency', string='Moeda', readonly=True)
+    due_date = fields.Date(string='Data de Vencimento', readonly=True, index=True)
+    pix_status = fields.Selection(
+        [
+            ('draft', 'Rascunho'),
+            ('pending', 'Pendente'),
+            ('paid', 'Pago'),
+            ('failed', 'Falhou'),
+        ],
+        string='Status PIX',
+        readonly=True
+    )
+    pix_txid = fields.Char(string='TXID PIX', readonly=True, index=True)
+    pix_end_to_end_id = fields.Char(string='End-to-End ID', readonly=True, index=True)
+    pix_paid_date = fields.Datetime(string='Data de Confirmação do Pagamento', readonly=True)
+    pix_sent_date = fields.Datetime(string='Data de Envio', readonly=True)
+    last_sync = fields.Datetime(string='Última Sincronização', readonly=True)
+    company_id = fields.Many2one('res.company', string='Empresa', readonly=True, index=True)
+    partner_id = fields.Many2one('res.partner', string='Fornecedor', readonly=True)
+    invoice_name = fields.Char(string='Número da Fatura', readonly=True)
+    payment_name = fields.Char(string='Número do Pagamento', readonly=True)
+    pix_bank_match = fields.Selection(
+        [
+            ('matched', 'Conciliado no Extrato'),
+            ('amount_mismatch', 'Valor Divergente'),
+            ('missing', 'Não Encontrado no Extrato'),
+        ],
+        string='Conferência de Extrato',
+        readonly=True
+    )
+    pix_statement_line_id = fields.Many2one(
+        'account.bank.statement.line',
+        string='Linha do Extrato',
+        readonly=True,
+        ondelete='set null'
+    )
+    archive_date = fields.Datetime(string='Data de Arquivamento', readonly=True)
+    json_data = fields.Binary(
+        string='Dados JSON Compactados',
+        attachment=False,
+        readonly=True,
+        prefetch=False,
+        help='Payload e resposta da API compactados (zlib)'
+    )
+    pix_payload = fields.Text(
+        string='Payload PIX',
+        compute='_compute_json_fields'
+    )
+    pix_response = fields.Text(
+        string='Resposta PIX',
+        compute='_compute_json_fields'
+    )
+
+    @api.depends('json_data')
+    def _compute_json_fields(self):
+        """Descompacta o payload e a resposta apenas quando lidos"""
+        for record in self:
+            data = self._unpack_json(record.json_data)
+            record.pix_payload = data.get('payload') or ''
+            record.pix_response = data.get('response') or ''
+
+    @api.model
+    def _pack_json(self, payload, response):
+        if not payload and not response:
+            return False
+        raw = pix_json.dumps({'payload': payload or '', 'response': response or ''})
+        return base64.b64encode(zlib.compress(raw.encode('utf-8'), 9))
+
+    @api.model
+    def _unpack_json(self, value):
+        if not value:
+            return {}
+        return pix_json.loads(zlib.decompress(base64.b64decode(value)))
+
+    @api.model
+    def _archive_installments(self, installments):
+        """Move as parcelas para o arquivo e as remove da tabela ativa"""
+        if not installments:
+            return self.browse()
+
+        now = fields.Datetime.now()
+        vals_list = []
+        for row in installments.read(ARCHIVE_COPIED_FIELDS + ['pix_payload', 'pix_response'], load=False):
+            vals = {field_name: row[field_name] for field_name in ARCHIVE_COPIED_FIELDS}
+            vals.update({
+                'original_id': row['id'],
+                'archive_date': now,
+                'json_data': self._pack_json(row['pix_payload'], row['pix_response']),
+            })
+            vals_list.append(vals)
+        archives = self.with_context(
+            tracking_disable=True, mail_create_nolog=True, mail_create_nosubscribe=True,
+        ).create(vals_list)
+        self._relink_archived_installments(archives)
+
+        # Mantém o histórico do painel: as parcelas arquivadas continuam contabilizadas
+        installments.with_context(force_unlink=True, pix_archiving=True).unlink()
+        return archives
+
+    @api.model
+    def _relink_archived_installments(self, archives):
+        """Transfere para o arquivo o chatter, os anexos e o vínculo do pagamento das parcelas"""
+        self.env.flush_all()
+        for table, model_column, id_column in ARCHIVE_RELINKED_TABLES:
+            self.env.cr.execute(f"""
+                UPDATE {table} t
+                   SET {model_column} = %s, {id_column} = a.id
+                  FROM pix_installment_archive a
+                 WHERE a.id = ANY(%s)
+                   AND t.{model_column} = 'pix.installment'
+                   AND t.{id_column} = a.original_id
+            """, (self._name, archives.ids))
+        # pix_installment_id seria anulado pelo unlink da parcela
+        self.env.cr.execute("""
+            UPDATE account_payment p
+               SET pix_installment_archive_id = a.id
+              FROM pix_installment_archive a
+             WHERE a.id = ANY(%s)
+               AND p.pix_installment_id = a.original_id
+        """, (archives.ids,))
+        self.env.invalidate_all()
+
+    @api.model
+    def _cron_archive_settled_installments(self):
+        """Arquiva, em blocos, as parcelas pagas além do prazo de retenção de cada empresa"""
+        in_test_mode = self.env.registry.in_test_mode()
+        companies = self.env['res.company'].search([('pix_archive_retention_days', '>', 0)])
+        for company in companies:
+            limit_date = fields.Datetime.now() - timedelta(days=company.pix_archive_retention_days)
+            total = 0
+            while True:
+                installments = self.env['pix.installment'].search([
+                    ('company_id', '=', company.id),
+                    ('pix_status', '=', 'paid'),
+                    ('pix_paid_date', '<', limit_date),
+                ], limit=ARCHIVE_CHUNK_SIZE, order='pix_paid_date, id')
+                if not installments:
+                    break
+                self._archive_installments(installments)
+                total += len(installments)
+                if not in_test_mode:
+                    self.env.cr.commit()
+                self.env.invalidate_all()
+            if total:
+                _logger.info(f'Parcelas PIX arquivadas ({company.name}): {total}.')
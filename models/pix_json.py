@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""Serialização JSON dos payloads, respostas e logs PIX
+
+Os dados são gravados sempre na forma compacta (sem indentação, UTF-8 sem
+escapes), serializados uma única vez por objeto. A formatação legível é feita
+apenas na exibição (pix.json.viewer). Quando a biblioteca orjson está
+instalada ela é usada; caso contrário, o módulo json padrão.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(value):
+    """Serializa o objeto na forma compacta"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(value).decode('utf-8')
+        except TypeError:
+            # Tipos não suportados pelo orjson (ex.: chaves não-texto) seguem pelo json padrão
+            pass
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+def loads(value):
+    """Desserializa um texto (ou bytes) JSON"""
+    if orjson is not None:
+        return orjson.loads(value)
+    return json.loads(value)
+
+
+def pretty(value):
+    """Formata um objeto ou texto JSON para exibição; textos inválidos são retornados como estão"""
+    if isinstance(value, (str, bytes)):
+        try:
+            value = loads(value)
+        except ValueError:
+            return value
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, option=orjson.OPT_INDENT_2).decode('utf-8')
+        except TypeError:
+            pass
+    return json.dumps(value, indent=2, ensure_ascii=False)
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+from psycopg2 import sql
+from odoo import models, fields, api
+from . import pix_json
+
+# Tamanho máximo (caracteres) exibido pelo visualizador, se não configurado
+JSON_VIEWER_DEFAULT_LIMIT = 20000
+
+
+class PixJsonViewer(models.TransientModel):
+    _name = 'pix.json.viewer'
+    _description = 'Visualizador de JSON PIX'
+
+    name = fields.Char(
+        string='Título',
+        readonly=True
+    )
+    content = fields.Text(
+        string='Conteúdo',
+        readonly=True
+    )
+    size = fields.Integer(
+        string='Tamanho (caracteres)',
+        readonly=True
+    )
+    truncated = fields.Boolean(
+        string='Truncado',
+        readonly=True
+    )
+
+    @api.model
+    def _get_limit(self):
+        return int(self.env['ir.config_parameter'].sudo().get_param(
+            'payment_itau_pix.json_viewer_limit', JSON_VIEWER_DEFAULT_LIMIT
+        ))
+
+    @api.model
+    def _read_truncated(self, record, field_name):
+        """Lê apenas o início de um campo texto diretamente no banco
+
+        Evita carregar respostas grandes inteiras no servidor só para exibi-las.
+        """
+        record.ensure_one()
+        record.check_access('read')
+        record.flush_recordset([field_name])
+        limit = self._get_limit()
+        query = sql.SQL('SELECT left({column}, %s), char_length({column}) FROM {table} WHERE id = %s').format(
+            column=sql.Identifier(field_name),
+            table=sql.Identifier(record._table),
+        )
+        self.env.cr.execute(query, (limit, record.id))
+        content, size = self.env.cr.fetchone()
+        return content or '', size or 0, (size or 0) > limit
+
+    @api.model
+    def _open(self, record, field_name, title):
+        """Abre o visualizador para o campo JSON informado"""
+        content, size, truncated = self._read_truncated(record, field_name)
+        if content and not truncated:
+            content = pix_json.pretty(content)
+        viewer = self.create({
+            'name': title,
+            'content': content,
+            'size': size,
+            'truncated': truncated,
+        })
+        return {
+            'type': 'ir.actions.act_window',
+            'name': title,
+            'res_model': self._name,
+            'res_id': viewer.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
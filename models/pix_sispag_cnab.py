@@ -0,0 +1,394 @@
+# -*- coding: utf-8 -*-
+
+from datetime import datetime
+from odoo import models, fields, _
+from odoo.exceptions import UserError
+from .account_payment import NON_DIGITS_RE
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Quantidade de parcelas carregadas por vez ao gerar/processar arquivos
+CNAB_CHUNK_SIZE = 1000
+
+CNAB_BANK_CODE = '341'
+
+# Ocorrências do arquivo de retorno SISPAG
+CNAB_OCCURRENCE_PAID = '00'
+CNAB_OCCURRENCES_ACCEPTED = ('BD', 'BE', 'BF')
+
+CNAB_PIX_KEY_TYPES = {
+    'phone': '01',
+    'email': '02',
+    'cpf': '03',
+    'random': '04',
+}
+
+CNAB_PAYMENT_TYPES = {
+    'Fornecedores': '20',
+    'Diversos': '98',
+}
+
+
+class PixSispagCnab(models.AbstractModel):
+    _name = 'pix.sispag.cnab'
+    _description = 'Arquivo CNAB 240 SISPAG PIX'
+
+    # Formatação de campos
+    def _alpha(self, value, size):
+        """Campo alfanumérico: alinhado à esquerda, completado com brancos"""
+        value = (value or '').upper().replace('\r', ' ').replace('\n', ' ')
+        return value[:size].ljust(size)
+
+    def _num(self, value, size):
+        """Campo numérico: alinhado à direita, completado com zeros"""
+        value = NON_DIGITS_RE.sub('', str(value or ''))
+        return value[-size:].rjust(size, '0')
+
+    def _amount(self, value, size):
+        """Valor monetário com 2 casas decimais implícitas"""
+        return self._num(int(round(abs(value or 0.0) * 100)), size)
+
+    def _check_line(self, line):
+        if len(line) != 240:
+            raise UserError(_('Registro CNAB com tamanho inválido (%d posições).') % len(line))
+        return line
+
+    # Registros do arquivo de remessa
+    def _file_header(self, payment, pagador, now):
+        company = payment.company_id
+        return self._check_line(''.join([
+            CNAB_BANK_CODE,
+            '0000',
+            '0',
+            ' ' * 6,
+            '081',
+            '2' if pagador['tipo_pessoa'] == 'J' else '1',
+            self._num(pagador['documento'], 14),
+            ' ' * 20,
+            self._num(pagador['agencia'], 5),
+            ' ',
+            self._num(pagador['conta'][:-1], 12),
+            ' ',
+            self._num(pagador['conta'][-1:], 1),
+            self._alpha(company.name, 30),
+            self._alpha('BANCO ITAU SA', 30),
+            ' ' * 10,
+            '1',
+            now.strftime('%d%m%Y'),
+            now.strftime('%H%M%S'),
+            '0' * 9,
+            '0' * 5,
+            ' ' * 69,
+        ]))
+
+    def _batch_header(self, batch_number, payment, pagador):
+        company = payment.company_id
+        partner = company.partner_id
+        return self._check_line(''.join([
+            CNAB_BANK_CODE,
+            self._num(batch_number, 4),
+            '1',
+            'C',
+            CNAB_PAYMENT_TYPES.get(pagador['modulo_sispag'], '20'),
+            '45',
+            '040',
+            ' ',
+            '2' if pagador['tipo_pessoa'] == 'J' else '1',
+            self._num(pagador['documento'], 14),
+            ' ' * 4,
+            ' ' * 16,
+            self._num(pagador['agencia'], 5),
+            ' ',
+            self._num(pagador['conta'][:-1], 12),
+            ' ',
+            self._num(pagador['conta'][-1:], 1),
+            self._alpha(company.name, 30),
+            self._alpha('PAGAMENTOS PIX', 30),
+            ' ' * 10,
+            self._alpha(partner.street, 30),
+            self._num(0, 5),
+            self._alpha(partner.street2, 15),
+            self._alpha(partner.city, 20),
+            self._num(partner.zip, 8),
+            self._alpha(partner.state_id.code, 2),
+            ' ' * 8,
+            ' ' * 10,
+        ]))
+
+    def _segment_a(self, batch_number, sequence, installment):
+        payment = installment.payment_id
+        bank_account = payment.partner_bank_id
+        partner = payment.partner_id
+
+        if bank_account.pix_payment_type == 'dados_bancarios':
+            if not bank_account.bank_id or not bank_account.bank_id.ispb:
+                raise UserError(_('O ISPB do banco não está configurado na conta bancária do fornecedor.'))
+            recebedor = payment._get_recebedor_data(bank_account)
+            account_data = ''.join([
+                self._num(recebedor['agencia_recebedor'], 5),
+                ' ',
+                self._num(recebedor['conta_recebedor'][:-1], 12),
+                ' ',
+                self._num(recebedor['conta_recebedor'][-1:], 1),
+            ])
+            ispb = bank_account.bank_id.ispb
+            document = recebedor['identificacao_recebedor']
+            bank_code = self._num(bank_account.bank_id.bic if (bank_account.bank_id.bic or '').isdigit() else 0, 3)
+        elif bank_account.pix_payment_type == 'chave_pix':
+            if not bank_account.pix_key:
+                raise UserError(_('A chave PIX não está configurada na conta bancária do fornecedor.'))
+            account_data = ' ' * 20
+            ispb = ''
+            document = payment._sanitize_document(partner.vat)
+            bank_code = '000'
+        else:
+            raise UserError(_('Tipo de pagamento PIX não configurado na conta bancária do fornecedor.'))
+
+        payment_date = payment.date or fields.Date.today()
+        return self._check_line(''.join([
+            CNAB_BANK_CODE,
+            self._num(batch_number, 4),
+            '3',
+            self._num(sequence, 5),
+            'A',
+            '000',
+            '009',
+            bank_code,
+            account_data,
+            self._alpha(partner.name, 30),
+            self._alpha(str(installment.id), 20),
+            payment_date.strftime('%d%m%Y'),
+            'REA',
+            self._num(ispb, 8),
+            '0' * 7,
+            self._amount(installment.amount, 15),
+            ' ' * 15,
+            ' ' * 5,
+            '0' * 8,
+            '0' * 15,
+            ' ' * 18,
+            ' ' * 2,
+            '0' * 6,
+            self._num(document, 14),
+            ' ' * 2,
+            ' ' * 5,
+            ' ' * 5,
+            '0',
+            ' ' * 10,
+        ]))
+
+    def _segment_b(self, batch_number, sequence, installment):
+        payment = installment.payment_id
+        bank_account = payment.partner_bank_id
+        partner = payment.partner_id
+        return self._check_line(''.join([
+            CNAB_BANK_CODE,
+            self._num(batch_number, 4),
+            '3',
+            self._num(sequence, 5),
+            'B',
+            CNAB_PIX_KEY_TYPES.get(bank_account.pix_key_type, '04'),
+            ' ',
+            '2' if partner.is_company else '1',
+            self._num(payment._sanitize_document(partner.vat), 14),
+            self._alpha(payment.pix_txid, 30),
+            self._alpha((payment.memo or '')[:65], 65),
+            (bank_account.pix_key or '')[:100].ljust(100),
+            ' ' * 3,
+            ' ' * 10,
+        ]))
+
+    def _batch_trailer(self, batch_number, record_count, total_amount):
+        return self._check_line(''.join([
+            CNAB_BANK_CODE,
+            self._num(batch_number, 4),
+            '5',
+            ' ' * 9,
+            self._num(record_count, 6),
+            self._amount(total_amount, 18),
+            '0' * 18,
+            ' ' * 171,
+            ' ' * 10,
+        ]))
+
+    def _file_trailer(self, batch_count, record_count):
+        return self._check_line(''.join([
+            CNAB_BANK_CODE,
+            '9999',
+            '9',
+            ' ' * 9,
+            self._num(batch_count, 6),
+            self._num(record_count, 6),
+            ' ' * 211,
+        ]))
+
+    def _iter_installment_chunks(self, installment_ids):
+        """Carrega as parcelas em blocos, liberando o cache entre eles"""
+        Installment = self.env['pix.installment']
+        for start in range(0, len(installment_ids), CNAB_CHUNK_SIZE):
+            chunk = Installment.browse(installment_ids[start:start + CNAB_CHUNK_SIZE])
+            chunk.payment_id._prefetch_pix_payload_data()
+            yield chunk
+            self.env.invalidate_all()
+
+    def _group_remittance_ids(self, installment_ids):
+        """Valida as parcelas da remessa e separa os ids por módulo SISPAG do diário
+
+        Consulta apenas empresa, status e módulo, em blocos de CNAB_CHUNK_SIZE ids,
+        sem carregar as parcelas no cache.
+        """
+        self.env['pix.installment'].flush_model(['company_id', 'pix_status', 'payment_id'])
+        self.env['account.payment'].flush_model(['journal_id'])
+        self.env['account.journal'].flush_model(['sispag_modulo'])
+        company_ids = set()
+        ids_by_module = {}
+        for start in range(0, len(installment_ids), CNAB_CHUNK_SIZE):
+            self.env.cr.execute("""
+                SELECT i.id, i.company_id, i.pix_status, j.sispag_modulo
+                  FROM pix_installment i
+                  JOIN account_payment p ON p.id = i.payment_id
+                  JOIN account_journal j ON j.id = p.journal_id
+                 WHERE i.id = ANY(%s)
+              ORDER BY i.id
+            """, (installment_ids[start:start + CNAB_CHUNK_SIZE],))
+            for installment_id, company_id, pix_status, module in self.env.cr.fetchall():
+                if pix_status not in ('draft', 'failed'):
+                    raise UserError(_('Apenas parcelas em rascunho ou com falha podem ser incluídas na remessa.'))
+                company_ids.add(company_id)
+                ids_by_module.setdefault(module or 'Fornecedores', []).append(installment_id)
+        if len(company_ids) > 1:
+            raise UserError(_('A remessa CNAB deve conter parcelas de uma única empresa.'))
+        return ids_by_module
+
+    def _iter_remittance_lines(self, installments):
+        """Gera, linha a linha, o arquivo de remessa CNAB 240 SISPAG PIX
+
+        Um lote é criado por módulo SISPAG (Fornecedores/Diversos). As parcelas
+        são validadas, agrupadas e lidas em blocos de CNAB_CHUNK_SIZE ids, de forma
+        que o consumo de memória não depende do tamanho da remessa.
+        """
+        installment_ids = installments.ids
+        if not installment_ids:
+            raise UserError(_('Nenhuma parcela selecionada para a remessa.'))
+        ids_by_module = self._group_remittance_ids(installment_ids)
+
+        now = datetime.now()
+        first_payment = self.env['pix.installment'].browse(installment_ids[0]).payment_id
+        yield self._file_header(first_payment, first_payment._get_pagador_data(), now)
+        file_record_count = 1
+        batch_count = 0
+
+        for module, installment_ids in ids_by_module.items():
+            batch_count += 1
+            batch_header_written = False
+            sequence = 0
+            total_amount = 0.0
+
+            for chunk in self._iter_installment_chunks(installment_ids):
+                for installment in chunk:
+                    if not batch_header_written:
+                        payment = installment.payment_id
+                        yield self._batch_header(batch_count, payment, payment._get_pagador_data())
+                        batch_header_written = True
+
+                    if not installment.payment_id.partner_bank_id:
+                        raise UserError(
+                            _('É necessário configurar uma conta bancária do fornecedor no pagamento %s.') %
+                            installment.payment_id.name
+                        )
+                    sequence += 1
+                    yield self._segment_a(batch_count, sequence, installment)
+                    if installment.payment_id.partner_bank_id.pix_payment_type == 'chave_pix':
+                        sequence += 1
+                        yield self._segment_b(batch_count, sequence, installment)
+                    total_amount += installment.amount
+
+            # Header + detalhes + trailer do lote
+            batch_record_count = sequence + 2
+            yield self._batch_trailer(batch_count, batch_record_count, total_amount)
+            file_record_count += batch_record_count
+
+        file_record_count += 1
+        yield self._file_trailer(batch_count, file_record_count)
+
+    def _write_remittance(self, installments, stream):
+        """Escreve a remessa no stream (bytes) e marca as parcelas como pendentes"""
+        for line in self._iter_remittance_lines(installments):
+            stream.write((line + '\r\n').encode('latin-1', errors='replace'))
+
+        now = fields.Datetime.now()
+        installment_ids = installments.ids
+        Installment = self.env['pix.installment']
+        for start in range(0, len(installment_ids), CNAB_CHUNK_SIZE):
+            chunk = Installment.browse(installment_ids[start:start + CNAB_CHUNK_SIZE])
+            chunk.write({
+                'pix_status': 'pending',
+                'last_sync': now,
+            })
+            chunk.payment_id.write({
+                'pix_status': 'pending',
+                'pix_last_sync': now,
+            })
+            self.env.invalidate_all()
+
+    # Arquivo de retorno
+    def _iter_return_records(self, stream):
+        """Lê o arquivo de retorno linha a linha e entrega os segmentos A
+
+        Retorna dicts com a referência da parcela (seu número), as ocorrências
+        e o valor efetivado. O arquivo nunca é carregado inteiro em memória.
+        """
+        for raw_line in stream:
+            line = raw_line.decode('latin-1') if isinstance(raw_line, bytes) else raw_line
+            line = line.rstrip('\r\n')
+            if len(line) < 240:
+                continue
+            if line[7] != '3' or line[13] != 'A':
+                continue
+            occurrences = line[230:240]
+            yield {
+                'reference': line[73:93].strip(),
+                'occurrences': [occurrences[i:i + 2] for i in range(0, 10, 2) if occurrences[i:i + 2].strip()],
+                'effective_amount': int(line[162:177] or 0) / 100.0,
+            }
+
+    def _apply_return_records(self, records):
+        """Aplica as ocorrências do retorno nas parcelas, em lotes"""
+        Installment = self.env['pix.installment']
+        result = {'paid': 0, 'failed': 0, 'accepted': 0, 'unmatched': 0}
+
+        def flush(batch):
+            installments = Installment.browse(list(batch)).exists()
+            result['unmatched'] += len(batch) - len(installments)
+            paid = installments.filtered(lambda i: batch[i.id] == 'paid' and i.pix_status != 'paid')
+            failed = installments.filtered(lambda i: batch[i.id] == 'failed' and i.pix_status != 'paid')
+            paid._mark_pix_paid()
+            failed._mark_pix_failed()
+            result['paid'] += len(paid)
+            result['failed'] += len(failed)
+            result['accepted'] += len(installments) - len(paid) - len(failed)
+            self.env.invalidate_all()
+
+        batch = {}
+        for record in records:
+            reference = record['reference']
+            if not reference.isdigit():
+                result['unmatched'] += 1
+                continue
+            occurrences = record['occurrences']
+            if CNAB_OCCURRENCE_PAID in occurrences:
+                outcome = 'paid'
+            elif all(code in CNAB_OCCURRENCES_ACCEPTED for code in occurrences):
+                outcome = 'accepted'
+            else:
+                outcome = 'failed'
+            batch[int(reference)] = outcome
+            if len(batch) >= CNAB_CHUNK_SIZE:
+                flush(batch)
+                batch = {}
+        if batch:
+            flush(batch)
+
+        _logger.info(f'Retorno CNAB SISPAG processado: {result}')
+        return result
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+
+from datetime import timedelta
+from odoo import models, fields, api
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Intervalo mínimo entre duas ressincronizações de um mesmo item travado
+STUCK_RESYNC_INTERVAL_MINUTES = 30
+
+# Quantidade máxima de itens ressincronizados por execução
+STUCK_RESYNC_LIMIT = 200
+
+# Retenção dos instantâneos de SLO
+SNAPSHOT_RETENTION_DAYS = 30
+
+# Histograma de idade dos PIX pendentes: (campo, limite superior em horas)
+PENDING_AGE_BUCKETS = [
+    ('pending_lt_1h', 1),
+    ('pending_1h_4h', 4),
+    ('pending_4h_24h', 24),
+    ('pending_1d_3d', 72),
+    ('pending_gt_3d', None),
+]
+
+
+class PixSloSnapshot(models.Model):
+    _name = 'pix.slo.snapshot'
+    _description = 'Instantâneo de SLO PIX'
+    _order = 'date desc, id desc'
+
+    company_id = fields.Many2one(
+        'res.company',
+        string='Empresa',
+        required=True,
+        readonly=True,
+        index=True
+    )
+    date = fields.Datetime(
+        string='Data',
+        required=True,
+        readonly=True,
+        index=True
+    )
+    pending_count = fields.Integer(string='Pendentes', readonly=True)
+    pending_lt_1h = fields.Integer(string='Pendentes < 1h', readonly=True)
+    pending_1h_4h = fields.Integer(string='Pendentes 1h-4h', readonly=True)
+    pending_4h_24h = fields.Integer(string='Pendentes 4h-24h', readonly=True)
+    pending_1d_3d = fields.Integer(string='Pendentes 1d-3d', readonly=True)
+    pending_gt_3d = fields.Integer(string='Pendentes > 3d', readonly=True)
+    oldest_pending_hours = fields.Float(
+        string='Pendente Mais Antigo (horas)',
+        readonly=True,
+        aggregator='max'
+    )
+    stuck_count = fields.Integer(
+        string='Travados',
+        readonly=True,
+        help='Pendentes além do limite configurado na empresa'
+    )
+    failed_24h_count = fields.Integer(
+        string='Falhas (24h)',
+        readonly=True
+    )
+
+    def _pending_age_query(self):
+        """Idade dos PIX pendentes (parcelas e pagamentos avulsos), desde o envio
+
+        As duas partes usam índices parciais sobre as linhas pendentes, portanto
+        o custo depende da quantidade de pendentes e não do histórico.
+        """
+        buckets = []
+        lower = 0
+        for field_name, upper in PENDING_AGE_BUCKETS:
+            condition = f'age >= interval \'{lower} hours\''
+            if upper is not None:
+                condition += f' AND age < interval \'{upper} hours\''
+                lower = upper
+            buckets.append(f'count(*) FILTER (WHERE {condition}) AS {field_name}')
+        return f"""
+            SELECT company_id,
+                   count(*) AS pending_count,
+                   {', '.join(buckets)},
+                   coalesce(extract(epoch FROM max(age)) / 3600.0, 0) AS oldest_pending_hours,
+                   count(*) FILTER (WHERE age >= make_interval(hours => threshold)) AS stuck_count
+              FROM (
+                    SELECT i.company_id,
+                           (now() at time zone 'UTC') - coalesce(i.pix_sent_date, i.create_date) AS age,
+                           coalesce(c.pix_stuck_pending_hours, 24) AS threshold
+                      FROM pix_installment i
+                      JOIN res_company c ON c.id = i.company_id
+                     WHERE i.pix_status = 'pending'
+                 UNION ALL
+                    SELECT p.company_id,
+                           (now() at time zone 'UTC') - coalesce(p.pix_sent_date, p.create_date) AS age,
+                           coalesce(c.pix_stuck_pending_hours, 24) AS threshold
+                      FROM account_payment p
+                      JOIN res_company c ON c.id = p.company_id
+                     WHERE p.pix_status = 'pending' AND p.pix_installment_id IS NULL
+                   ) pending
+          GROUP BY company_id
+        """
+
+    @api.model
+    def _take_snapshots(self):
+        """Registra o histograma de idade dos pendentes e as falhas recentes, por empresa"""
+        self.env['pix.installment'].flush_model()
+        self.env['account.payment'].flush_model(['pix_status', 'pix_sent_date', 'pix_installment_id'])
+
+        self.env.cr.execute(self._pending_age_query())
+        rows = {row['company_id']: row for row in self.env.cr.dictfetchall()}
+
+        self.env.cr.execute("""
+            SELECT company_id, count(*)
+              FROM pix_installment
+             WHERE pix_status = 'failed'
+               AND write_date >= (now() at time zone 'UTC') - interval '24 hours'
+          GROUP BY company_id
+        """)
+        failed = dict(self.env.cr.fetchall())
+
+        now = fields.Datetime.now()
+        vals_list = []
+        for company_id in set(rows) | set(failed):
+            vals = dict(rows.get(company_id) or {}, company_id=company_id, date=now)
+            vals['failed_24h_count'] = failed.get(company_id, 0)
+            vals_list.append(vals)
+        snapshots = self.create(vals_list)
+
+        for snapshot in snapshots:
+            company = snapshot.company_id
+            if snapshot.stuck_count:
+                _logger.warning(
+                    f'PIX travados ({company.name}): {snapshot.stuck_count} pendente(s) há mais de '
+                    f'{company.pix_stuck_pending_hours}h; mais antigo há {snapshot.oldest_pending_hours:.1f}h.'
+                )
+            if company.pix_failed_alert_threshold and snapshot.failed_24h_count >= company.pix_failed_alert_threshold:
+                _logger.warning(
+                    f'PIX com falha ({company.name}): {snapshot.failed_24h_count} falha(s) nas últimas 24h.'
+                )
+        return snapshots
+
+    @api.model
+    def _flag_and_resync_stuck(self):
+        """Sinaliza os PIX pendentes além do limite e ressincroniza apenas esses itens"""
+        resync_before = fields.Datetime.now() - timedelta(minutes=STUCK_RESYNC_INTERVAL_MINUTES)
+        Installment = self.env['pix.installment']
+
+        self.env.cr.execute("""
+            SELECT i.id
+              FROM pix_installment i
+              JOIN res_company c ON c.id = i.company_id
+             WHERE i.pix_status = 'pending'
+               AND coalesce(i.pix_sent_date, i.create_date)
+                   < (now() at time zone 'UTC') - make_interval(hours => coalesce(c.pix_stuck_pending_hours, 24))
+               AND (i.last_sync IS NULL OR i.last_sync < %s)
+          ORDER BY i.last_sync NULLS FIRST
+             LIMIT %s
+        """, (resync_before, STUCK_RESYNC_LIMIT))
+        stuck = Installment.browse([row[0] for row in self.env.cr.fetchall()])
+        stuck.filtered(lambda i: not i.pix_stuck).write({'pix_stuck': True})
+
+        for company in stuck.company_id:
+            stuck.filtered(lambda i: i.company_id == company).with_company(company)._reconcile_pix_status_bulk()
+
+        self.env.cr.execute("""
+            SELECT p.id
+              FROM account_payment p
+              JOIN res_company c ON c.id = p.company_id
+             WHERE p.pix_status = 'pending'
+               AND p.pix_installment_id IS NULL
+               AND p.pix_txid IS NOT NULL
+               AND coalesce(p.pix_sent_date, p.create_date)
+                   < (now() at time zone 'UTC') - make_interval(hours => coalesce(c.pix_stuck_pending_hours, 24))
+               AND (p.pix_last_sync IS NULL OR p.pix_last_sync < %s)
+          ORDER BY p.pix_last_sync NULLS FIRST
+             LIMIT %s
+        """, (resync_before, STUCK_RESYNC_LIMIT))
+        payments = self.env['account.payment'].browse([row[0] for row in self.env.cr.fetchall()])
+        for payment in payments:
+            try:
+                with self.env.cr.savepoint():
+                    payment.with_company(payment.company_id).action_update_payment_pix_status()
+            except Exception as e:
+                _logger.error(f'Erro ao ressincronizar o pagamento PIX travado {payment.id}: {e}')
+
+        return stuck, payments
+
+    @api.model
+    def _cron_sweep_stuck_pix(self):
+        """Varredura periódica: instantâneo de SLO, sinalização e ressincronização dos travados"""
+        self._flag_and_resync_stuck()
+        self._take_snapshots()
+        self.search([
+            ('date', '<', fields.Datetime.now() - timedelta(days=SNAPSHOT_RETENTION_DAYS)),
+        ]).unlink()
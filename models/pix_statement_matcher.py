@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+
+import re
+from datetime import timedelta
+from odoo import models, fields, api, _
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Quantidade de linhas de extrato lidas por consulta
+STATEMENT_CHUNK_SIZE = 2000
+
+# Janela padrão (dias) conferida pelo agendamento
+STATEMENT_LOOKBACK_DAYS = 35
+
+# Dias antes da janela em que um PIX pago ainda pode aparecer no extrato da janela
+STATEMENT_MATCH_TOLERANCE_DAYS = 5
+
+# Identificador End-to-End do SPI: E + ISPB (8) + data/hora (12) + sequencial (11)
+END_TO_END_RE = re.compile(r'E\d{20}[A-Za-z0-9]{11}')
+TOKEN_RE = re.compile(r'[A-Za-z0-9]+')
+
+
+class PixStatementMatcher(models.AbstractModel):
+    _name = 'pix.statement.matcher'
+    _description = 'Conferência de Extrato PIX'
+
+    def _build_indexes(self, company, date_from):
+        """Monta os índices de busca das parcelas ainda não conferidas no extrato
+
+        Só entram as parcelas pendentes e as pagas (ou com pagamento datado) a
+        partir do início da janela, menos a tolerância: o histórico antigo não
+        conferido não é relido a cada execução. Os índices apontam para o
+        pagamento, pois no modo consolidado um único lançamento de extrato
+        corresponde a várias parcelas do mesmo pagamento.
+        """
+        since = date_from - timedelta(days=STATEMENT_MATCH_TOLERANCE_DAYS)
+        installments = self.env['pix.installment'].search([
+            ('company_id', '=', company.id),
+            ('pix_bank_match', '!=', 'matched'),
+            '|', '|',
+            ('pix_status', '=', 'pending'),
+            '&', ('pix_status', '=', 'paid'), ('pix_paid_date', '>=', fields.Datetime.to_datetime(since)),
+            '&', ('pix_status', '=', 'paid'), ('payment_id.date', '>=', since),
+        ])
+
+        installment_ids_by_payment = {}
+        for installment in installments:
+            installment_ids_by_payment.setdefault(installment.payment_id.id, []).append(installment.id)
+
+        txid_index, end_to_end_index, amount_index = {}, {}, {}
+        for payment in installments.payment_id:
+            if payment.pix_txid:
+                txid_index[payment.pix_txid] = payment.id
+            # Valor + data só é aceito para PIX já confirmados pela API;
+            # pendentes precisam de correspondência exata (TXID ou End-to-End)
+            if payment.pix_status != 'paid':
+                continue
+            amount_key = int(round(abs(payment.amount) * 100))
+            dates = {payment.date}
+            dates.update(
+                installment.pix_paid_date.date()
+                for installment in payment.pix_installment_ids
+                if installment.pix_paid_date
+            )
+            for date in dates:
+                amount_index.setdefault((amount_key, date), []).append(payment.id)
+        for installment in installments.filtered('pix_end_to_end_id'):
+            end_to_end_index[installment.pix_end_to_end_id] = installment.payment_id.id
+
+        return installment_ids_by_payment, txid_index, end_to_end_index, amount_index
+
+    def _iter_statement_lines(self, journals, date_from, date_to):
+        """Percorre as linhas de extrato de saída do período em blocos (keyset por id)"""
+        linked_line_ids = set(self.env['pix.installment'].search([
+            ('pix_statement_line_id', '!=', False),
+            ('pix_statement_line_id.date', '>=', date_from),
+        ]).pix_statement_line_id.ids)
+
+        last_id = 0
+        while True:
+            rows = self.env['account.bank.statement.line'].search_read([
+                ('journal_id', 'in', journals.ids),
+                ('date', '>=', date_from),
+                ('date', '<=', date_to),
+                ('amount', '<', 0),
+                ('id', '>', last_id),
+            ], ['date', 'amount', 'payment_ref', 'ref'], order='id', limit=STATEMENT_CHUNK_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                if row['id'] not in linked_line_ids:
+                    yield row
+            last_id = rows[-1]['id']
+
+    def _match_company(self, company, date_from, date_to):
+        """Confere as linhas de extrato da empresa com as parcelas PIX
+
+        Ordem de correspondência: TXID, End-to-End ID e, por fim, valor + data.
+        Parcelas pendentes encontradas no extrato são confirmadas como pagas;
+        divergências de valor e parcelas pagas sem lançamento no extrato são sinalizadas.
+        """
+        journals = company.pix_journal_id
+        if not journals:
+            return {}
+
+        installment_ids_by_payment, txid_index, end_to_end_index, amount_index = self._build_indexes(company, date_from)
+        if not installment_ids_by_payment:
+            return {}
+
+        matched = {}
+        mismatched = set()
+        for row in self._iter_statement_lines(journals, date_from, date_to):
+            text = ' '.join(filter(None, [row['payment_ref'], row['ref']]))
+            amount_key = int(round(abs(row['amount']) * 100))
+
+            payment_id = None
+            exact = False
+            for token in END_TO_END_RE.findall(text):
+                payment_id = end_to_end_index.get(token)
+                if payment_id:
+                    exact = True
+                    break
+            if not payment_id:
+                for token in TOKEN_RE.findall(text):
+                    payment_id = txid_index.get(token)
+                    if payment_id:
+                        exact = True
+                        break
+            if not payment_id:
+                candidates = amount_index.get((amount_key, row['date'])) or []
+                while candidates and candidates[0] in matched:
+                    candidates.pop(0)
+                payment_id = candidates.pop(0) if candidates else None
+            if not payment_id or payment_id in matched:
+                continue
+
+            matched[payment_id] = row['id']
+            if exact:
+                payment = self.env['account.payment'].browse(payment_id)
+                if int(round(abs(payment.amount) * 100)) != amount_key:
+                    mismatched.add(payment_id)
+
+        return self._apply_matches(company, installment_ids_by_payment, matched, mismatched, date_from, date_to)
+
+    def _apply_matches(self, company, installment_ids_by_payment, matched, mismatched, date_from, date_to):
+        """Aplica o resultado da conferência em lote"""
+        Installment = self.env['pix.installment']
+
+        to_confirm = Installment.browse([
+            installment_id
+            for payment_id in matched if payment_id not in mismatched
+            for installment_id in installment_ids_by_payment[payment_id]
+        ])
+        flagged = Installment.browse([
+            installment_id
+            for payment_id in mismatched
+            for installment_id in installment_ids_by_payment[payment_id]
+        ])
+
+        # Pendentes encontradas no extrato: o dinheiro saiu, confirma o pagamento
+        to_confirm.filtered(lambda i: i.pix_status == 'pending')._mark_pix_paid()
+
+        # Agrupa as parcelas por linha de extrato para gravar com um write por linha
+        installment_ids_by_line = {}
+        for payment_id, line_id in matched.items():
+            installment_ids_by_line.setdefault(line_id, []).extend(installment_ids_by_payment[payment_id])
+        for line_id, installment_ids in installment_ids_by_line.items():
+            Installment.browse(installment_ids).write({
+                'pix_statement_line_id': line_id,
+                'pix_bank_match': 'amount_mismatch' if installment_ids[0] in flagged.ids else 'matched',
+            })
+
+        # Pagas no período sem lançamento correspondente no extrato
+        missing = Installment.search([
+            ('company_id', '=', company.id),
+            ('pix_status', '=', 'paid'),
+            ('pix_bank_match', '=', False),
+            ('pix_paid_date', '>=', fields.Datetime.to_datetime(date_from)),
+            ('pix_paid_date', '<', fields.Datetime.to_datetime(date_to) - timedelta(days=1)),
+        ])
+        missing.write({'pix_bank_match': 'missing'})
+
+        for installment in flagged:
+            installment.message_post(
+                body=_('Valor do lançamento no extrato diverge do valor do pagamento PIX.'),
+                message_type='notification',
+            )
+
+        result = {
+            'matched': len(to_confirm),
+            'amount_mismatch': len(flagged),
+            'missing': len(missing),
+        }
+        _logger.info(f'Conferência de extrato PIX ({company.name}): {result}')
+        return result
+
+    @api.model
+    def _cron_match_statement_lines(self):
+        """Confere as linhas de extrato PIX das últimas semanas, por empresa"""
+        date_to = fields.Date.today()
+        date_from = date_to - timedelta(days=STATEMENT_LOOKBACK_DAYS)
+        companies = self.env['res.company'].search([('pix_journal_id', '!=', False)])
+        for company in companies:
+            self.with_company(company)._match_company(company, date_from, date_to)
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+
+from datetime import datetime, timezone
+from odoo import models, api, _
+from odoo.exceptions import UserError
+
+# Tamanho padrão e máximo de uma página da consulta de status
+STATUS_PAGE_DEFAULT_LIMIT = 500
+STATUS_PAGE_MAX_LIMIT = 5000
+
+# Quantidade máxima de identificadores por filtro em uma chamada
+STATUS_MAX_KEYS = 10000
+
+# Projeção enxuta: nenhum campo de payload/resposta JSON é lido. As páginas seguem a
+# ordem de confirmação (xact_id, id)
+STATUS_PROJECTION_QUERY = """
+    SELECT i.xact_id,
+           i.id,
+           i.name,
+           i.invoice_id,
+           i.payment_id,
+           p.pix_correlation_id AS correlation_id,
+           i.pix_txid AS txid,
+           i.pix_end_to_end_id AS end_to_end_id,
+           i.pix_status AS status,
+           i.amount,
+           c.name AS currency,
+           i.due_date,
+           i.pix_sent_date AS sent_date,
+           i.pix_paid_date AS paid_date,
+           i.last_sync,
+           i.write_date
+      FROM pix_installment i
+ LEFT JOIN account_payment p ON p.id = i.payment_id
+ LEFT JOIN res_currency c ON c.id = i.currency_id
+     WHERE {where}
+  ORDER BY i.xact_id, i.id
+     LIMIT %s
+"""
+
+
+class PixStatusApi(models.AbstractModel):
+    _name = 'pix.status.api'
+    _description = 'Consulta de Status PIX em Lote'
+
+    @api.model
+    def _encode_cursor(self, xact_id, record_id):
+        return f'{xact_id}-{record_id}'
+
+    @api.model
+    def _decode_cursor(self, cursor):
+        try:
+            xact_id, record_id = cursor.split('-')
+            return int(xact_id), int(record_id)
+        except (AttributeError, ValueError):
+            raise UserError(_('Cursor inválido: %s') % cursor)
+
+    @api.model
+    def _parse_limit(self, limit):
+        try:
+            limit = int(limit or STATUS_PAGE_DEFAULT_LIMIT)
+        except (TypeError, ValueError):
+            raise UserError(_('Limite inválido: %s') % limit)
+        if limit <= 0:
+            raise UserError(_('O limite deve ser positivo.'))
+        return min(limit, STATUS_PAGE_MAX_LIMIT)
+
+    @api.model
+    def _check_keys(self, name, values, cast=str):
+        if values is None:
+            return None
+        if not isinstance(values, list) or len(values) > STATUS_MAX_KEYS:
+            raise UserError(_('O filtro %s deve ser uma lista com até %d itens.') % (name, STATUS_MAX_KEYS))
+        try:
+            return [cast(value) for value in values]
+        except (TypeError, ValueError):
+            raise UserError(_('O filtro %s contém valores inválidos.') % name)
+
+    @api.model
+    def _get_status_page(self, txids=None, correlation_ids=None, invoice_ids=None,
+                         updated_since=None, cursor=None, limit=None):
+        """Status das parcelas PIX em páginas na ordem de confirmação das gravações
+
+        Os filtros por lista (txids, correlation_ids, invoice_ids) são combinados
+        com OU; updated_since (ISO 8601, inclusivo; sem fuso = UTC) define o
+        início da varredura. A paginação é por chave (keyset) sobre a transação
+        da última gravação de cada parcela: o next_cursor continua a partir do
+        último item, sem OFFSET, e pode ser guardado para consultar apenas as
+        alterações posteriores. As varreduras (com cursor, updated_since ou sem
+        filtro por lista) só entregam gravações de transações anteriores ao xmin:
+        uma transação longa confirmada depois nunca fica atrás de um cursor já
+        entregue (mas atrasa as páginas enquanto estiver aberta). A consulta por
+        lista sem cursor retorna a versão confirmada atual de cada parcela; seu
+        next_cursor não avança além do xmin, de forma que a continuação pode
+        repetir itens, mas não os perde. Respeita as empresas do usuário.
+
+        :return: dicionário com items, next_cursor e has_more
+        """
+        self.env['pix.installment'].check_access('read')
+        limit = self._parse_limit(limit)
+
+        txids = self._check_keys('txids', txids)
+        correlation_ids = self._check_keys('correlation_ids', correlation_ids)
+        invoice_ids = self._check_keys('invoice_ids', invoice_ids, int)
+
+        conditions = ['i.company_id = ANY(%s)']
+        params = [self.env.companies.ids]
+
+        key_conditions = []
+        if txids is not None:
+            key_conditions.append('i.pix_txid = ANY(%s)')
+            params.append(txids)
+        if correlation_ids is not None:
+            key_conditions.append('p.pix_correlation_id = ANY(%s)')
+            params.append(correlation_ids)
+        if invoice_ids is not None:
+            key_conditions.append('i.invoice_id = ANY(%s)')
+            params.append(invoice_ids)
+        if key_conditions:
+            conditions.append('(%s)' % ' OR '.join(key_conditions))
+
+        self.env.cr.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+        xmin = self.env.cr.fetchone()[0]
+        if cursor or updated_since or not key_conditions:
+            conditions.append('i.xact_id < %s')
+            params.append(xmin)
+
+        if cursor:
+            xact_id, record_id = self._decode_cursor(cursor)
+            conditions.append('(i.xact_id, i.id) > (%s, %s)')
+            params.extend([xact_id, record_id])
+        elif updated_since:
+            try:
+                since = datetime.fromisoformat(updated_since)
+            except (TypeError, ValueError):
+                raise UserError(_('Data inválida em updated_since: %s') % updated_since)
+            if since.tzinfo:
+                since = since.astimezone(timezone.utc).replace(tzinfo=None)
+            conditions.append('i.write_date >= %s')
+            params.append(since)
+
+        self.env['pix.installment'].flush_model()
+        self.env['account.payment'].flush_model(['pix_correlation_id'])
+        self.env.cr.execute(
+            STATUS_PROJECTION_QUERY.format(where=' AND '.join(conditions)),
+            params + [limit + 1],
+        )
+        rows = self.env.cr.dictfetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = cursor
+        if rows:
+            committed = [row for row in rows if row['xact_id'] < xmin]
+            if committed:
+                next_cursor = self._encode_cursor(committed[-1]['xact_id'], committed[-1]['id'])
+            else:
+                # Só gravações posteriores ao xmin (consulta por lista): continua a partir dele
+                next_cursor = self._encode_cursor(xmin - 1, 0)
+        for row in rows:
+            row.pop('xact_id')
+            for key in ('due_date', 'sent_date', 'paid_date', 'last_sync', 'write_date'):
+                if row[key]:
+                    row[key] = row[key].isoformat()
+        return {
+            'items': rows,
+            'next_cursor': next_cursor,
+            'has_more': has_more,
+        }
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+
+import select
+import threading
+import time
+from datetime import timedelta
+import odoo
+from odoo import models, fields, api, sql_db, _
+from odoo.exceptions import UserError
+from odoo.tools import config
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Canal PostgreSQL notificado (com o id da empresa) a cada transição confirmada
+STATUS_EVENT_CHANNEL = 'pix_status_event'
+
+# Tamanho padrão e máximo de uma página do feed
+STATUS_EVENT_DEFAULT_LIMIT = 500
+STATUS_EVENT_MAX_LIMIT = 5000
+
+# Tempo máximo de espera do long-polling (segundos)
+STATUS_EVENT_MAX_WAIT = 25
+
+# Intervalo de reconsulta durante a espera, para eventos liberados sem notificação
+STATUS_EVENT_RECHECK_SECONDS = 5
+
+# Esperas simultâneas por processo: cada uma ocupa uma thread e uma conexão dedicada
+STATUS_EVENT_MAX_WAITERS = 8
+_waiters = threading.BoundedSemaphore(STATUS_EVENT_MAX_WAITERS)
+
+# Retenção dos eventos (limpeza diária pelo autovacuum)
+STATUS_EVENT_RETENTION_DAYS = 90
+
+STATUS_SELECTION = [
+    ('draft', 'Rascunho'),
+    ('pending', 'Pendente'),
+    ('paid', 'Pago'),
+    ('failed', 'Falhou'),
+]
+
+# Gatilho que registra a transição na mesma transação da alteração do status.
+# xact_id guarda a transação que gerou o evento: o feed só entrega eventos de
+# transações já encerradas, na ordem (xact_id, id), de forma que um evento
+# confirmado depois nunca fica atrás de um cursor já entregue.
+STATUS_EVENT_TRIGGER_FUNCTION = """
+    CREATE OR REPLACE FUNCTION pix_status_event_log() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND NEW.pix_status IS NOT DISTINCT FROM OLD.pix_status THEN
+            RETURN NULL;
+        END IF;
+        IF NEW.pix_status IS NULL THEN
+            RETURN NULL;
+        END IF;
+        INSERT INTO pix_status_event (xact_id, res_model, res_id, company_id, old_status, new_status, event_date)
+        VALUES (
+            txid_current(),
+            TG_ARGV[0],
+            NEW.id,
+            NEW.company_id,
+            CASE WHEN TG_OP = 'UPDATE' THEN OLD.pix_status END,
+            NEW.pix_status,
+            now() at time zone 'UTC'
+        );
+        PERFORM pg_notify('%s', NEW.company_id::text);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+""" % STATUS_EVENT_CHANNEL
+
+STATUS_EVENT_TRIGGERS = [
+    ('pix_installment', 'pix.installment'),
+    ('account_payment', 'account.payment'),
+]
+
+
+class PixStatusEvent(models.Model):
+    _name = 'pix.status.event'
+    _description = 'Evento de Status PIX'
+    _order = 'id desc'
+    _log_access = False
+
+    res_model = fields.Selection(
+        [
+            ('pix.installment', 'Parcela PIX'),
+            ('account.payment', 'Pagamento'),
+        ],
+        string='Modelo',
+        required=True,
+        readonly=True
+    )
+    res_id = fields.Many2oneReference(
+        string='Registro',
+        model_field='res_model',
+        required=True,
+        readonly=True,
+        index=True
+    )
+    company_id = fields.Many2one(
+        'res.company',
+        string='Empresa',
+        readonly=True
+    )
+    old_status = fields.Selection(STATUS_SELECTION, string='Status Anterior', readonly=True)
+    new_status = fields.Selection(STATUS_SELECTION, string='Novo Status', required=True, readonly=True)
+    event_date = fields.Datetime(
+        string='Data',
+        required=True,
+        readonly=True,
+        index=True
+    )
+
+    def init(self):
+        # Transação de origem do evento (bigint, fora do ORM) e índice do cursor do feed
+        self.env.cr.execute("ALTER TABLE pix_status_event ADD COLUMN IF NOT EXISTS xact_id bigint")
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS pix_status_event_feed_idx
+            ON pix_status_event (xact_id, id)
+        """)
+        self.env.cr.execute(STATUS_EVENT_TRIGGER_FUNCTION)
+        for table, model in STATUS_EVENT_TRIGGERS:
+            self.env.cr.execute(f"""
+                DROP TRIGGER IF EXISTS {table}_pix_status_event ON {table};
+                CREATE TRIGGER {table}_pix_status_event
+                AFTER INSERT OR UPDATE OF pix_status ON {table}
+                FOR EACH ROW EXECUTE PROCEDURE pix_status_event_log('{model}')
+            """)
+
+    @api.model
+    def _encode_cursor(self, xact_id, event_id):
+        return f'{xact_id}-{event_id}'
+
+    @api.model
+    def _decode_cursor(self, cursor):
+        try:
+            xact_id, event_id = cursor.split('-')
+            return int(xact_id), int(event_id)
+        except (AttributeError, ValueError):
+            raise UserError(_('Cursor inválido: %s') % cursor)
+
+    @api.model
+    def _parse_limit(self, limit):
+        try:
+            limit = int(limit or STATUS_EVENT_DEFAULT_LIMIT)
+        except (TypeError, ValueError):
+            raise UserError(_('Limite inválido: %s') % limit)
+        if limit <= 0:
+            raise UserError(_('O limite deve ser positivo.'))
+        return min(limit, STATUS_EVENT_MAX_LIMIT)
+
+    @api.model
+    def _parse_timeout(self, timeout):
+        try:
+            return min(float(timeout or 0), STATUS_EVENT_MAX_WAIT)
+        except (TypeError, ValueError):
+            raise UserError(_('Tempo de espera inválido: %s') % timeout)
+
+    @api.model
+    def _can_wait(self):
+        """O long-polling só é permitido fora do modo prefork (servidor com threads ou gevent)"""
+        return odoo.evented or not config['workers']
+
+    @api.model
+    def _get_head_cursor(self):
+        """Cursor posicionado após o último evento já entregável"""
+        self.env.cr.execute("""
+            SELECT xact_id, id
+              FROM pix_status_event
+             WHERE xact_id < txid_snapshot_xmin(txid_current_snapshot())
+          ORDER BY xact_id DESC, id DESC
+             LIMIT 1
+        """)
+        row = self.env.cr.fetchone()
+        return self._encode_cursor(*row) if row else None
+
+    @api.model
+    def _read_feed(self, cursor=None, limit=None):
+        """Eventos após o cursor, das empresas do usuário
+
+        Só são entregues eventos de transações já encerradas (anteriores ao xmin
+        do snapshot atual); eventos de transações em andamento aparecem em uma
+        leitura posterior, sempre após o cursor entregue. Uma transação longa
+        (de qualquer origem) segura o xmin: enquanto ela estiver aberta o feed
+        não avança, mesmo para eventos já confirmados depois dela.
+
+        :param cursor: cursor retornado por uma leitura anterior; sem cursor, desde o início
+        :return: dicionário com events, next_cursor e has_more
+        """
+        self.check_access('read')
+        limit = self._parse_limit(limit)
+        xact_id, event_id = self._decode_cursor(cursor) if cursor else (0, 0)
+
+        self.env.cr.execute("""
+            SELECT xact_id, id, res_model, res_id, company_id, old_status, new_status, event_date
+              FROM pix_status_event
+             WHERE (xact_id, id) > (%s, %s)
+               AND xact_id < txid_snapshot_xmin(txid_current_snapshot())
+               AND company_id = ANY(%s)
+          ORDER BY xact_id, id
+             LIMIT %s
+        """, (xact_id, event_id, self.env.companies.ids, limit + 1))
+        rows = self.env.cr.dictfetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = cursor
+        if rows:
+            next_cursor = self._encode_cursor(rows[-1]['xact_id'], rows[-1]['id'])
+        events = []
+        for row in rows:
+            xact = row.pop('xact_id')
+            row['sequence'] = self._encode_cursor(xact, row['id'])
+            row['event_date'] = row['event_date'].isoformat()
+            events.append(row)
+        return {
+            'events': events,
+            'next_cursor': next_cursor,
+            'has_more': has_more,
+        }
+
+    @api.model
+    def _read_feed_new_cursor(self, cursor, limit):
+        """Lê o feed em um cursor de banco novo (snapshot atualizado)"""
+        with self.env.registry.cursor() as cr:
+            return self.with_env(self.env(cr=cr))._read_feed(cursor, limit)
+
+    @api.model
+    def _wait_feed(self, cursor=None, limit=None, timeout=0):
+        """Long-polling do feed: aguarda até timeout segundos por novos eventos
+
+        A espera é feita com LISTEN no canal pix_status_event, em uma conexão
+        dedicada; sem notificações não há consultas além da reconsulta periódica.
+
+        A espera bloqueia a thread da requisição e abre uma conexão extra, por isso
+        só acontece em servidores com threads ou gevent: no modo prefork (workers)
+        um worker HTTP ficaria preso e a página é retornada sem esperar. Acima de
+        STATUS_EVENT_MAX_WAITERS esperas simultâneas no processo, idem; o cliente
+        repete a consulta com o cursor recebido.
+        """
+        page = self._read_feed(cursor, limit)
+        timeout = self._parse_timeout(timeout)
+        if page['events'] or timeout <= 0 or not self._can_wait():
+            return page
+        if not _waiters.acquire(blocking=False):
+            return page
+        try:
+            return self._listen_feed(page, cursor, limit, timeout)
+        finally:
+            _waiters.release()
+
+    @api.model
+    def _listen_feed(self, page, cursor, limit, timeout):
+        company_ids = {str(company_id) for company_id in self.env.companies.ids}
+        deadline = time.monotonic() + timeout
+        with sql_db.db_connect(self.env.cr.dbname).cursor() as listen_cr:
+            listen_cr.execute(f'LISTEN {STATUS_EVENT_CHANNEL}')
+            listen_cr.commit()
+            connection = listen_cr._cnx
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return page
+                wait = min(remaining, STATUS_EVENT_RECHECK_SECONDS)
+                if select.select([connection], [], [], wait) != ([], [], []):
+                    connection.poll()
+                    notified = {notify.payload for notify in connection.notifies}
+                    connection.notifies.clear()
+                    if not notified & company_ids:
+                        continue
+                page = self._read_feed_new_cursor(cursor, limit)
+                if page['events']:
+                    return page
+
+    @api.autovacuum
+    def _gc_status_events(self):
+        """Remove os eventos além do período de retenção"""
+        cutoff = fields.Datetime.now() - timedelta(days=STATUS_EVENT_RETENTION_DAYS)
+        self.env.cr.execute("DELETE FROM pix_status_event WHERE event_date < %s", (cutoff,))
+        if self.env.cr.rowcount:
+            _logger.info(f'{self.env.cr.rowcount} evento(s) de status PIX removido(s) pela retenção.')
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""Perfil de tempo por fase das operações PIX (envio e sincronização)
+
+Um perfil é aberto por operação (profile) e cada trecho medido (phase) soma o
+seu tempo exclusivo: fases aninhadas não são contadas duas vezes (ex.: o token
+obtido dentro da chamada HTTP conta apenas como token). Fora de um perfil as
+fases não têm custo além de uma verificação. Os tempos acumulados são gravados
+pelo pix.timing.mixin junto com a alteração de status dos registros, sem uma
+gravação própria.
+"""
+
+import contextlib
+import functools
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+# Fases registradas nas parcelas e pagamentos
+PHASES = ('payload', 'token', 'http', 'db', 'posting')
+
+_local = threading.local()
+
+
+def _current():
+    return getattr(_local, 'profile', None)
+
+
+@contextlib.contextmanager
+def profile(operation=None, batch=None):
+    """Abre um perfil; ao sair, timings['total'] contém a duração total (segundos)"""
+    previous = (_current(), getattr(_local, 'stack', None), getattr(_local, 'operation', None),
+                getattr(_local, 'batch', None), getattr(_local, 'started', None))
+    timings = defaultdict(float)
+    started = time.perf_counter()
+    _local.profile = timings
+    _local.stack = []
+    _local.operation = operation
+    _local.batch = batch
+    _local.started = started
+    try:
+        yield timings
+    finally:
+        timings['total'] = time.perf_counter() - started
+        _local.profile, _local.stack, _local.operation, _local.batch, _local.started = previous
+
+
+def snapshot():
+    """Operação, lote e tempos (segundos) do perfil ativo até agora, ou None fora de uma operação"""
+    timings = _current()
+    if timings is None or not _local.operation:
+        return None
+    timings = dict(timings)
+    timings['total'] = time.perf_counter() - _local.started
+    return _local.operation, _local.batch, timings
+
+
+@contextlib.contextmanager
+def phase(name):
+    """Mede um trecho do perfil ativo (tempo exclusivo das fases aninhadas)"""
+    timings = _current()
+    if timings is None:
+        yield
+        return
+    frame = [0.0]
+    _local.stack.append(frame)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        _local.stack.pop()
+        timings[name] += elapsed - frame[0]
+        if _local.stack:
+            _local.stack[-1][0] += elapsed
+
+
+def timed(name):
+    """Decorador: executa o método dentro da fase informada"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return method(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def profiled(operation):
+    """Decorador: perfila a operação
+
+    Os registros cujo status muda durante a operação gravam os tempos medidos até
+    aquele momento na mesma gravação do status, inclusive no caminho de erro
+    (status falhou ou pendente). Operações chamadas dentro de outra já perfilada
+    somam suas fases ao perfil externo. O lote vem do contexto (pix_timing_batch)
+    ou é gerado por operação.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if _current() is not None:
+                return method(self, *args, **kwargs)
+            batch = self.env.context.get('pix_timing_batch') or uuid.uuid4().hex[:12]
+            with profile(operation, batch):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
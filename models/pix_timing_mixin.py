@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields
+
+from . import pix_timing
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class PixTimingMixin(models.AbstractModel):
+    _name = 'pix.timing.mixin'
+    _description = 'Perfil de Tempo PIX'
+
+    pix_timing_operation = fields.Selection(
+        [
+            ('send', 'Envio'),
+            ('sync', 'Sincronização'),
+        ],
+        string='Operação Medida',
+        copy=False,
+        readonly=True,
+        help='Última operação PIX cujo tempo foi medido'
+    )
+    pix_timing_batch = fields.Char(
+        string='Lote da Medição',
+        copy=False,
+        readonly=True,
+        index=True,
+        help='Identificador do lote (execução do agendador, sincronização etc.) da última medição'
+    )
+    pix_timing_date = fields.Datetime(string='Data da Medição', copy=False, readonly=True)
+    pix_timing_payload_ms = fields.Integer(string='Montagem do Payload (ms)', copy=False, readonly=True, aggregator='avg')
+    pix_timing_token_ms = fields.Integer(string='Token (ms)', copy=False, readonly=True, aggregator='avg')
+    pix_timing_http_ms = fields.Integer(string='HTTP (ms)', copy=False, readonly=True, aggregator='avg')
+    pix_timing_db_ms = fields.Integer(string='Gravação (ms)', copy=False, readonly=True, aggregator='avg')
+    pix_timing_posting_ms = fields.Integer(string='Lançamentos (ms)', copy=False, readonly=True, aggregator='avg')
+    pix_timing_total_ms = fields.Integer(string='Total (ms)', copy=False, readonly=True, aggregator='avg')
+
+    def write(self, vals):
+        # O perfil de tempo acompanha a gravação do status, sem UPDATE próprio
+        if 'pix_status' in vals:
+            timing_vals = self._get_pix_timing_values()
+            if timing_vals:
+                vals = dict(vals, **timing_vals)
+        return super().write(vals)
+
+    def _get_pix_timing_values(self):
+        """Valores do perfil de tempo da operação em andamento (vazio fora de uma operação)"""
+        try:
+            current = pix_timing.snapshot()
+            if not current:
+                return {}
+            operation, batch, timings = current
+            return {
+                'pix_timing_operation': operation,
+                'pix_timing_batch': batch,
+                'pix_timing_date': fields.Datetime.now(),
+                'pix_timing_payload_ms': round(timings.get('payload', 0.0) * 1000),
+                'pix_timing_token_ms': round(timings.get('token', 0.0) * 1000),
+                'pix_timing_http_ms': round(timings.get('http', 0.0) * 1000),
+                'pix_timing_db_ms': round(timings.get('db', 0.0) * 1000),
+                'pix_timing_posting_ms': round(timings.get('posting', 0.0) * 1000),
+                'pix_timing_total_ms': round(timings.get('total', 0.0) * 1000),
+            }
+        except Exception as e:
+            # A medição nunca impede a gravação do status
+            _logger.warning(f'Falha ao obter o perfil de tempo PIX: {e}')
+            return {}
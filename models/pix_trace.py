@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""Rastreamento (spans) das fases do ciclo de vida PIX
+
+Cada transferência é um trace identificado pelo pix_correlation_id do pagamento.
+As fases (geração, montagem do payload, token, envio, sincronização, liquidação)
+são spans com duração e a fase medida (orm, http, posting).
+
+Desativado por padrão. Para ativar, configure no arquivo do Odoo:
+
+    pix_trace_file = /var/log/odoo/pix_traces.jsonl
+    pix_trace_otlp_endpoint = http://localhost:4318/v1/traces
+
+O arquivo recebe um span por linha (JSON); o endpoint recebe lotes no formato
+OTLP/HTTP JSON. A exportação é feita por uma thread em segundo plano.
+"""
+
+import contextlib
+import functools
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+import requests
+
+from odoo.tools import config
+from . import pix_json
+
+_logger = logging.getLogger(__name__)
+
+SERVICE_NAME = 'odoo-payment-itau-pix'
+
+# Quantidade máxima de spans por envio ao coletor OTLP
+EXPORT_BATCH_SIZE = 200
+
+# Spans aguardando exportação; descartados (com aviso) se a fila encher
+EXPORT_QUEUE_SIZE = 10000
+
+# OTLP SpanKind
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+
+_local = threading.local()
+_queue = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+_exporter_lock = threading.Lock()
+_exporter = None
+
+
+def is_enabled():
+    return bool(config.get('pix_trace_file') or config.get('pix_trace_otlp_endpoint'))
+
+
+def _trace_id(key):
+    """Trace id OTLP (32 hex) derivado da chave: o próprio UUID do correlation_id"""
+    try:
+        return uuid.UUID(str(key)).hex
+    except ValueError:
+        return uuid.uuid5(uuid.NAMESPACE_OID, str(key)).hex
+
+
+@contextlib.contextmanager
+def span(name, key=None, phase='orm', **attributes):
+    """Abre um span; sem chave, herda o trace do span pai (ou inicia um novo)"""
+    if not is_enabled():
+        yield None
+        return
+
+    stack = _local.__dict__.setdefault('stack', [])
+    parent = stack[-1] if stack else None
+    if key:
+        trace_id = _trace_id(key)
+    elif parent:
+        trace_id = parent['traceId']
+    else:
+        trace_id = uuid.uuid4().hex
+    record = {
+        'traceId': trace_id,
+        'spanId': os.urandom(8).hex(),
+        'parentSpanId': parent['spanId'] if parent and parent['traceId'] == trace_id else '',
+        'name': name,
+        'kind': SPAN_KIND_CLIENT if phase == 'http' else SPAN_KIND_INTERNAL,
+        'attributes': dict(attributes, **{'pix.phase': phase}),
+        'startTimeUnixNano': time.time_ns(),
+    }
+    if key:
+        record['attributes']['pix.correlation_id'] = str(key)
+    if parent and parent['traceId'] != trace_id:
+        # Span iniciado dentro de outro trace (ex.: pagamento dentro de um lote)
+        record['attributes']['pix.parent_trace_id'] = parent['traceId']
+
+    stack.append(record)
+    try:
+        yield record
+    except Exception as e:
+        record['status'] = {'code': 2, 'message': str(e)[:500]}
+        raise
+    finally:
+        stack.pop()
+        record['endTimeUnixNano'] = time.time_ns()
+        _export(record)
+
+
+def traced(name, phase='orm', key=None):
+    """Decorador: executa o método dentro de um span
+
+    :param key: função (self, *args, **kwargs) -> chave do trace (correlation_id)
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not is_enabled():
+                return method(self, *args, **kwargs)
+            trace_key = key(self, *args, **kwargs) if key else None
+            with span(name, key=trace_key, phase=phase, **{'odoo.model': self._name, 'odoo.record_count': len(self)}):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _export(record):
+    _ensure_exporter()
+    try:
+        _queue.put_nowait(record)
+    except queue.Full:
+        _logger.warning('Fila de exportação de spans PIX cheia: span descartado.')
+
+
+def _ensure_exporter():
+    global _exporter
+    if _exporter is not None and _exporter.is_alive():
+        return
+    with _exporter_lock:
+        if _exporter is None or not _exporter.is_alive():
+            _exporter = threading.Thread(target=_export_loop, name='pix_trace_exporter', daemon=True)
+            _exporter.start()
+
+
+def _export_loop():
+    while True:
+        batch = [_queue.get()]
+        while len(batch) < EXPORT_BATCH_SIZE:
+            try:
+                batch.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            _write_file(batch)
+            _send_otlp(batch)
+        except Exception as e:
+            _logger.warning(f'Falha ao exportar spans PIX: {e}')
+
+
+def _write_file(batch):
+    path = config.get('pix_trace_file')
+    if not path:
+        return
+    with open(path, 'a', encoding='utf-8') as trace_file:
+        for record in batch:
+            trace_file.write(pix_json.dumps(record) + '\n')
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _send_otlp(batch):
+    endpoint = config.get('pix_trace_otlp_endpoint')
+    if not endpoint:
+        return
+    spans = []
+    for record in batch:
+        otlp_span = dict(record)
+        otlp_span['startTimeUnixNano'] = str(record['startTimeUnixNano'])
+        otlp_span['endTimeUnixNano'] = str(record['endTimeUnixNano'])
+        otlp_span['attributes'] = [
+            {'key': name, 'value': _otlp_value(value)} for name, value in record['attributes'].items()
+        ]
+        spans.append(otlp_span)
+    body = {
+        'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}}]},
+            'scopeSpans': [{'scope': {'name': 'payment_itau_pix'}, 'spans': spans}],
+        }],
+    }
+    response = requests.post(
+        endpoint,
+        data=pix_json.dumps(body).encode('utf-8'),
+        headers={'Content-Type': 'application/json'},
+        timeout=10,
+    )
+    response.raise_for_status()
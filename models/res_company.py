@@ -29,6 +29,45 @@ class ResCompany(models.Model):
         check_company=True,
         help='Diário utilizado para lançamentos contábeis relacionados a PIX'
     )
+    pix_netting = fields.Boolean(
+        string='Consolidar PIX por Fornecedor',
+        default=False,
+        help='Agrupa as parcelas de um mesmo fornecedor, conta bancária e vencimento '
+             'em um único pagamento e uma única transferência PIX'
+    )
+    pix_auto_dispatch = fields.Boolean(
+        string='Envio Automático de PIX',
+        default=False,
+        help='Envia automaticamente todas as parcelas em rascunho conforme o vencimento. '
+             'Quando desmarcado, apenas as parcelas colocadas na fila de envio são enviadas'
+    )
+    pix_dispatch_lead_days = fields.Integer(
+        string='Antecedência de Envio (dias)',
+        default=0,
+        help='Quantidade de dias antes do vencimento em que a parcela é liberada para envio'
+    )
+    pix_archive_retention_days = fields.Integer(
+        string='Retenção de Parcelas PIX Pagas (dias)',
+        default=180,
+        help='Parcelas pagas há mais dias que este prazo são movidas para o arquivo. Zero desativa o arquivamento'
+    )
+    pix_stuck_pending_hours = fields.Integer(
+        string='Limite de Pendência PIX (horas)',
+        default=24,
+        help='PIX pendentes há mais tempo que este limite são sinalizados como travados e ressincronizados'
+    )
+    pix_failed_alert_threshold = fields.Integer(
+        string='Alerta de Falhas PIX (24h)',
+        default=10,
+        help='Quantidade de PIX com falha nas últimas 24 horas a partir da qual um alerta é registrado'
+    )
+
+    def write(self, vals):
+        result = super().write(vals)
+        if 'itau_pix_api_id' in vals:
+            # A resolução empresa -> credenciais Itaú PIX fica em cache
+            self.env.registry.clear_cache()
+        return result
 
     @api.constrains('itau_pix_api_id')
     def _check_itau_pix_api(self):
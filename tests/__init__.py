@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+
+from . import test_credential_failover
+from . import test_itau_pix_mtls
+from . import test_itau_pix_warmup
+from . import test_pix_archive
+from . import test_pix_batch_simulator
+from . import test_pix_benchmark
+from . import test_pix_dispatch_scheduler
+from . import test_pix_cnab
+from . import test_pix_netting
+from . import test_pix_statement_matcher
+from . import test_pix_status_api
+from . import test_pix_status_event
+from . import test_pix_sync_cron
+from . import test_pix_timing
+from . import test_pix_worker
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+import time
+
+import requests
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.addons.payment_itau_pix.models import base_payment_api
+
+
+class PixTestCommon(AccountTestInvoicingCommon):
+    """Base dos testes PIX: empresa configurada, fornecedor com chave PIX e duas credenciais Itaú"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.company = cls.company_data['company']
+        cls.company.partner_id.write({'vat': '11222333000181', 'is_company': True})
+
+        cls.transit_account = cls.env['account.account'].create({
+            'name': 'PIX em Trânsito',
+            'code': 'PIXTR',
+            'account_type': 'asset_current',
+            'reconcile': True,
+        })
+        cls.company_bank_account = cls.env['res.partner.bank'].create({
+            'partner_id': cls.company.partner_id.id,
+            'acc_number': '123456',
+            'bank_account_type': 'CC',
+        })
+        cls.pix_journal = cls.env['account.journal'].create({
+            'name': 'PIX Itaú',
+            'code': 'PIXIT',
+            'type': 'bank',
+            'bank_account_id': cls.company_bank_account.id,
+        })
+
+        cls.api_primary, cls.api_secondary = cls.env['base.payment.api'].create([{
+            'name': f'Itaú PIX {label}',
+            'integracao': 'itau_pix',
+            'base_url': f'https://{label}.itau.test',
+            'client_id': f'client-{label}',
+            'client_secret': 'secret',
+            'company_id': cls.company.id,
+        } for label in ('primary', 'secondary')])
+
+        cls.company.write({
+            'itau_pix_api_id': cls.api_primary.id,
+            'pix_journal_id': cls.pix_journal.id,
+            'pix_transit_account_id': cls.transit_account.id,
+        })
+
+        cls.supplier = cls.env['res.partner'].create({
+            'name': 'Fornecedor PIX',
+            'vat': '99888777000166',
+            'is_company': True,
+        })
+        cls.supplier_bank = cls.env['res.partner.bank'].create({
+            'partner_id': cls.supplier.id,
+            'acc_number': '654321',
+            'pix_payment_type': 'chave_pix',
+            'pix_key_type': 'email',
+            'pix_key': 'fornecedor@example.com',
+        })
+
+    def setUp(self):
+        super().setUp()
+        # Estado por processo: credenciais saudáveis e tokens válidos, sem acesso à rede
+        base_payment_api._CREDENTIAL_HEALTH.clear()
+        for api_config in self.api_primary | self.api_secondary:
+            base_payment_api._TOKENS[(self.env.cr.dbname, api_config.id)] = ('token', time.monotonic() + 3600)
+        self.addCleanup(base_payment_api._CREDENTIAL_HEALTH.clear)
+        self.addCleanup(base_payment_api._TOKENS.clear)
+
+    @classmethod
+    def _create_bill(cls, amount, move_type='in_invoice', partner=None):
+        bill = cls.init_invoice(move_type, partner=partner or cls.supplier, amounts=[amount])
+        bill.partner_bank_id = cls.supplier_bank
+        bill.action_post()
+        return bill
+
+    @classmethod
+    def _payable_lines(cls, moves):
+        return moves.line_ids.filtered(lambda l: l.account_id.account_type == 'liability_payable')
+
+    @classmethod
+    def _create_installment(cls, amount=100.0):
+        return cls.env['pix.installment']._create_split_installments(cls._payable_lines(cls._create_bill(amount)))
+
+    @classmethod
+    def _make_response(cls, status_code, content=b'{}'):
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = content
+        response.url = 'https://itau.test'
+        return response
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+from unittest.mock import patch
+
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from odoo.tests import tagged
+
+from odoo.addons.payment_itau_pix.models.base_payment_api import PixOutcomeUnknown
+from .common import PixTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestCredentialFailover(PixTestCommon):
+
+    def _request(self, method, responses):
+        """Executa _itau_pix_request com as respostas/exceções dadas, em ordem
+
+        :return: (resultado ou exceção, URLs chamadas)
+        """
+        calls = []
+
+        def fake_request(method, url=None, **kwargs):
+            calls.append(url)
+            outcome = responses[len(calls) - 1]
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        with patch.object(requests.Session, 'request', side_effect=fake_request):
+            try:
+                result = self.env['base.payment.api']._itau_pix_request(method, '/transferencias')
+            except Exception as e:
+                result = e
+        return result, calls
+
+    def _connection_refused(self):
+        reason = NewConnectionError(None, 'Connection refused')
+        return requests.exceptions.ConnectionError(MaxRetryError(None, '/transferencias', reason))
+
+    def test_post_read_timeout_does_not_fail_over(self):
+        result, calls = self._request('POST', [requests.exceptions.ReadTimeout('read timeout')])
+        self.assertIsInstance(result, PixOutcomeUnknown)
+        self.assertEqual(len(calls), 1)
+
+    def test_post_dropped_connection_does_not_fail_over(self):
+        result, calls = self._request('POST', [requests.exceptions.ConnectionError('connection reset')])
+        self.assertIsInstance(result, PixOutcomeUnknown)
+        self.assertEqual(len(calls), 1)
+
+    def test_post_server_error_does_not_fail_over(self):
+        result, calls = self._request('POST', [self._make_response(503)])
+        self.assertIsInstance(result, PixOutcomeUnknown)
+        self.assertEqual(len(calls), 1)
+
+    def test_post_connect_timeout_fails_over(self):
+        result, calls = self._request('POST', [
+            requests.exceptions.ConnectTimeout('connect timeout'),
+            self._make_response(200),
+        ])
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(len(calls), 2)
+        self.assertNotEqual(calls[0], calls[1])
+
+    def test_post_connection_refused_fails_over(self):
+        result, calls = self._request('POST', [self._connection_refused(), self._make_response(200)])
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(len(calls), 2)
+
+    def test_post_rate_limited_fails_over(self):
+        result, calls = self._request('POST', [self._make_response(429), self._make_response(200)])
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(len(calls), 2)
+
+    def test_get_server_error_fails_over(self):
+        result, calls = self._request('GET', [self._make_response(503), self._make_response(200)])
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(len(calls), 2)
+
+    def test_failed_credential_goes_to_cooldown(self):
+        result, calls = self._request('GET', [requests.exceptions.ReadTimeout('read timeout'), self._make_response(200)])
+        self.assertEqual(result.status_code, 200)
+        failed = (self.api_primary | self.api_secondary).filtered(
+            lambda api_config: calls[0].startswith(api_config.base_url)
+        )
+        self.assertFalse(failed._is_itau_pix_healthy())
+
+    def test_all_credentials_failing_raises_last_error(self):
+        result, calls = self._request('GET', [self._make_response(503), self._make_response(502)])
+        self.assertIsInstance(result, requests.exceptions.HTTPError)
+        self.assertEqual(len(calls), 2)
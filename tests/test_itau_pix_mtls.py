@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+
+import base64
+import os
+import socket
+import ssl
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import ExtendedKeyUsageOID, NameOID
+
+from odoo.exceptions import ValidationError
+from odoo.tests import tagged
+
+from odoo.addons.payment_itau_pix.models import base_payment_api
+from odoo.addons.payment_itau_pix.models.base_payment_api import PixSSLContextAdapter
+from .common import PixTestCommon
+
+CLIENT_KEY_PASSWORD = 'senha-do-certificado'
+
+
+def _pem(cert):
+    return cert.public_bytes(serialization.Encoding.PEM)
+
+
+def _make_certificate(common_name, issuer=None, usage=None, dns_names=None):
+    """Certificado de teste (CA própria quando issuer é omitido) e sua chave"""
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, common_name)])
+    issuer_cert, issuer_key = issuer or (None, key)
+    now = datetime.now(timezone.utc)
+    builder = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(issuer_cert.subject if issuer_cert else name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(minutes=5))
+        .not_valid_after(now + timedelta(days=1))
+        .add_extension(x509.BasicConstraints(ca=issuer is None, path_length=None), critical=True)
+        .add_extension(x509.SubjectKeyIdentifier.from_public_key(key.public_key()), critical=False)
+    )
+    if issuer is None:
+        builder = builder.add_extension(x509.KeyUsage(
+            digital_signature=True, content_commitment=False, key_encipherment=False,
+            data_encipherment=False, key_agreement=False, key_cert_sign=True, crl_sign=True,
+            encipher_only=False, decipher_only=False,
+        ), critical=True)
+    else:
+        builder = builder.add_extension(
+            x509.AuthorityKeyIdentifier.from_issuer_public_key(issuer_key.public_key()), critical=False,
+        ).add_extension(x509.ExtendedKeyUsage([usage]), critical=False)
+    if dns_names:
+        builder = builder.add_extension(
+            x509.SubjectAlternativeName([x509.DNSName(dns_name) for dns_name in dns_names]), critical=False,
+        )
+    return builder.sign(issuer_key, hashes.SHA256()), key
+
+
+@tagged('post_install', '-at_install')
+class TestItauPixMtls(PixTestCommon):
+
+    def setUp(self):
+        super().setUp()
+        # Contextos SSL simulados: um novo objeto a cada carregamento do certificado
+        ApiModel = self.env.registry['base.payment.api']
+        patcher = patch.object(ApiModel, '_load_itau_pix_ssl_context', autospec=True,
+                               side_effect=lambda record: MagicMock(name='ssl_context'))
+        self.load_context = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.api_primary.write({'itau_pix_cert_file': base64.b64encode(b'certificado-1')})
+        self.addCleanup(self.api_primary._invalidate_itau_pix_cache)
+
+    def _adapter(self):
+        return self.api_primary._get_itau_pix_session().get_adapter('https://primary.itau.test')
+
+    def test_session_uses_client_certificate(self):
+        adapter = self._adapter()
+        self.assertIsInstance(adapter, PixSSLContextAdapter)
+        self.assertIs(adapter._ssl_context, self.api_primary._get_itau_pix_ssl_context())
+
+    def test_context_is_cached_per_certificate(self):
+        self._adapter()
+        loads = self.load_context.call_count
+        self._adapter()
+        self.api_primary._get_itau_pix_ssl_context()
+        self.assertEqual(self.load_context.call_count, loads)
+
+    def test_certificate_changed_in_another_process(self):
+        old_adapter = self._adapter()
+        # Outro worker trocou o certificado: o banco muda, o cache deste processo não é invalidado
+        self.env.cr.execute(
+            "UPDATE base_payment_api SET itau_pix_cert_fingerprint = 'outro' WHERE id = %s",
+            (self.api_primary.id,),
+        )
+        self.api_primary.invalidate_recordset(['itau_pix_cert_fingerprint'])
+
+        new_adapter = self._adapter()
+        self.assertIsNot(new_adapter, old_adapter)
+        self.assertIsNot(new_adapter._ssl_context, old_adapter._ssl_context)
+
+
+@tagged('post_install', '-at_install')
+class TestItauPixMtlsHandshake(PixTestCommon):
+    """Certificados reais (CA descartável) e handshake mTLS contra um servidor ssl local"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.ca_cert, cls.ca_key = _make_certificate('CA de Teste PIX')
+        ca = (cls.ca_cert, cls.ca_key)
+        cls.server_cert, cls.server_key = _make_certificate(
+            'localhost', ca, ExtendedKeyUsageOID.SERVER_AUTH, ['localhost'],
+        )
+        cls.client_cert, cls.client_key = _make_certificate('cliente-pix', ca, ExtendedKeyUsageOID.CLIENT_AUTH)
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(self.api_secondary._invalidate_itau_pix_cache)
+
+    def _configure_client_certificate(self, password=CLIENT_KEY_PASSWORD):
+        key_pem = self.client_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.BestAvailableEncryption(CLIENT_KEY_PASSWORD.encode()),
+        )
+        self.api_secondary.write({
+            'itau_pix_cert_file': base64.b64encode(_pem(self.client_cert)),
+            'itau_pix_key_file': base64.b64encode(key_pem),
+            'itau_pix_cert_password': password,
+        })
+
+    def _start_server(self):
+        """Servidor TLS local que exige certificado de cliente e responde com o CN recebido"""
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        cert_path = os.path.join(tmp_dir.name, 'server.pem')
+        key_path = os.path.join(tmp_dir.name, 'server.key')
+        with open(cert_path, 'wb') as cert_file:
+            cert_file.write(_pem(self.server_cert))
+        with open(key_path, 'wb') as key_file:
+            key_file.write(self.server_key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption(),
+            ))
+        server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_context.load_cert_chain(cert_path, key_path)
+        server_context.load_verify_locations(cadata=_pem(self.ca_cert).decode())
+        server_context.verify_mode = ssl.CERT_REQUIRED
+
+        listener = socket.create_server(('127.0.0.1', 0))
+        self.addCleanup(listener.close)
+        listener.settimeout(10)
+        result = {}
+
+        def serve():
+            try:
+                connection, _address = listener.accept()
+                with server_context.wrap_socket(connection, server_side=True) as tls:
+                    subject = dict(item[0] for item in tls.getpeercert()['subject'])
+                    result['client'] = subject['commonName']
+                    tls.recv(65536)
+                    body = result['client'].encode()
+                    tls.sendall(
+                        b'HTTP/1.1 200 OK\r\nContent-Length: %d\r\nConnection: close\r\n\r\n%s'
+                        % (len(body), body)
+                    )
+            except Exception as e:
+                result['error'] = e
+
+        thread = threading.Thread(target=serve, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join, 10)
+        return listener.getsockname()[1], result
+
+    def test_load_encrypted_key_removes_temporary_files(self):
+        self._configure_client_certificate()
+        directories = []
+        temporary_directory = tempfile.TemporaryDirectory
+
+        def tracked_directory(*args, **kwargs):
+            directory = temporary_directory(*args, **kwargs)
+            directories.append(directory.name)
+            return directory
+
+        with patch.object(base_payment_api.tempfile, 'TemporaryDirectory', side_effect=tracked_directory):
+            context = self.api_secondary._load_itau_pix_ssl_context()
+        self.assertIsInstance(context, ssl.SSLContext)
+        self.assertTrue(directories)
+        self.assertFalse(any(os.path.exists(directory) for directory in directories))
+
+    def test_wrong_password_is_rejected(self):
+        with self.assertRaises(ValidationError):
+            self._configure_client_certificate(password='senha-errada')
+
+    def test_mutual_tls_handshake(self):
+        self._configure_client_certificate()
+        port, result = self._start_server()
+        # O servidor de teste é assinado pela CA descartável
+        self.api_secondary._get_itau_pix_ssl_context().load_verify_locations(cadata=_pem(self.ca_cert).decode())
+
+        response = self.api_secondary._get_itau_pix_session().get(f'https://localhost:{port}/', timeout=10)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, 'cliente-pix')
+        self.assertNotIn('error', result)
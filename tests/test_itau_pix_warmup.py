@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from odoo.addons.payment_itau_pix.models import base_payment_api
+
+from .common import PixTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestItauPixWarmup(PixTestCommon):
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(base_payment_api._SESSIONS.clear)
+        self.addCleanup(base_payment_api._WARMUP_STARTED.clear)
+        self.addCleanup(setattr, base_payment_api, '_SESSIONS_PID', base_payment_api.os.getpid())
+
+    def test_sessions_inherited_from_parent_are_dropped(self):
+        session = self.api_primary._get_itau_pix_session()
+        self.assertIs(self.api_primary._get_itau_pix_session(), session)
+
+        # Simula o primeiro uso no processo filho, após o fork
+        with patch.object(base_payment_api.os, 'getpid', return_value=base_payment_api._SESSIONS_PID + 1):
+            with patch.object(type(session), 'close') as close:
+                child_session = self.api_primary._get_itau_pix_session()
+        self.assertIsNot(child_session, session)
+        close.assert_not_called()
+
+    def test_warmup_once_per_process(self):
+        Api = self.env['base.payment.api']
+        base_payment_api._WARMUP_STARTED.clear()
+        with patch.object(base_payment_api.threading, 'Thread') as thread, \
+                patch.object(type(self.env.registry), 'in_test_mode', return_value=False), \
+                patch.dict(base_payment_api.tools.config.options, {'test_enable': False, 'stop_after_init': False}):
+            Api._ensure_itau_pix_warmup()
+            Api._ensure_itau_pix_warmup()
+            self.assertEqual(thread.call_count, 1)
+            with patch.object(base_payment_api.os, 'getpid', return_value=base_payment_api.os.getpid() + 1):
+                Api._ensure_itau_pix_warmup()
+            self.assertEqual(thread.call_count, 2)
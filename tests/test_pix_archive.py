@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import tagged
+
+from .common import PixTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestPixArchive(PixTestCommon):
+
+    def test_archive_keeps_chatter_and_payment_link(self):
+        installment = self._create_installment()
+        installment.write({'pix_status': 'paid', 'pix_txid': 'txidarquivo'})
+        installment.message_post(body='PIX confirmado pelo Itaú')
+        payment = installment.payment_id
+        original_id = installment.id
+
+        archive = self.env['pix.installment.archive']._archive_installments(installment)
+
+        self.assertFalse(self.env['pix.installment'].browse(original_id).exists())
+        self.assertEqual(archive.original_id, original_id)
+        self.assertEqual(archive.pix_txid, 'txidarquivo')
+        self.assertTrue(any('PIX confirmado pelo Itaú' in body for body in archive.message_ids.mapped('body')))
+        self.assertFalse(self.env['mail.message'].search_count([
+            ('model', '=', 'pix.installment'), ('res_id', '=', original_id),
+        ]))
+        self.assertEqual(payment.pix_installment_archive_id, archive)
+        self.assertIn(archive, payment.pix_installment_archive_ids)
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+
+from unittest.mock import patch
+
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+
+from .common import PixTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestPixBatchSimulator(PixTestCommon):
+
+    def test_simulation_uses_send_checks(self):
+        installment = self._create_installment()
+        Simulator = self.env['pix.batch.simulator']
+        # O envio não exige o diário PIX: a simulação também não
+        self.company.pix_journal_id = False
+        self.assertTrue(Simulator._check_installment(installment))
+
+        installment.payment_id.partner_bank_id = False
+        with self.assertRaises(UserError) as send_error:
+            installment._check_pix_sendable()
+        with self.assertRaises(UserError) as simulation_error:
+            Simulator._check_installment(installment)
+        self.assertEqual(simulation_error.exception.args, send_error.exception.args)
+
+    def test_estimate_follows_tick_budget(self):
+        installments = self._create_installment(10.0) | self._create_installment(20.0) | self._create_installment(30.0)
+        Scheduler = self.env.registry['pix.dispatch.scheduler']
+        tick_seconds = self.env['pix.dispatch.scheduler']._get_tick_seconds()
+        with patch.object(Scheduler, '_get_tick_budget', autospec=True, return_value=1) as budget:
+            seconds = self.env['pix.batch.simulator']._estimate_dispatch_seconds(installments)
+        self.assertEqual(budget.call_count, 3)
+        self.assertEqual(seconds, 2 * tick_seconds)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import time
+
+from odoo.tests import tagged
+
+from odoo.addons.payment_itau_pix.models.pix_installment import DERIVED_STORED_FIELDS
+
+from .common import PixTestCommon
+
+_logger = logging.getLogger(__name__)
+
+# Pagamentos montados na medição de vazão e vazão mínima aceita (payloads/s)
+PAYLOAD_BENCHMARK_SIZE = 300
+PAYLOAD_BENCHMARK_MIN_RATE = 50
+
+
+@tagged('post_install', '-at_install', 'pix_benchmark')
+class TestPixBenchmark(PixTestCommon):
+    """Consultas SQL das operações em lote: o custo não pode crescer por registro
+
+    Executar com --test-tags pix_benchmark.
+    """
+
+    def _count_queries(self, function):
+        self.env.flush_all()
+        self.env.invalidate_all()
+        queries_before = self.env.cr.sql_log_count
+        function()
+        self.env.flush_all()
+        return self.env.cr.sql_log_count - queries_before
+
+    def _recompute_derived(self, installments):
+        # Como ao renomear faturas/pagamentos
+        for field_name in DERIVED_STORED_FIELDS:
+            self.env.add_to_compute(installments._fields[field_name], installments)
+
+    def test_installment_write_amplification(self):
+        template = self._create_installment()
+        Installment = self.env['pix.installment']
+        create_queries = {}
+        recompute_queries = {}
+        for count in (10, 50):
+            vals_list = [{
+                'invoice_id': template.invoice_id.id,
+                'payment_id': template.payment_id.id,
+                'amount': template.amount,
+                'due_date': template.due_date,
+                'company_id': template.company_id.id,
+            } for _index in range(count)]
+            created = []
+            create_queries[count] = self._count_queries(lambda: created.append(Installment.create(vals_list)))
+            recompute_queries[count] = self._count_queries(lambda: self._recompute_derived(created[0]))
+
+        # Criação e recomputação em lote: 40 parcelas a mais custam menos de uma consulta cada
+        self.assertLess(create_queries[50] - create_queries[10], 40)
+        self.assertLess(recompute_queries[50] - recompute_queries[10], 40)
+
+    def test_payload_build_queries(self):
+        installments = self.env['pix.installment']
+        for amount in (10.0, 20.0, 30.0, 40.0, 50.0, 60.0):
+            installments |= self._create_installment(amount)
+        payments = installments.payment_id.with_context(pix_dry_run=True)
+
+        queries = {}
+        for size in (2, 6):
+            batch = payments[:size]
+            payloads = {}
+            queries[size] = self._count_queries(lambda: payloads.update(batch._build_pix_payloads()))
+            self.assertEqual(set(payloads), set(batch.ids))
+
+        # Leituras em lote: a quantidade de consultas não cresce com os pagamentos
+        self.assertLessEqual(queries[6], queries[2] + 2)
+
+    def test_payload_build_throughput(self):
+        payments = self.env['account.payment'].create([{
+            'payment_type': 'outbound',
+            'partner_type': 'supplier',
+            'partner_id': self.supplier.id,
+            'partner_bank_id': self.supplier_bank.id,
+            'amount': 10.0 + index,
+            'journal_id': self.pix_journal.id,
+            'is_pix': True,
+        } for index in range(PAYLOAD_BENCHMARK_SIZE)]).with_context(pix_dry_run=True)
+
+        best = None
+        for _round in range(3):
+            # Cache limpo a cada rodada, para medir o custo real de leitura
+            self.env.invalidate_all()
+            started = time.perf_counter()
+            payloads = payments._build_pix_payloads()
+            elapsed = time.perf_counter() - started
+            self.assertEqual(len(payloads), len(payments))
+            best = elapsed if best is None else min(best, elapsed)
+
+        rate = len(payments) / best
+        _logger.info(f'Benchmark de payloads PIX: {len(payments)} payload(s) em {best:.3f}s ({rate:.0f}/s).')
+        self.assertGreater(rate, PAYLOAD_BENCHMARK_MIN_RATE)
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+import base64
+
+from odoo.tests import tagged
+
+from .common import PixTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestPixCnab(PixTestCommon):
+
+    def _export(self, installments):
+        wizard = self.env['pix.cnab.wizard'].create({
+            'operation': 'export',
+            'installment_ids': [(6, 0, installments.ids)],
+        })
+        wizard.action_export_remittance()
+        attachment = wizard._get_file_attachment()
+        self.assertTrue(attachment)
+        with wizard._open_file_attachment(attachment) as stream:
+            return [line.decode('latin-1').rstrip('\r\n') for line in stream]
+
+    def _import(self, lines):
+        content = ''.join(line + '\r\n' for line in lines).encode('latin-1')
+        wizard = self.env['pix.cnab.wizard'].create({
+            'operation': 'import',
+            'file_data': base64.b64encode(content),
+            'file_name': 'RETORNO.RET',
+        })
+        wizard.action_import_return()
+        return wizard
+
+    def _return_lines(self, lines, occurrence):
+        """Retorno do banco: a remessa com a ocorrência nos segmentos A"""
+        return [
+            line[:230] + occurrence.ljust(10) if line[7] == '3' and line[13] == 'A' else line
+            for line in lines
+        ]
+
+    def test_remittance_layout(self):
+        installments = self._create_installment(100.0) | self._create_installment(50.0)
+        lines = self._export(installments)
+
+        self.assertTrue(all(len(line) == 240 for line in lines))
+        self.assertEqual(lines[0][7], '0')
+        self.assertEqual(lines[-1][7], '9')
+        segments_a = [line for line in lines if line[7] == '3' and line[13] == 'A']
+        self.assertEqual(
+            sorted(int(line[73:93]) for line in segments_a),
+            sorted(installments.ids),
+        )
+        self.assertEqual(set(installments.mapped('pix_status')), {'pending'})
+
+    def test_round_trip_paid(self):
+        installments = self._create_installment(100.0) | self._create_installment(50.0)
+        lines = self._export(installments)
+
+        wizard = self._import(self._return_lines(lines, '00'))
+        self.assertFalse(wizard._get_file_attachment())
+        self.assertEqual(set(installments.mapped('pix_status')), {'paid'})
+
+    def test_round_trip_rejected(self):
+        installment = self._create_installment(100.0)
+        lines = self._export(installment)
+
+        self._import(self._return_lines(lines, 'AB'))
+        self.assertEqual(installment.pix_status, 'failed')
+
+    def test_round_trip_accepted_stays_pending(self):
+        installment = self._create_installment(100.0)
+        lines = self._export(installment)
+
+        self._import(self._return_lines(lines, 'BD'))
+        self.assertEqual(installment.pix_status, 'pending')
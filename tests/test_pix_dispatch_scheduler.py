@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+from datetime import timedelta
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.tests import tagged
+
+from odoo.addons.payment_itau_pix.models import pix_dispatch_scheduler
+
+from .common import PixTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestPixDispatchScheduler(PixTestCommon):
+
+    def test_overdue_budget_uses_full_capacity(self):
+        scheduler = self.env['pix.dispatch.scheduler']
+        self.assertEqual(scheduler._get_tick_budget(1000, 1000, 60, 300), 48)
+        self.assertEqual(scheduler._get_tick_budget(10, 10, 60, 300), 10)
+
+    def test_future_items_are_spread(self):
+        scheduler = self.env['pix.dispatch.scheduler']
+        budget = scheduler._get_tick_budget(1000, 0, 60, 300)
+        self.assertGreaterEqual(budget, 1)
+        self.assertLessEqual(budget, 48)
+        self.assertGreaterEqual(scheduler._get_tick_budget(1000, 5, 60, 300), min(48, budget + 4))
+
+    def test_overdue_sent_first_without_waiting(self):
+        self.company.pix_auto_dispatch = True
+        today = fields.Date.context_today(self.env['pix.dispatch.scheduler'])
+        overdue = self._create_installment(10.0)
+        overdue.due_date = today - timedelta(days=3)
+        current = self._create_installment(500.0)
+        current.due_date = today
+
+        Scheduler = self.env.registry['pix.dispatch.scheduler']
+        with patch.object(Scheduler, '_send_installment', autospec=True, return_value=True) as send, \
+                patch.object(Scheduler, '_get_tick_budget', autospec=True, return_value=1):
+            sent = self.env['pix.dispatch.scheduler']._dispatch_company(self.company)
+
+        self.assertEqual(sent, 1)
+        self.assertEqual(send.call_args.args[1], overdue)
+
+    def test_sends_are_spaced_within_tick(self):
+        self.company.pix_auto_dispatch = True
+        today = fields.Date.context_today(self.env['pix.dispatch.scheduler'])
+        for amount in (10.0, 20.0, 30.0):
+            self._create_installment(amount).due_date = today - timedelta(days=1)
+
+        clock = [1000.0]
+        waits = []
+
+        def sleep(seconds):
+            waits.append(seconds)
+            clock[0] += seconds
+
+        Scheduler = self.env.registry['pix.dispatch.scheduler']
+        with patch.object(Scheduler, '_send_installment', autospec=True, return_value=True), \
+                patch.object(Scheduler, '_get_rate_limit', autospec=True, return_value=30), \
+                patch.object(pix_dispatch_scheduler, 'time') as fake_time:
+            fake_time.monotonic.side_effect = lambda: clock[0]
+            fake_time.sleep.side_effect = sleep
+            sent = self.env['pix.dispatch.scheduler']._dispatch_company(self.company)
+
+        self.assertEqual(sent, 3)
+        self.assertEqual(waits, [2.0, 2.0])
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import tagged
+
+from .common import PixTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestPixNetting(PixTestCommon):
+
+    def _net(self, *moves):
+        lines = self.env['account.move.line']
+        for move in moves:
+            lines |= self._payable_lines(move)
+        return self.env['pix.installment']._create_netted_installments(lines)
+
+    def test_netted_payment_sums_bills(self):
+        installments = self._net(self._create_bill(100.0), self._create_bill(50.0))
+        self.assertEqual(len(installments.payment_id), 1)
+        self.assertAlmostEqual(installments.payment_id.amount, 150.0)
+        self.assertAlmostEqual(sum(installments.mapped('amount')), 150.0)
+
+    def test_refund_reduces_netted_payment(self):
+        bill = self._create_bill(100.0)
+        refund = self._create_bill(30.0, move_type='in_refund')
+        installments = self._net(bill, refund)
+
+        payment = installments.payment_id
+        self.assertEqual(len(payment), 1)
+        self.assertAlmostEqual(payment.amount, 70.0)
+        self.assertAlmostEqual(sum(installments.mapped('amount')), 70.0)
+        self.assertEqual(installments.invoice_id, bill)
+        self.assertTrue(all(self._payable_lines(bill | refund).mapped('reconciled')))
+
+    def test_refund_exceeding_bills_creates_no_payment(self):
+        bill = self._create_bill(40.0)
+        refund = self._create_bill(60.0, move_type='in_refund')
+        self.assertFalse(self._net(bill, refund))
+        self.assertFalse(self._payable_lines(bill).reconciled)
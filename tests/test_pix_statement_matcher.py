@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests import tagged
+
+from .common import PixTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestPixStatementMatcher(PixTestCommon):
+
+    def setUp(self):
+        super().setUp()
+        self.today = fields.Date.today()
+
+    def _sent_installment(self, amount, txid, status='pending', paid_date=None):
+        installment = self._create_installment(amount)
+        installment.payment_id.write({'pix_txid': txid, 'pix_status': status})
+        installment.write({'pix_status': status, 'pix_paid_date': paid_date})
+        return installment
+
+    def _statement_line(self, amount, payment_ref, date=None):
+        return self.env['account.bank.statement.line'].create({
+            'journal_id': self.pix_journal.id,
+            'date': date or self.today,
+            'amount': -amount,
+            'payment_ref': payment_ref,
+        })
+
+    def _match(self):
+        return self.env['pix.statement.matcher']._match_company(
+            self.company, self.today - timedelta(days=10), self.today + timedelta(days=1),
+        )
+
+    def test_txid_match_confirms_pending(self):
+        installment = self._sent_installment(100.0, 'txidextrato1')
+        line = self._statement_line(100.0, 'PIX ENVIADO txidextrato1')
+
+        self._match()
+        self.assertEqual(installment.pix_status, 'paid')
+        self.assertEqual(installment.pix_bank_match, 'matched')
+        self.assertEqual(installment.pix_statement_line_id, line)
+
+    def test_amount_mismatch_is_flagged(self):
+        installment = self._sent_installment(100.0, 'txidextrato2')
+        self._statement_line(90.0, 'PIX ENVIADO txidextrato2')
+
+        result = self._match()
+        self.assertEqual(result['amount_mismatch'], 1)
+        self.assertEqual(installment.pix_bank_match, 'amount_mismatch')
+        self.assertEqual(installment.pix_status, 'pending')
+
+    def test_amount_and_date_only_for_paid(self):
+        paid = self._sent_installment(55.0, 'txidpago', status='paid', paid_date=fields.Datetime.now())
+        pending = self._sent_installment(77.0, 'txidpendente')
+        self._statement_line(55.0, 'TRANSFERENCIA PIX')
+        self._statement_line(77.0, 'TRANSFERENCIA PIX')
+
+        self._match()
+        self.assertEqual(paid.pix_bank_match, 'matched')
+        self.assertFalse(pending.pix_bank_match)
+        self.assertEqual(pending.pix_status, 'pending')
+
+    def test_paid_without_statement_line_is_missing(self):
+        installment = self._sent_installment(
+            42.0, 'txidsemextrato', status='paid',
+            paid_date=fields.Datetime.now() - timedelta(days=3),
+        )
+
+        result = self._match()
+        self.assertEqual(result['missing'], 1)
+        self.assertEqual(installment.pix_bank_match, 'missing')
+
+    def test_history_before_window_is_not_loaded(self):
+        old = self._sent_installment(
+            33.0, 'txidantigo', status='paid',
+            paid_date=fields.Datetime.now() - timedelta(days=60),
+        )
+        self.env.flush_all()
+        self.env.cr.execute(
+            "UPDATE account_payment SET date = %s WHERE id = %s",
+            (self.today - timedelta(days=60), old.payment_id.id),
+        )
+        self.env.invalidate_all()
+        recent = self._sent_installment(34.0, 'txidrecente')
+
+        installment_ids_by_payment = self.env['pix.statement.matcher']._build_indexes(
+            self.company, self.today - timedelta(days=10),
+        )[0]
+        self.assertNotIn(old.payment_id.id, installment_ids_by_payment)
+        self.assertIn(recent.payment_id.id, installment_ids_by_payment)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+from datetime import timedelta, timezone
+
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+
+from .common import PixTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestPixStatusApi(PixTestCommon):
+
+    def _set_xact_id(self, installments, xact_id):
+        # O gatilho sobrescreve xact_id com a transação do teste, que ainda está
+        # aberta; desativá-lo (dentro da transação) simula gravações já confirmadas
+        installments.flush_recordset()
+        self.env.cr.execute("ALTER TABLE pix_installment DISABLE TRIGGER pix_installment_xact_id")
+        self.env.cr.execute(
+            "UPDATE pix_installment SET xact_id = %s WHERE id = ANY(%s)",
+            (xact_id, installments.ids),
+        )
+        self.env.cr.execute("ALTER TABLE pix_installment ENABLE TRIGGER pix_installment_xact_id")
+
+    def _page(self, **kwargs):
+        return self.env['pix.status.api']._get_status_page(**kwargs)
+
+    def test_pages_follow_commit_order(self):
+        first = self._create_installment(10.0)
+        second = self._create_installment(20.0)
+        third = self._create_installment(30.0)
+        self._set_xact_id(first, 3)
+        self._set_xact_id(second, 1)
+        self._set_xact_id(third, 2)
+        invoice_ids = (first | second | third).invoice_id.ids
+
+        page = self._page(invoice_ids=invoice_ids, limit=2)
+        self.assertEqual([item['id'] for item in page['items']], (second | third).ids)
+        self.assertTrue(page['has_more'])
+        self.assertEqual(page['next_cursor'], f'2-{third.id}')
+        self.assertNotIn('xact_id', page['items'][0])
+
+        page = self._page(invoice_ids=invoice_ids, cursor=page['next_cursor'], limit=2)
+        self.assertEqual([item['id'] for item in page['items']], first.ids)
+        self.assertFalse(page['has_more'])
+
+        page = self._page(invoice_ids=invoice_ids, cursor=page['next_cursor'])
+        self.assertFalse(page['items'])
+        self.assertEqual(page['next_cursor'], f'3-{first.id}')
+
+    def test_open_transaction_is_not_delivered_to_scans(self):
+        installment = self._create_installment()
+        installment.flush_recordset()
+        since = installment.write_date.isoformat()
+        page = self._page(updated_since=since)
+        self.assertNotIn(installment.id, [item['id'] for item in page['items']])
+
+        self._set_xact_id(installment, 1)
+        page = self._page(updated_since=since)
+        self.assertIn(installment.id, [item['id'] for item in page['items']])
+
+    def test_key_lookup_during_open_transaction(self):
+        # A transação do teste continua aberta e segura o xmin, como uma
+        # sincronização longa: a consulta por chave ainda encontra a parcela
+        installment = self._create_installment()
+        installment.write({'pix_txid': 'txidabertura'})
+        installment.flush_recordset()
+        self.env.cr.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+        xmin = self.env.cr.fetchone()[0]
+
+        page = self._page(txids=['txidabertura'])
+        self.assertEqual([item['id'] for item in page['items']], installment.ids)
+        self.assertEqual(page['next_cursor'], f'{xmin - 1}-0')
+
+        page = self._page(txids=['txidabertura'], cursor=page['next_cursor'])
+        self.assertFalse(page['items'])
+
+    def test_updated_since_with_timezone(self):
+        installment = self._create_installment()
+        self._set_xact_id(installment, 1)
+        brt = timezone(timedelta(hours=-3))
+        write_date = installment.write_date.replace(tzinfo=timezone.utc)
+
+        before = (write_date - timedelta(hours=1)).astimezone(brt).isoformat()
+        page = self._page(invoice_ids=installment.invoice_id.ids, updated_since=before)
+        self.assertEqual([item['id'] for item in page['items']], installment.ids)
+
+        after = (write_date + timedelta(hours=1)).astimezone(brt).isoformat()
+        page = self._page(invoice_ids=installment.invoice_id.ids, updated_since=after)
+        self.assertFalse(page['items'])
+
+    def test_invalid_parameters(self):
+        for limit in ('abc', 0, -5):
+            with self.assertRaises(UserError):
+                self._page(limit=limit)
+        with self.assertRaises(UserError):
+            self._page(cursor='2024-01-01T00:00:00_5')
+        with self.assertRaises(UserError):
+            self._page(updated_since='ontem')
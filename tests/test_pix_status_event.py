@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+from unittest.mock import patch
+
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+
+from odoo.addons.payment_itau_pix.models import pix_status_event
+
+from .common import PixTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestPixStatusEvent(PixTestCommon):
+
+    def setUp(self):
+        super().setUp()
+        self.Event = self.env['pix.status.event'].with_company(self.company)
+        # Parte do zero: eventos de outros testes/dados não interferem no cursor
+        self.env.cr.execute("DELETE FROM pix_status_event")
+
+    def _insert_event(self, xact_id, res_id, company=None, new_status='pending'):
+        # Simula um evento de transação já encerrada (xact_id antigo)
+        self.env.cr.execute("""
+            INSERT INTO pix_status_event (xact_id, res_model, res_id, company_id, new_status, event_date)
+            VALUES (%s, 'pix.installment', %s, %s, %s, now() at time zone 'UTC')
+            RETURNING id
+        """, (xact_id, res_id, (company or self.company).id, new_status))
+        return self.env.cr.fetchone()[0]
+
+    def test_feed_follows_commit_order(self):
+        late = self._insert_event(3, 1)
+        early = self._insert_event(1, 2)
+        middle = self._insert_event(2, 3)
+
+        page = self.Event._read_feed(limit=2)
+        self.assertEqual([event['id'] for event in page['events']], [early, middle])
+        self.assertEqual(page['events'][0]['sequence'], f'1-{early}')
+        self.assertTrue(page['has_more'])
+        self.assertEqual(page['next_cursor'], f'2-{middle}')
+
+        page = self.Event._read_feed(cursor=page['next_cursor'], limit=2)
+        self.assertEqual([event['id'] for event in page['events']], [late])
+        self.assertFalse(page['has_more'])
+        self.assertEqual(self.Event._get_head_cursor(), f'3-{late}')
+
+    def test_open_transaction_events_are_held_back(self):
+        installment = self._create_installment()
+        installment.write({'pix_status': 'pending'})
+        installment.flush_recordset()
+        self.env.cr.execute("SELECT count(*) FROM pix_status_event WHERE res_id = %s", (installment.id,))
+        self.assertTrue(self.env.cr.fetchone()[0])
+        self.assertFalse(self.Event._read_feed()['events'])
+
+    def test_feed_is_limited_to_user_companies(self):
+        other_company = self.env['res.company'].create({'name': 'Outra Empresa PIX'})
+        self._insert_event(1, 1, company=other_company)
+        own = self._insert_event(2, 2)
+        page = self.Event._read_feed()
+        self.assertEqual([event['id'] for event in page['events']], [own])
+
+    def test_invalid_parameters(self):
+        for limit in ('abc', 0):
+            with self.assertRaises(UserError):
+                self.Event._read_feed(limit=limit)
+        with self.assertRaises(UserError):
+            self.Event._read_feed(cursor='abc')
+        with self.assertRaises(UserError):
+            self.Event._wait_feed(timeout='logo')
+
+    def test_no_wait_in_prefork(self):
+        Event = self.env.registry['pix.status.event']
+        with patch.object(Event, '_can_wait', autospec=True, return_value=False), \
+                patch.object(Event, '_listen_feed', autospec=True) as listen:
+            page = self.Event._wait_feed(timeout=10)
+        listen.assert_not_called()
+        self.assertFalse(page['events'])
+
+    def test_waiters_are_capped(self):
+        Event = self.env.registry['pix.status.event']
+        with patch.object(Event, '_can_wait', autospec=True, return_value=True), \
+                patch.object(Event, '_listen_feed', autospec=True) as listen, \
+                patch.object(pix_status_event, '_waiters') as waiters:
+            waiters.acquire.return_value = False
+            self.Event._wait_feed(timeout=10)
+        listen.assert_not_called()
+        waiters.release.assert_not_called()
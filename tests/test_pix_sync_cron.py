@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+from unittest.mock import patch
+
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+
+from .common import PixTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestPixSyncCron(PixTestCommon):
+
+    def test_company_error_does_not_stop_sync(self):
+        installment = self._create_installment()
+        installment.write({'pix_status': 'pending'})
+        installment.payment_id._ensure_pix_identifiers()
+        payment = self.env['account.payment'].create({
+            'payment_type': 'outbound',
+            'partner_type': 'supplier',
+            'partner_id': self.supplier.id,
+            'amount': 10.0,
+            'journal_id': self.pix_journal.id,
+            'is_pix': True,
+            'pix_status': 'pending',
+            'pix_txid': 'txidavulso',
+        })
+
+        Installment = self.env.registry['pix.installment']
+        Payment = self.env.registry['account.payment']
+        with patch.object(Installment, '_reconcile_pix_status_bulk', autospec=True,
+                          side_effect=UserError('API indisponível')), \
+                patch.object(Payment, 'action_update_payment_pix_status', autospec=True) as update:
+            self.env['account.payment']._cron_update_payments_itau_pix()
+
+        self.assertIn(payment, [call.args[0] for call in update.call_args_list])
+        self.assertEqual(installment.pix_status, 'pending')
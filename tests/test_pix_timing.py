@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+from unittest.mock import patch
+
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+
+from odoo.addons.payment_itau_pix.models import pix_timing
+
+from .common import PixTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestPixTiming(PixTestCommon):
+
+    def test_timings_follow_status_write(self):
+        installment = self._create_installment()
+        with pix_timing.profile('send', 'lote1'):
+            with pix_timing.phase('http'):
+                installment.write({'last_sync': '2024-01-01 00:00:00'})
+            self.assertFalse(installment.pix_timing_date)
+            installment.write({'pix_status': 'failed'})
+        self.assertEqual(installment.pix_timing_operation, 'send')
+        self.assertEqual(installment.pix_timing_batch, 'lote1')
+        self.assertTrue(installment.pix_timing_date)
+
+    def test_no_timings_outside_operation(self):
+        installment = self._create_installment()
+        installment.write({'pix_status': 'failed'})
+        self.assertFalse(installment.pix_timing_date)
+
+    def test_error_path_records_timings(self):
+        installment = self._create_installment()
+        Api = self.env.registry['base.payment.api']
+        with patch.object(Api, 'send_pix', autospec=True, side_effect=ValueError('conexão recusada')):
+            try:
+                installment.action_send_pix()
+            except UserError:
+                pass
+        self.assertEqual(installment.pix_status, 'failed')
+        self.assertEqual(installment.pix_timing_operation, 'send')
+        self.assertTrue(installment.pix_timing_date)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from odoo.addons.payment_itau_pix.cli.pix_worker import PixWorkerRuntime
+from .common import PixTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestPixWorkerSend(PixTestCommon):
+
+    def setUp(self):
+        super().setUp()
+        self.installment = self._create_installment()
+        self.payment = self.installment.payment_id
+        self.env.flush_all()
+        self.worker = PixWorkerRuntime(self.env.cr.dbname, 1, [], 60, 300, 300)
+
+    def _send(self, side_effect):
+        Scheduler = self.env.registry['pix.dispatch.scheduler']
+        with patch.object(Scheduler, '_send_installment', autospec=True, side_effect=side_effect) as send:
+            self.worker._send(self.company.id, self.installment.id, 'batch')
+        self.env.invalidate_all()
+        return send
+
+    def test_identifiers_committed_before_send(self):
+        def check_identifiers(scheduler, installment, payload=None):
+            self.assertTrue(installment.payment_id.pix_txid)
+            self.assertTrue(installment.payment_id.pix_correlation_id)
+            self.assertEqual(payload['correlation_id'], installment.payment_id.pix_correlation_id)
+
+        send = self._send(check_identifiers)
+        self.assertEqual(send.call_count, 1)
+
+    def test_failure_after_send_marks_pending(self):
+        def fail_after_send(scheduler, installment, payload=None):
+            raise RuntimeError('conexão perdida ao gravar o envio')
+
+        self._send(fail_after_send)
+        self.assertEqual(self.installment.pix_status, 'pending')
+        self.assertEqual(self.payment.pix_status, 'pending')
+        self.assertTrue(self.installment.pix_txid)
+
+    def test_already_sent_installment_is_skipped(self):
+        self.installment.pix_status = 'pending'
+        self.env.flush_all()
+        send = self._send(lambda scheduler, installment, payload=None: None)
+        self.assertFalse(send.called)
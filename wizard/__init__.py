@@ -1,3 +1,5 @@
 # -*- coding: utf-8 -*-
 
 from . import account_payment_register
+from . import pix_cnab_wizard
+from . import pix_dry_run_wizard
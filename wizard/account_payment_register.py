@@ -2,6 +2,8 @@ from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
 import logging
 
+from ..models.pix_generation_job import GENERATION_BACKGROUND_THRESHOLD
+
 _logger = logging.getLogger(__name__)
 
 class AccountPaymentRegister(models.TransientModel):
@@ -45,6 +47,21 @@ class AccountPaymentRegister(models.TransientModel):
             else:
                 wizard.is_pix_payment_method = False
     
+    pix_netting = fields.Boolean(
+        string='Consolidar PIX por Fornecedor',
+        compute='_compute_pix_netting',
+        store=True,
+        readonly=False,
+        help='Agrupa as parcelas de um mesmo fornecedor, conta bancária e vencimento '
+             'em um único pagamento e uma única transferência PIX'
+    )
+
+    @api.depends('company_id')
+    def _compute_pix_netting(self):
+        """Usa a configuração de consolidação da empresa como padrão"""
+        for wizard in self:
+            wizard.pix_netting = wizard.company_id.pix_netting
+
     max_amount = fields.Monetary(
         string='Valor Máximo',
         currency_field='currency_id',
@@ -113,6 +130,8 @@ class AccountPaymentRegister(models.TransientModel):
             invoices[invoice.id]['lines'] |= line
         
         installments = self.env['pix.installment']
+        # Seleções grandes são processadas em segundo plano, em partes
+        in_background = len(self.parcels_ids) > GENERATION_BACKGROUND_THRESHOLD
         
         for invoice_data in invoices.values():
             invoice = invoice_data['invoice']
@@ -136,111 +155,28 @@ class AccountPaymentRegister(models.TransientModel):
                     _('É necessário configurar o diário PIX na empresa %s.') %
                     company.name
                 )
-            
+
+            # No modo consolidado e em segundo plano as parcelas são criadas após validar todas as faturas
+            if self.pix_netting or in_background:
+                continue
+
             # Para cada linha selecionada, cria uma parcela PIX
-            for line in invoice_data['lines']:
-                amount = abs(line.amount_residual)
-                if amount <= 0:
-                    continue
-                
-                due_date = line.date_maturity or invoice.invoice_date_due or fields.Date.today()
-                
-                # Cria o payment
-                payment = self.env['account.payment'].create({
-                    'payment_type': 'outbound',
-                    'partner_type': 'supplier',
-                    'partner_id': invoice.partner_id.id,
-                    'amount': amount,
-                    'currency_id': invoice.currency_id.id,
-                    'date': fields.Date.today(),
-                    'journal_id': company.pix_journal_id.id,
-                    'company_id': company.id,
-                    'is_pix': True,
-                    'payment_reference': _('Parcela PIX - %s') % invoice.name,
-                    'memo': self.communication,
-                })
-                
-                # Vincula invoice ao payment
-                payment.invoice_ids = [(4, invoice.id)]
-                
-                # Posta o payment
-                payment.action_post()
-                
-                # Verifica se foi postado corretamente
-                payment.invalidate_recordset(['state', 'move_id'])
-                if payment.state not in ('posted', 'in_process'):
-                    raise UserError(
-                        _('Erro ao postar o pagamento. Estado atual: %s') % payment.state
-                    )
-                if not payment.move_id or payment.move_id.state != 'posted':
-                    raise UserError(
-                        _('Erro ao postar o lançamento contábil do pagamento. '
-                          'Estado do lançamento: %s') %
-                        (payment.move_id.state if payment.move_id else 'N/A')
-                    )
-                
-                # Cria a parcela
-                installment = self.env['pix.installment'].create({
-                    'invoice_id': invoice.id,
-                    'payment_id': payment.id,
-                    'amount': amount,
-                    'due_date': due_date,
-                    'pix_status': 'draft',
-                    'company_id': company.id,
-                    'currency_id': invoice.currency_id.id,  # Define explicitamente para evitar erro de campo obrigatório
-                })
-                
-                # Vincula installment ao payment
-                payment.write({
-                    'pix_installment_id': installment.id,
-                    'pix_status': 'draft',
-                })
-                
-                installments |= installment
-                
-                # Reconciliação automática
-                if payment.move_id and payment.move_id.state == 'posted':
-                    payment_lines = payment.move_id.line_ids.filtered(
-                        lambda l: l.account_id.account_type == 'liability_payable'
-                                 and not l.reconciled
-                                 and l.partner_id == payment.partner_id
-                                 and l.parent_state == 'posted'
-                    )
-                    
-                    invoice_lines = invoice.line_ids.filtered(
-                        lambda l: l.account_id.account_type == 'liability_payable'
-                                 and not l.reconciled
-                                 and l.partner_id == payment.partner_id
-                                 and l.parent_state == 'posted'
-                                 and l.id == line.id  # Apenas a linha selecionada
-                    )
-                    
-                    if payment_lines and invoice_lines:
-                        for account in payment_lines.account_id:
-                            payment_account_lines = payment_lines.filtered(
-                                lambda l: l.account_id == account
-                            )
-                            invoice_account_lines = invoice_lines.filtered(
-                                lambda l: l.account_id == account
-                            )
-                            
-                            if payment_account_lines and invoice_account_lines:
-                                to_reconcile = payment_account_lines | invoice_account_lines
-                                
-                                if to_reconcile:
-                                    try:
-                                        to_reconcile.filtered(
-                                            lambda l: not l.reconciled and l.parent_state == 'posted'
-                                        ).reconcile()
-                                        
-                                        invoice.matched_payment_ids |= payment
-                                        
-                                    except Exception as e:
-                                        _logger.error(
-                                            f'Erro ao reconciliar payment {payment.id} com invoice {invoice.id}: {e}',
-                                            exc_info=True
-                                        )
-        
+            installments |= self.env['pix.installment']._create_split_installments(
+                invoice_data['lines'], memo=self.communication
+            )
+
+        if in_background:
+            job = self.env['pix.generation.job']._enqueue(
+                self.parcels_ids, netting=self.pix_netting, memo=self.communication
+            )
+            return job._action_open_form()
+
+        if self.pix_netting:
+            # Um pagamento por fornecedor/conta bancária/vencimento, cobrindo várias faturas
+            installments = self.env['pix.installment']._create_netted_installments(
+                self.parcels_ids, memo=self.communication
+            )
+
         if not installments:
             raise UserError(_('Não foi possível criar parcelas PIX. Verifique as parcelas selecionadas.'))
         
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+import io
+import tempfile
+from odoo import models, fields, _
+from odoo.exceptions import UserError
+
+
+class PixCnabWizard(models.TransientModel):
+    _name = 'pix.cnab.wizard'
+    _description = 'Remessa/Retorno CNAB 240 SISPAG PIX'
+
+    operation = fields.Selection(
+        [
+            ('export', 'Gerar Remessa'),
+            ('import', 'Processar Retorno'),
+        ],
+        string='Operação',
+        required=True,
+        default='export'
+    )
+    installment_ids = fields.Many2many(
+        'pix.installment',
+        string='Parcelas PIX',
+        default=lambda self: self.env.context.get('active_ids') if self.env.context.get('active_model') == 'pix.installment' else False
+    )
+    file_data = fields.Binary(
+        string='Arquivo',
+        attachment=True
+    )
+    file_name = fields.Char(
+        string='Nome do Arquivo'
+    )
+    result_message = fields.Text(
+        string='Resultado',
+        readonly=True
+    )
+
+    def action_export_remittance(self):
+        """Gera o arquivo de remessa CNAB 240 para as parcelas selecionadas"""
+        self.ensure_one()
+
+        if not self.installment_ids:
+            raise UserError(_('Selecione ao menos uma parcela PIX.'))
+
+        self._get_file_attachment().unlink()
+        self.file_name = 'SISPAG_PIX_%s.REM' % fields.Datetime.now().strftime('%Y%m%d%H%M%S')
+        self._create_file_attachment(
+            lambda stream: self.env['pix.sispag.cnab']._write_remittance(self.installment_ids, stream)
+        )
+        self.invalidate_recordset(['file_data'])
+        self.result_message = _('Remessa gerada com %d parcela(s).') % len(self.installment_ids)
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+    def action_import_return(self):
+        """Processa o arquivo de retorno CNAB 240 e atualiza os status em lote"""
+        self.ensure_one()
+
+        attachment = self._get_file_attachment()
+        if not attachment:
+            raise UserError(_('Selecione o arquivo de retorno.'))
+
+        cnab = self.env['pix.sispag.cnab']
+        with self._open_file_attachment(attachment) as stream:
+            result = cnab._apply_return_records(cnab._iter_return_records(stream))
+
+        self.write({
+            'file_data': False,
+            'result_message': _(
+                'Retorno processado: %(paid)d paga(s), %(failed)d com falha, '
+                '%(accepted)d em processamento, %(unmatched)d sem correspondência.'
+            ) % result,
+        })
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+    # Arquivo (anexo do campo file_data)
+    def _get_file_attachment(self):
+        return self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_field', '=', 'file_data'),
+            ('res_id', '=', self.id),
+        ], limit=1)
+
+    def _open_file_attachment(self, attachment):
+        """Abre o conteúdo do anexo para leitura linha a linha"""
+        return io.BytesIO(attachment.raw)
+
+    def _create_file_attachment(self, write):
+        """Cria o anexo do campo file_data com o conteúdo escrito por write(stream)
+
+        O gerador escreve em um arquivo temporário, gravado em seguida pela API de
+        anexos (sem base64), qualquer que seja o armazenamento configurado.
+        """
+        with tempfile.TemporaryFile() as stream:
+            write(stream)
+            stream.seek(0)
+            return self.env['ir.attachment'].sudo().create({
+                'name': self.file_name or 'file_data',
+                'res_model': self._name,
+                'res_field': 'file_data',
+                'res_id': self.id,
+                'mimetype': 'text/plain',
+                'raw': stream.read(),
+            })
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+from datetime import timedelta
+from odoo import models, fields, _
+from odoo.exceptions import UserError
+
+
+class PixDryRunWizard(models.TransientModel):
+    _name = 'pix.dry.run.wizard'
+    _description = 'Simulação de Envio PIX'
+
+    installment_ids = fields.Many2many(
+        'pix.installment',
+        string='Parcelas PIX',
+        default=lambda self: self.env.context.get('active_ids') if self.env.context.get('active_model') == 'pix.installment' else False
+    )
+    total_count = fields.Integer(string='Parcelas Simuladas', readonly=True)
+    valid_count = fields.Integer(string='Parcelas Válidas', readonly=True)
+    error_count = fields.Integer(string='Parcelas com Erro', readonly=True)
+    estimated_duration = fields.Char(
+        string='Tempo Estimado de Envio',
+        readonly=True,
+        help='Estimativa para enviar as parcelas válidas respeitando o limite de requisições da API'
+    )
+    report = fields.Text(string='Erros', readonly=True)
+    simulated = fields.Boolean(readonly=True)
+
+    def action_simulate(self):
+        """Valida as parcelas e monta todos os payloads, sem enviar nada"""
+        self.ensure_one()
+
+        if not self.installment_ids:
+            raise UserError(_('Selecione ao menos uma parcela PIX.'))
+
+        simulator = self.env['pix.batch.simulator']
+        result = simulator._simulate(self.installment_ids)
+        self.write({
+            'simulated': True,
+            'total_count': result['total'],
+            'valid_count': result['valid_count'],
+            'error_count': len(result['errors']),
+            'estimated_duration': str(timedelta(seconds=round(result['estimated_seconds']))),
+            'report': simulator._format_error_report(result['errors']),
+        })
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }